@@ -0,0 +1,58 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "folder_tools"))
+
+from comparator import HtmlFileTreePrinter, TreeNode  # noqa: E402
+
+FILES_PER_DIR = 100
+
+
+def generate_paths(count, shuffle=False, seed=0):
+    # 三层目录结构，每个文件夹100个文件，其中一部分文件夹只有单个子文件夹用于测试路径压缩
+    paths = []
+    for start in range(0, count, FILES_PER_DIR):
+        dir_path = f"dir{start // 1000000:03d}/sub{start // 10000 % 100:02d}/leaf{start // FILES_PER_DIR % 100:02d}"
+        if start // FILES_PER_DIR % 7 == 0:
+            dir_path += "/only/child"
+        paths.extend(f"{dir_path}/file_{i:09d}.dat" for i in range(start, min(start + FILES_PER_DIR, count)))
+    if shuffle:
+        random.Random(seed).shuffle(paths)
+    return paths
+
+
+def measure(paths):
+    start = time.perf_counter()
+    root = TreeNode.build_file_tree(paths)
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    output_file = HtmlFileTreePrinter.write_html_file(root, "", "bench")
+    render_seconds = time.perf_counter() - start
+    size = os.path.getsize(output_file)
+    os.remove(output_file)
+    return build_seconds, render_seconds, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测试TreeNode构建和HTML生成耗时随路径数量的变化")
+    parser.add_argument("counts", nargs="*", type=int, default=[125000, 250000, 500000, 1000000])
+    parser.add_argument("--shuffle", action="store_true", help="打乱路径顺序，模拟未按文件夹分组的输入")
+    parser.add_argument("--depth", type=int, default=5000, help="额外测试一条该深度的目录链")
+    args = parser.parse_args()
+    print(f"{'路径数':>10} {'构建':>8} {'每个路径':>10} {'生成HTML':>8} {'每个路径':>10} {'HTML大小':>10}")
+    for count in args.counts:
+        build_seconds, render_seconds, size = measure(generate_paths(count, args.shuffle))
+        print(f"{count:>10} {build_seconds:>7.2f}s {build_seconds / count * 1e6:>8.2f}us "
+              f"{render_seconds:>7.2f}s {render_seconds / count * 1e6:>8.2f}us {size / 1024 ** 2:>8.1f}MB")
+    if args.depth:
+        # 每一层都有一个文件，目录链无法压缩，递归实现在这里会超过Python的递归深度限制
+        parts = [f"d{i}" for i in range(args.depth)]
+        build_seconds, render_seconds, _ = measure(["/".join(parts[:i] + ["a.txt"]) for i in range(args.depth)])
+        print(f"{args.depth}层目录：构建 {build_seconds:.3f}s，生成HTML {render_seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "folder_tools"))
+
+from comparator import FolderComparator, TreeNode  # noqa: E402
+from path_store import PathStore  # noqa: E402
+
+FILES_PER_DIR = 100
+
+
+def iter_dirs(count):
+    # 每个文件夹100个文件，三层目录结构，与真实的工作区目录大致相当
+    for start in range(0, count, FILES_PER_DIR):
+        dir_path = os.path.join(f"dir{start // 1000000:03d}", f"sub{start // 10000 % 100:02d}",
+                                f"leaf{start // FILES_PER_DIR % 100:02d}")
+        yield dir_path, [f"file_{i:09d}.dat" for i in range(start, min(start + FILES_PER_DIR, count))]
+
+
+def build(kind, count):
+    if kind == "list":
+        paths = []
+        for dir_path, names in iter_dirs(count):
+            paths.extend(os.path.join(dir_path, name) for name in names)
+        return paths
+    store = PathStore()
+    for dir_path, names in iter_dirs(count):
+        store.add_files(dir_path, names)
+    return store
+
+
+def walk(path1, path2):
+    # 端到端：遍历两个真实的文件夹收集相同路径和缺失的文件，再构建HTML报告使用的文件树
+    same_path_files, diff_info = FolderComparator.collect_file_differences(path1, path2)
+    TreeNode.build_file_tree(same_path_files)
+    TreeNode.build_file_tree(diff_info["1_not_in_2_file"])
+    return len(same_path_files) + len(diff_info["1_not_in_2_file"]) + len(diff_info["2_not_in_1_file"])
+
+
+def run_child(kind, *args):
+    try:
+        import resource
+    except ImportError:
+        resource = None
+        tracemalloc.start()  # 没有resource模块（Windows）时只统计Python分配的内存
+    start = time.perf_counter()
+    if kind == "walk":
+        count = walk(*args)
+    else:
+        count = int(args[0])
+        assert len(build(kind, count)) == count
+    elapsed = time.perf_counter() - start
+    if resource is None:
+        peak = tracemalloc.get_traced_memory()[1]
+    else:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak if sys.platform == "darwin" else peak * 1024
+    print(f"{peak} {elapsed} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较完整路径列表与PathStore在大量路径下的峰值内存")
+    parser.add_argument("counts", nargs="*", type=int, default=[1000000, 10000000, 50000000])
+    parser.add_argument("--max-list", type=int, default=10000000, help="超过该数量时不再测试完整路径列表")
+    parser.add_argument("--walk", nargs=2, metavar=("PATH1", "PATH2"),
+                        help="额外测试遍历两个文件夹并构建文件树的端到端耗时和峰值内存（可用synthetic_tree.py生成）")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(*args.child)
+        return
+    baseline = int(subprocess.check_output([sys.executable, __file__, "--child", "path_store", "0"]).split()[0])
+    print(f"{'路径数':>12} {'方式':>12} {'峰值内存':>12} {'每个路径':>10} {'耗时':>8}")
+    for count in args.counts:
+        for kind in ("list", "path_store"):
+            if kind == "list" and count > args.max_list:
+                continue
+            output = subprocess.check_output([sys.executable, __file__, "--child", kind, str(count)]).split()
+            peak = int(output[0]) - baseline
+            print(f"{count:>12} {kind:>12} {peak / 1024 ** 2:>10.1f}MB {peak / count:>8.1f} B {float(output[1]):>7.2f}s")
+    if args.walk:
+        # 遍历时会输出进度，结果在最后一行
+        output = subprocess.check_output([sys.executable, __file__, "--child", "walk", *args.walk]).splitlines()[-1]
+        peak, elapsed, count = output.split()
+        peak = int(peak) - baseline
+        print(f"{int(count):>12} {'walk':>12} {peak / 1024 ** 2:>10.1f}MB {peak / max(int(count), 1):>8.1f} B "
+              f"{float(elapsed):>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "folder_tools"))
+
+from comparator import FolderComparator, HtmlFileTreePrinter, TreeNode, calculate_sha256  # noqa: E402
+from folder_watcher import scan_tree  # noqa: E402
+from search_file import search_files, search_index  # noqa: E402
+from synthetic_tree import LAYOUTS, generate_pair  # noqa: E402
+
+
+def bench_walk(path1, path2, differences):
+    return len(scan_tree(path1))
+
+
+def bench_hash(path1, path2, differences):
+    files = scan_tree(path1)
+    for rel_path in files:
+        calculate_sha256(os.path.join(path1, rel_path))
+    return len(files)
+
+
+def check_differences(name, found, expected):
+    # 结果与生成测试文件夹时制造的差异不一致时说明被测代码有问题，此时的耗时没有意义
+    found, expected = sorted(found), sorted(expected)
+    if found != expected:
+        raise AssertionError(f"{name}的结果与制造的差异不一致：多出{sorted(set(found) - set(expected))}，"
+                             f"缺少{sorted(set(expected) - set(found))}")
+
+
+def bench_tree_diff(path1, path2, differences):
+    same_path_files, diff_info = FolderComparator.collect_file_differences(path1, path2)
+    check_differences("1_not_in_2_file", diff_info["1_not_in_2_file"], differences["missing"] + differences["renamed"])
+    check_differences("2_not_in_1_file", diff_info["2_not_in_1_file"],
+                      [p + ".extra" for p in differences["extra"]] + [p + ".renamed" for p in differences["renamed"]])
+    check_differences("1_not_in_2_folder", diff_info["1_not_in_2_folder"], [])
+    check_differences("2_not_in_1_folder", diff_info["2_not_in_1_folder"], [])
+    return len(same_path_files) + sum(len(paths) for paths in diff_info.values())
+
+
+def bench_compare(path1, path2, differences):
+    same_path_files, _ = FolderComparator.collect_file_differences(path1, path2)
+    mismatched = FolderComparator.compare_files_in_parallel(same_path_files, path1, path2)
+    check_differences("sha256_not_match", mismatched, differences["modified"])
+    return len(mismatched)
+
+
+def bench_html(path1, path2, differences):
+    paths = list(scan_tree(path1))
+    root = TreeNode.build_file_tree(paths)
+    output_file = HtmlFileTreePrinter.write_html_file(
+        root, HtmlFileTreePrinter.generate_base_path_options([path1]), "bench")
+    size = os.path.getsize(output_file)
+    os.remove(output_file)
+    return size
+
+
+def bench_search(path1, path2, differences):
+    search_files(path1, "file_1_00")
+    return None
+
+
+def bench_search_index(path1, path2, differences):
+    # 第一次运行时建立索引，之后只按文件夹修改时间检查更新
+    search_index(path1, "file_1_00", index_file=path1 + ".index.db")
+    return None
+
+
+BENCHMARKS = {
+    "walk": bench_walk,
+    "hash": bench_hash,
+    "tree_diff": bench_tree_diff,
+    "compare": bench_compare,
+    "html": bench_html,
+    "search": bench_search,
+    "search_index": bench_search_index,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(func, path1, path2, differences, repeat):
+    timings = []
+    items = 0
+    # 屏蔽被测函数的进度输出，同时避免生成的html被打开
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            items = func(path1, path2, differences)
+            timings.append(time.perf_counter() - start)
+    return {"min_seconds": min(timings), "mean_seconds": sum(timings) / len(timings), "runs": repeat, "items": items}
+
+
+def compare_results(old_file, results):
+    with open(old_file, encoding="utf-8") as f:
+        old = json.load(f)
+    print(f"\n与 {old['commit']}（{old_file}）对比：")
+    for key, result in results["results"].items():
+        previous = old["results"].get(key)
+        if previous:
+            ratio = result["min_seconds"] / previous["min_seconds"] if previous["min_seconds"] else float("inf")
+            print(f"{key:>24} {previous['min_seconds']:>10.4f}s -> {result['min_seconds']:>10.4f}s ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="folder_tools 性能测试")
+    parser.add_argument("--layouts", nargs="*", choices=sorted(LAYOUTS), default=["tiny", "deep", "mixed"])
+    parser.add_argument("--benchmarks", nargs="*", choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--scale", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workdir", help="生成测试文件夹的位置，默认使用临时文件夹")
+    parser.add_argument("--output", help="结果JSON路径，默认为 benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="与之前保存的结果JSON对比")
+    args = parser.parse_args()
+
+    HtmlFileTreePrinter.open_in_browser = staticmethod(lambda file_path: None)
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {"scale": args.scale, "seed": args.seed, "repeat": args.repeat},
+        "results": {}
+    }
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for layout in args.layouts:
+            print(f"正在生成 {layout} 测试文件夹...")
+            path1, path2, differences = generate_pair(workdir, layout, args.scale, args.seed)
+            for name in args.benchmarks:
+                result = run_benchmark(BENCHMARKS[name], path1, path2, differences, args.repeat)
+                results["results"][f"{layout}.{name}"] = result
+                print(f"{layout + '.' + name:>24} {result['min_seconds']:>10.4f}s  ({result['items']} items)")
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存：{output}")
+    if args.compare:
+        compare_results(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import random
+import shutil
+
+# 每种布局：(文件夹层数, 每层子文件夹数, 每个文件夹的文件数, 文件大小范围)
+LAYOUTS = {
+    "tiny": (2, 10, 100, (0, 4 * 1024)),
+    "huge": (1, 1, 2, (128 * 1024 * 1024, 256 * 1024 * 1024)),
+    "deep": (10, 2, 2, (0, 16 * 1024)),
+    "mixed": (3, 6, 20, (0, 4 * 1024 * 1024)),
+}
+
+
+def iter_layout(layout, scale=1.0, seed=0):
+    depth, fanout, files_per_dir, (min_size, max_size) = LAYOUTS[layout]
+    rng = random.Random(f"{layout}-{seed}")
+    files_per_dir = max(1, int(files_per_dir * scale)) if layout != "huge" else files_per_dir
+    if layout == "huge":
+        min_size, max_size = int(min_size * scale), int(max_size * scale)
+    stack = [("", 0)]
+    while stack:
+        relative, level = stack.pop()
+        for i in range(files_per_dir):
+            # mixed 布局中大部分是小文件，少量大文件
+            size = rng.randint(min_size, max_size if layout != "mixed" or rng.random() < 0.02 else 16 * 1024)
+            yield os.path.join(relative, f"file_{level}_{i:04d}.dat"), size, rng.getrandbits(64)
+        if level < depth:
+            stack.extend((os.path.join(relative, f"dir_{level}_{i:02d}"), level + 1) for i in range(fanout))
+
+
+def write_file(path, size, content_seed):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rng = random.Random(content_seed)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            chunk = min(remaining, 1024 * 1024)
+            f.write(rng.randbytes(chunk))
+            remaining -= chunk
+
+
+def generate_tree(root, layout, scale=1.0, seed=0):
+    files = []
+    for rel_path, size, content_seed in iter_layout(layout, scale, seed):
+        write_file(os.path.join(root, rel_path), size, content_seed)
+        files.append((rel_path, size))
+    return files
+
+
+def generate_pair(base_dir, layout, scale=1.0, seed=0, difference_rate=0.01):
+    copy1 = os.path.join(base_dir, f"{layout}_1")
+    copy2 = os.path.join(base_dir, f"{layout}_2")
+    for path in (copy1, copy2):
+        if os.path.exists(path):
+            shutil.rmtree(path)
+    files = generate_tree(copy1, layout, scale, seed)
+    shutil.copytree(copy1, copy2)
+    rng = random.Random(f"diff-{layout}-{seed}")
+    count = max(1, int(len(files) * difference_rate))
+    targets = rng.sample(files, min(len(files), count * 4))
+    differences = {"missing": [], "extra": [], "modified": [], "renamed": []}
+    for kind, (rel_path, size) in zip(("missing", "extra", "modified", "renamed") * count, targets):
+        path2 = os.path.join(copy2, rel_path)
+        if kind == "missing":
+            os.remove(path2)
+        elif kind == "extra":
+            write_file(path2 + ".extra", size, rng.getrandbits(64))
+        elif kind == "modified":
+            if size == 0:
+                continue
+            # 大小不变，只修改中间的一个字节
+            with open(path2, "r+b") as f:
+                f.seek(size // 2)
+                byte = f.read(1)
+                f.seek(size // 2)
+                f.write(bytes([byte[0] ^ 0xFF]))
+        else:
+            os.rename(path2, path2 + ".renamed")
+        differences[kind].append(rel_path)
+    return copy1, copy2, differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成用于性能测试的确定性文件夹")
+    parser.add_argument("output", help="输出文件夹")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="mixed")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--difference-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    path1, path2, diff = generate_pair(args.output, args.layout, args.scale, args.seed, args.difference_rate)
+    print(f"已生成：{path1}，{path2}")
+    for name, paths in diff.items():
+        print(f"{name}：{len(paths)}")
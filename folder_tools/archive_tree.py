@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sys
+import tarfile
+import time
+import zipfile
+import zlib
+
+from io_throttle import THROTTLE, read_chunks
+from metrics import METRICS
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ARCHIVE_ERRORS = (OSError, EOFError, RuntimeError, zlib.error, zipfile.BadZipFile, tarfile.TarError)
+HASH_CHUNK_SIZE = 1024 * 1024
+PROGRESS_INTERVAL = 0.1
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+
+class ArchiveTree:
+    # 把zip/tar压缩包当作只读的虚拟文件夹：文件列表来自压缩包目录，成员内容流式解压计算sha256，不写入磁盘
+    def __init__(self, archive_path, with_sha256=False):
+        self.archive_path = archive_path
+        self.is_zip = zipfile.is_zipfile(archive_path)
+        self.files = {}  # 相对路径 -> 大小
+        self.dirs = {"": ([], [])}  # 相对路径 -> (子文件夹名称, 文件名称)
+        self.members = {}  # 相对路径 -> 压缩包中的成员名称
+        self.sha256 = None
+        self.prefix = ""
+        if self.is_zip:
+            self.load_zip()
+        else:
+            self.load_tar(with_sha256)
+        self.build_dirs()
+
+    @staticmethod
+    def open_bases(*base_paths, with_sha256=False):
+        archives = {}
+        for base_path in base_paths:
+            if is_archive(base_path):
+                print(f"正在读取压缩包{base_path}的文件列表中...")
+                archives[base_path] = ArchiveTree(base_path, with_sha256)
+        return archives
+
+    @staticmethod
+    def normalize(name):
+        rel_path = os.path.normpath(name.lstrip("/")).replace("/", os.sep)
+        if rel_path in (".", "") or rel_path.startswith(".." + os.sep) or rel_path == "..":
+            return None  # 忽略指向压缩包外部的成员
+        return rel_path
+
+    def load_zip(self):
+        THROTTLE.before_open()
+        with zipfile.ZipFile(self.archive_path) as zf:
+            # 按成员在压缩包中的位置排序，计算sha256时顺序读取
+            for info in sorted(zf.infolist(), key=lambda item: item.header_offset):
+                rel_path = self.normalize(info.filename)
+                if rel_path is None:
+                    continue
+                if info.is_dir():
+                    self.dirs.setdefault(rel_path, ([], []))
+                else:
+                    self.files[rel_path] = info.file_size
+                    self.members[rel_path] = info.filename
+
+    def load_tar(self, with_sha256):
+        # tar.gz等只能从头解压，需要sha256时在读取文件列表的同一遍中计算，避免再解压一次
+        self.sha256 = {} if with_sha256 else None
+        last_progress = 0.0
+        for rel_path, member, f in self.iter_tar(with_sha256):
+            if member.isdir():
+                self.dirs.setdefault(rel_path, ([], []))
+                continue
+            self.files[rel_path] = member.size
+            self.members[rel_path] = member.name
+            if f is not None:
+                self.sha256[rel_path] = self.hash_member(rel_path, member.size, f)
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    sys.stdout.write(f"\r正在读取压缩包{self.archive_path}，已计算{len(self.sha256)}个文件的sha256")
+                    sys.stdout.flush()
+        if self.sha256:
+            print(f"\r正在读取压缩包{self.archive_path}，已计算{len(self.sha256)}个文件的sha256")
+
+    def iter_tar(self, with_data):
+        THROTTLE.before_open()
+        with tarfile.open(self.archive_path, "r|*") as tf:
+            for member in tf:
+                if not (member.isreg() or member.isdir()):
+                    continue
+                rel_path = self.normalize(member.name)
+                if rel_path is None:
+                    continue
+                yield rel_path, member, tf.extractfile(member) if with_data and member.isreg() else None
+
+    def build_dirs(self):
+        # 压缩包内所有内容都在与压缩包同名的文件夹中时去掉这一层，与解压前的原文件夹对应
+        stem = os.path.basename(self.archive_path)
+        stem = stem[:-len(next(s for s in ARCHIVE_SUFFIXES if stem.lower().endswith(s)))]
+        if self.files and all(path.startswith(stem + os.sep) for path in self.files) and all(
+                path == stem or path.startswith(stem + os.sep) for path in self.dirs if path):
+            self.prefix = stem + os.sep
+            self.files = {path[len(self.prefix):]: size for path, size in self.files.items()}
+            self.members = {path[len(self.prefix):]: name for path, name in self.members.items()}
+            if self.sha256 is not None:
+                self.sha256 = {path[len(self.prefix):]: sha256 for path, sha256 in self.sha256.items()}
+            self.dirs = {path[len(self.prefix):] if path != stem else "": ([], [])
+                         for path in self.dirs if path != ""}
+            self.dirs.setdefault("", ([], []))
+        # 补全压缩包中没有单独记录的上级文件夹
+        for rel_path in list(self.dirs) + list(self.files):
+            parent = os.path.dirname(rel_path)
+            while parent not in self.dirs:
+                self.dirs[parent] = ([], [])
+                parent = os.path.dirname(parent)
+        for rel_path in self.dirs:
+            if rel_path:
+                self.dirs[os.path.dirname(rel_path)][0].append(os.path.basename(rel_path))
+        for rel_path in self.files:
+            self.dirs[os.path.dirname(rel_path)][1].append(os.path.basename(rel_path))
+
+    def walk(self):
+        # 与os.walk相同：自顶向下返回 (路径, 子文件夹, 文件)，调用方可修改子文件夹列表跳过子目录
+        stack = [""]
+        while stack:
+            relative = stack.pop()
+            subdirs, files = self.dirs[relative]
+            dirs = sorted(subdirs)
+            yield os.path.join(self.archive_path, relative) if relative else self.archive_path, dirs, sorted(files)
+            stack.extend(os.path.join(relative, d) if relative else d for d in reversed(dirs))
+
+    def exists(self, path):
+        rel_path = os.path.relpath(path, self.archive_path)
+        return rel_path == "." or rel_path in self.files or rel_path in self.dirs
+
+    def hash_member(self, rel_path, size, f):
+        start = time.perf_counter()
+        sha256 = hashlib.sha256()
+        for data in read_chunks(f, HASH_CHUNK_SIZE):
+            sha256.update(data)
+        METRICS.observe_hash(os.path.join(self.archive_path, rel_path), size, time.perf_counter() - start)
+        return sha256.hexdigest()
+
+    def iter_sha256(self, rel_paths=None):
+        # 按成员在压缩包中的顺序返回 (相对路径, sha256)，单个成员读取失败时sha256为对应的异常
+        if self.sha256 is not None:
+            for rel_path, sha256 in self.sha256.items():
+                if rel_paths is None or rel_path in rel_paths:
+                    yield rel_path, sha256
+            return
+        if not self.is_zip:
+            for rel_path, member, f in self.iter_tar(True):
+                rel_path = rel_path[len(self.prefix):]
+                if f is not None and (rel_paths is None or rel_path in rel_paths):
+                    yield rel_path, self.hash_member(rel_path, member.size, f)
+            return
+        THROTTLE.before_open()
+        with zipfile.ZipFile(self.archive_path) as zf:
+            for rel_path, name in self.members.items():
+                if rel_paths is not None and rel_path not in rel_paths:
+                    continue
+                try:
+                    with zf.open(name) as f:
+                        sha256 = self.hash_member(rel_path, self.files[rel_path], f)
+                except ARCHIVE_ERRORS as e:
+                    sha256 = e
+                yield rel_path, sha256
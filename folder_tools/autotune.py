@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import METRICS
+
+AUTOTUNE_FILE = os.path.join(os.path.expanduser("~"), ".folder_tools", "autotune.json")
+MAX_WORKERS = 64
+DEFAULT_WORKERS = min(os.cpu_count() * 2, MAX_WORKERS)  # 没有调优记录的设备从原来的固定值开始
+TUNE_INTERVAL = 1.0  # 每个测量窗口的最短时长（秒）
+TUNE_TOLERANCE = 0.05  # 吞吐量变化在5%以内视为持平
+FILE_WEIGHT = 64 * 1024  # 每个文件按额外64KB计入吞吐量，小文件为主时打开文件的开销也能体现出来
+
+
+def find_mount_point(path):
+    path = os.path.realpath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class DeviceTuner:
+    # 同一设备上的读取共用一个并发上限，按窗口测量吞吐量，用爬山法逐步调整
+    def __init__(self, mount_point, workers):
+        self.mount_point = mount_point
+        self.limit = max(1, min(MAX_WORKERS, workers))
+        self.best_limit = self.limit
+        self.best_rate = 0.0
+        self.direction = 1
+        self.last_rate = None
+        self.last_latency = None
+        self.active = 0
+        self.queue = deque()
+        self.lock = threading.Lock()
+        self.reset_window()
+
+    def reset_window(self):
+        self.window_start = time.monotonic()
+        self.window_work = 0
+        self.window_tasks = 0
+        self.window_seconds = 0.0
+
+    def submit(self, executor, file_path, fn, *args):
+        future = Future()
+        with self.lock:
+            self.queue.append((future, file_path, fn, args))
+        self.dispatch(executor)
+        return future
+
+    def dispatch(self, executor):
+        with self.lock:
+            while self.active < self.limit and self.queue:
+                item = self.queue.popleft()
+                self.active += 1
+                try:
+                    executor.submit(self.run, executor, *item)
+                except RuntimeError:
+                    # 线程池已关闭，剩余任务不再执行
+                    self.active -= 1
+                    self.cancel_future(item[0])
+
+    def run(self, executor, future, file_path, fn, args):
+        start = time.perf_counter()
+        ran = future.set_running_or_notify_cancel()
+        if ran:
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+        seconds = time.perf_counter() - start
+        size = 0
+        if ran:
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                pass
+        with self.lock:
+            self.active -= 1
+            # 已取消的任务没有读取数据，计入吞吐量会让当前并发数的测量值偏高
+            if ran:
+                self.record(size, seconds)
+        self.dispatch(executor)
+
+    def record(self, size, seconds):
+        self.window_work += size + FILE_WEIGHT
+        self.window_tasks += 1
+        self.window_seconds += seconds
+        elapsed = time.monotonic() - self.window_start
+        # 窗口太短或完成的任务太少时测量值波动太大
+        if elapsed < TUNE_INTERVAL or self.window_tasks < self.limit * 2:
+            return
+        self.adjust(self.window_work / elapsed, self.window_seconds / self.window_tasks)
+        METRICS.gauge(f"workers:{self.mount_point}", self.limit)
+        self.reset_window()
+
+    def adjust(self, rate, latency):
+        if rate > self.best_rate:
+            self.best_rate = rate
+            self.best_limit = self.limit
+        if self.last_rate is not None:
+            if rate < self.last_rate * (1 - TUNE_TOLERANCE):
+                self.direction = -self.direction  # 变差了，往回调整
+            elif rate <= self.last_rate * (1 + TUNE_TOLERANCE) and latency > self.last_latency:
+                self.direction = -1  # 吞吐量持平但延迟升高，说明设备已饱和，减少线程
+        self.last_rate = rate
+        self.last_latency = latency
+        step = max(1, self.limit // 4)
+        limit = max(1, min(MAX_WORKERS, self.limit + step * self.direction))
+        if limit == self.limit:
+            self.direction = -self.direction
+        self.limit = limit
+
+    @staticmethod
+    def cancel_future(future):
+        # 只调用cancel()时wait()不会把它视为已完成，需要同时通知等待者
+        if future.cancel():
+            future.set_running_or_notify_cancel()
+
+    def cancel(self):
+        with self.lock:
+            while self.queue:
+                self.cancel_future(self.queue.popleft()[0])
+
+
+class ConcurrencyTuner:
+    # 按所在挂载点为每个基础路径分组，不同设备各自调整读取线程数，调优结果按挂载点保存供下次使用
+    def __init__(self, base_paths, tune_file=None):
+        self.tune_file = tune_file or AUTOTUNE_FILE
+        saved = self.load(self.tune_file)
+        self.devices = {}
+        self.bases = {}
+        for base_path in base_paths:
+            mount_point = find_mount_point(base_path)
+            if mount_point not in self.devices:
+                self.devices[mount_point] = DeviceTuner(mount_point, saved.get(mount_point, DEFAULT_WORKERS))
+            self.bases[base_path] = self.devices[mount_point]
+        self.executor = ThreadPoolExecutor(max_workers=MAX_WORKERS * len(self.devices))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def load(tune_file):
+        try:
+            with open(tune_file, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def submit(self, base_path, file_path, fn, *args):
+        return self.bases[base_path].submit(self.executor, file_path, fn, *args)
+
+    def total_workers(self):
+        return sum(device.limit for device in self.devices.values())
+
+    def close(self):
+        for device in self.devices.values():
+            device.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.save()
+
+    def save(self):
+        tuned = {mount_point: device.best_limit for mount_point, device in self.devices.items() if device.best_rate}
+        if not tuned:
+            return
+        saved = self.load(self.tune_file)
+        saved.update(tuned)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.tune_file)), exist_ok=True)
+            with open(self.tune_file + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(saved, f, ensure_ascii=False, indent=2)
+            os.replace(self.tune_file + ".tmp", self.tune_file)
+        except OSError as e:
+            print(f"\n保存并发调优结果失败：{self.tune_file} - {str(e)}")
+            return
+        for mount_point, device in self.devices.items():
+            if device.best_rate:
+                print(f"\n{mount_point}：最佳读取线程数{device.best_limit}"
+                      f"（{device.best_rate / 1024 / 1024:.2f} MB/s），已保存到{self.tune_file}")
@@ -1,61 +1,100 @@
+import asyncio
+import gzip
 import hashlib
+import io
+import json
 import os
 import sys
 import tempfile
 import threading
+import time
 import webbrowser
-from collections import OrderedDict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass
+from functools import partial
 from typing import LiteralString
 
+from archive_tree import ArchiveTree, is_archive
+from autotune import ConcurrencyTuner
+from delta_report import DELTA_MIN_SIZE, analyze_mismatched_files
+from io_throttle import THROTTLE, prompt_limits, read_chunks
+from metrics import METRICS, prompt_metrics, run_with_metrics
+from path_store import PathStore
+from sampling import STATE_FILE as SAMPLE_STATE_FILE, SampleVerifier, prompt_sample
+
+AGENT_SCHEME = "agent://"
+PROGRESS_INTERVAL = 0.1  # 进度事件的最小间隔（秒）
+# sha256文件夹中由比对工具生成的状态文件：文件夹摘要、抽样记录、快照（snapshot.SNAPSHOT_DIR）
+TOOL_STATE_FILES = ("tree_digest.tsv", os.path.basename(SAMPLE_STATE_FILE))
+TOOL_STATE_DIRS = ("snapshots",)
+SAMPLE_RANGE_THRESHOLD = 64 * 1024 * 1024  # 超过该大小的文件抽样校验时只比对部分区间
+SAMPLE_RANGE_SIZE = 1024 * 1024
+SAMPLE_RANGE_COUNT = 4
+PIPELINE_QUEUE_DEPTH = 2  # 计算大文件sha256时提前读取的数据块数量，0表示不启用读取线程
+PIPELINE_MIN_SIZE = 64 * 1024 * 1024
+HTML_BATCH_SIZE = 10000  # 生成HTML报告时每批序列化并写入的节点数
+HTML_DATA_SLOT = "\0"  # 模板中树数据和搜索索引的位置，写入时按此拆分模板
+
 
 class TreeNode:
+    __slots__ = ("name", "children", "original_path")
+
     def __init__(self, name):
         self.name = name
-        self.children = OrderedDict()
+        self.children = {}
         self.original_path = ""
 
     def get_original_path(self):
         return self.original_path
 
-    def get_compressed_name(self):
-        path = [self.name]
-        current = self
-        full_path = self.original_path
-        while len(current.children) == 1:
-            child = next(iter(current.children.values()))
-            path.append(child.name)
-            if child.original_path:
-                full_path = child.original_path
-            current = child
-        self.original_path = full_path
-        return "/".join(path)
-
-    def get_actual_children(self):
-        current = self
-        while len(current.children) == 1:
-            child = next(iter(current.children.values()))
-            if child.original_path:
-                self.original_path = child.original_path
-            current = child
-        return current.children
+    def compress(self):
+        # 构建完成后一次性合并只有一个子节点的链，并按名称排序子节点，之后遍历时无需重复处理
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            children = {}
+            for name in sorted(node.children):
+                child = node.children[name]
+                while len(child.children) == 1:
+                    (grandchild,) = child.children.values()
+                    child.name = f"{child.name}/{grandchild.name}"
+                    child.children = grandchild.children
+                    child.original_path = grandchild.original_path or child.original_path
+                children[child.name] = child
+                stack.append(child)
+            node.children = children
 
     @classmethod
     def build_file_tree(cls, paths):
-        if not paths:
-            return None
-        normalized_paths = sorted([p.replace("\\", "/") for p in paths])
         root = TreeNode("")
-        for path in normalized_paths:
-            parts = path.split("/")
-            current = root
-            for part in parts:
-                if part not in current.children:
-                    current.children[part] = TreeNode(part)
-                current = current.children[part]
-            current.original_path = path
+        last_dir, prefix, current = None, "", root
+        for dir_path, name in paths.iter_parts() if isinstance(paths, PathStore) else cls.split_paths(paths):
+            # 同一文件夹下的文件通常是连续的，只在文件夹变化时从根节点重新查找
+            if dir_path != last_dir:
+                last_dir, current = dir_path, root
+                prefix = dir_path.replace("\\", "/") + "/" if dir_path else ""
+                for part in prefix.split("/")[:-1]:
+                    child = current.children.get(part)
+                    if child is None:
+                        child = current.children[part] = TreeNode(part)
+                    current = child
+            node = current.children.get(name)
+            if node is None:
+                node = current.children[name] = TreeNode(name)
+            node.original_path = prefix + name
+        if not root.children:
+            return None
+        root.compress()
         return root
 
+    @staticmethod
+    def split_paths(paths):
+        for path in paths:
+            dir_path, _, name = path.replace("\\", "/").rpartition("/")
+            yield dir_path, name
+
 
 class HtmlFileTreePrinter:
     HTML_TEMPLATE = r"""
@@ -140,11 +179,21 @@ class HtmlFileTreePrinter:
                         padding: 10px 0;
                     }
 
+                    .tree-spacer {
+                        position: relative;
+                    }
+
                     .tree-item {
-                        padding: 12px 20px;
+                        position: absolute;
+                        left: 0;
+                        right: 0;
+                        height: 40px;
+                        padding: 0 20px;
                         display: flex;
                         align-items: center;
                         cursor: pointer;
+                        white-space: nowrap;
+                        overflow: hidden;
                         transition: background-color 0.2s;
                     }
 
@@ -168,19 +217,13 @@ class HtmlFileTreePrinter:
                     .tree-item span {
                         font-size: 14px;
                         color: #333;
-                    }
-
-                    .tree-content {
-                        margin-left: 20px;
-                        border-left: 1px solid #f0f0f0;
-                    }
-
-                    .hidden {
-                        display: none;
+                        overflow: hidden;
+                        text-overflow: ellipsis;
                     }
 
                     .arrow {
                         display: inline-block;
+                        flex-shrink: 0;
                         width: 8px;
                         height: 8px;
                         border-right: 2px solid #888;
@@ -241,7 +284,7 @@ class HtmlFileTreePrinter:
                         </div>
                     </div>
                     <div class="tree-container" id="fileTree">
-                        %s
+                        <div class="tree-spacer" id="treeSpacer"></div>
                     </div>
                     <div class="no-results">
                         未找到相关内容
@@ -257,112 +300,223 @@ class HtmlFileTreePrinter:
                     </div>
                 </div>
 
+                <script type="application/json" id="treeData">%s</script>
+                <script type="application/json" id="searchIndex">%s</script>
                 <script>
                     document.addEventListener('DOMContentLoaded', function() {
-                        // 初始化时隐藏所有子目录（第一层除外）
-                        document.querySelectorAll('.tree-content').forEach(content => {
-                            const level = getLevel(content);
-                            if (level > 1) {
-                                content.classList.add('hidden');
+                        const ROW_HEIGHT = 40;
+                        const OVERSCAN = 20;
+                        const SEARCH_DELAY = 150;
+                        const container = document.getElementById('fileTree');
+                        const spacer = document.getElementById('treeSpacer');
+                        const noResults = document.querySelector('.no-results');
+                        const searchInput = document.getElementById('searchInput');
+
+                        // 按先序排列的节点，每个节点依次为 深度 * 2 + 是否为文件夹、名称
+                        const data = JSON.parse(document.getElementById('treeData').textContent);
+                        const count = data.length >> 1;
+                        const names = new Array(count);
+                        const parents = new Int32Array(count);
+                        const depths = new Int32Array(count);
+                        const folders = new Uint8Array(count);
+                        const children = [], roots = [], ancestors = [];
+                        for (let id = 0; id < count; id++) {
+                            const depth = data[2 * id] >> 1;
+                            const parent = depth ? ancestors[depth - 1] : -1;
+                            names[id] = data[2 * id + 1];
+                            folders[id] = data[2 * id] & 1;
+                            depths[id] = depth;
+                            parents[id] = parent;
+                            children.push(folders[id] ? [] : null);
+                            (parent < 0 ? roots : children[parent]).push(id);
+                            ancestors.length = depth;
+                            ancestors.push(id);
+                        }
+
+                        // 预先生成的小写名称，按节点编号以换行分隔，搜索时直接在整个字符串上查找
+                        const searchText = JSON.parse(document.getElementById('searchIndex').textContent);
+                        const lowerNames = searchText.split('\n');
+                        const lineStarts = new Uint32Array(lowerNames.length + 1);
+                        for (let i = 0; i < lowerNames.length; i++) {
+                            lineStarts[i + 1] = lineStarts[i] + lowerNames[i].length + 1;
+                        }
+
+                        // 初始时只展开第一层文件夹
+                        const expanded = new Uint8Array(names.length);
+                        roots.forEach(id => {
+                            if (folders[id]) {
+                                expanded[id] = 1;
                             }
                         });
 
-                        // 获取元素的层级
-                        function getLevel(element) {
-                            let level = 0;
-                            let current = element;
-                            while (current && !current.id.includes('fileTree')) {
-                                if (current.classList.contains('tree-content')) {
-                                    level++;
-                                }
-                                current = current.parentElement;
-                            }
-                            return level;
+                        let rows = [];
+                        const matched = new Uint8Array(names.length);
+                        let searching = false;
+                        let marked = [];
+                        let lastQuery = '';
+                        let lastHits = null;
+                        let searchTimer = null;
+                        let renderedFirst = -1;
+                        let renderedLast = -1;
+
+                        function escapeHtml(text) {
+                            return text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
                         }
 
                         // 获取节点的完整路径
-                        function getNodePath(element) {
+                        function getNodePath(id) {
                             const parts = [];
-                            let current = element;
-                            while (current && !current.id.includes('fileTree')) {
-                                if (current.classList.contains('tree-item')) {
-                                    const nameSpan = current.querySelector('span:not(.arrow)');
-                                    if (nameSpan) {
-                                        parts.unshift(nameSpan.textContent);
-                                    }
-                                }
-                                current = current.parentElement;
+                            for (let current = id; current >= 0; current = parents[current]) {
+                                parts.unshift(names[current]);
                             }
                             return parts.join('/');
                         }
 
-                        // 处理文件点击
-                        document.querySelectorAll('.tree-item.file').forEach(item => {
-                            item.addEventListener('click', function(e) {
-                                e.stopPropagation();
-                                const basePath = document.getElementById('basePathSelect').value;
-                                const relativePath = this.getAttribute('data-path');
-                                if (relativePath) {
-                                    const fullPath = basePath + '/' + relativePath;
-                                    window.open('file:///' + fullPath.replace(/\\/g, '/'), '_blank');
+                        // 根据展开状态和搜索结果重新计算可见的行
+                        function rebuildRows() {
+                            rows = [];
+                            const stack = roots.slice().reverse();
+                            while (stack.length) {
+                                const id = stack.pop();
+                                if (searching && !matched[id]) {
+                                    continue;
                                 }
-                            });
-                        });
-
-                        // 处理文件夹点击
-                        document.querySelectorAll('.tree-item:not(.file)').forEach(item => {
-                            item.addEventListener('click', function(e) {
-                                e.stopPropagation();
-                                const content = this.nextElementSibling;
-                                if (content && content.classList.contains('tree-content')) {
-                                    content.classList.toggle('hidden');
-                                    const arrow = this.querySelector('.arrow');
-                                    if (arrow) {
-                                        arrow.classList.toggle('expanded');
+                                rows.push(id);
+                                if (folders[id] && expanded[id]) {
+                                    const list = children[id];
+                                    for (let i = list.length - 1; i >= 0; i--) {
+                                        stack.push(list[i]);
                                     }
                                 }
-                            });
-                        });
+                            }
+                            spacer.style.height = rows.length * ROW_HEIGHT + 'px';
+                            noResults.style.display = rows.length ? 'none' : 'block';
+                            document.getElementById('visibleCount').textContent = rows.length;
+                            render(true);
+                        }
 
-                        // 更新计数
-                        function updateCounts() {
-                            const total = document.querySelectorAll('.tree-item').length;
-                            const visible = document.querySelectorAll('.tree-item:not([style*="display: none"])').length;
-                            document.getElementById('totalCount').textContent = total;
-                            document.getElementById('visibleCount').textContent = visible;
+                        // 只渲染可视区域及其上下少量的行
+                        function render(force) {
+                            const first = Math.max(0, Math.floor(container.scrollTop / ROW_HEIGHT) - OVERSCAN);
+                            const last = Math.min(rows.length,
+                                Math.ceil((container.scrollTop + container.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+                            if (!force && first === renderedFirst && last === renderedLast) {
+                                return;
+                            }
+                            renderedFirst = first;
+                            renderedLast = last;
+                            const html = [];
+                            for (let i = first; i < last; i++) {
+                                const id = rows[i];
+                                html.push('<div class="tree-item' + (folders[id] ? '' : ' file') + '" data-id="' + id +
+                                    '" style="top: ' + i * ROW_HEIGHT + 'px; padding-left: ' + (20 + depths[id] * 20) + 'px">' +
+                                    (folders[id] ? '<span class="arrow' + (expanded[id] ? ' expanded' : '') + '"></span><i>📁</i>' : '<i>📄</i>') +
+                                    '<span>' + escapeHtml(names[id]) + '</span></div>');
+                            }
+                            spacer.innerHTML = html.join('');
                         }
 
-                        // 初始计数
-                        updateCounts();
+                        let scheduled = false;
+                        container.addEventListener('scroll', function() {
+                            if (!scheduled) {
+                                scheduled = true;
+                                requestAnimationFrame(function() {
+                                    scheduled = false;
+                                    render(false);
+                                });
+                            }
+                        });
+                        window.addEventListener('resize', function() {
+                            render(false);
+                        });
 
-                        // 搜索功能
-                        const searchInput = document.getElementById('searchInput');
-                        const noResults = document.querySelector('.no-results');
+                        // 处理文件和文件夹点击
+                        spacer.addEventListener('click', function(e) {
+                            const item = e.target.closest('.tree-item');
+                            if (!item) {
+                                return;
+                            }
+                            const id = Number(item.getAttribute('data-id'));
+                            if (folders[id]) {
+                                expanded[id] ^= 1;
+                                rebuildRows();
+                                return;
+                            }
+                            const basePath = document.getElementById('basePathSelect').value;
+                            const fullPath = basePath + '/' + getNodePath(id);
+                            window.open('file:///' + fullPath.replace(/\\/g, '/'), '_blank');
+                        });
 
-                        searchInput.addEventListener('input', function() {
-                            const searchText = this.value.toLowerCase();
-                            let hasResults = false;
-
-                            document.querySelectorAll('.tree-item').forEach(item => {
-                                const itemText = item.textContent.toLowerCase();
-                                const shouldShow = itemText.includes(searchText);
-
-                                if (shouldShow) {
-                                    hasResults = true;
-                                    item.style.display = '';
-                                    let parent = item.parentElement;
-                                    while (parent && parent.classList.contains('tree-content')) {
-                                        parent.classList.remove('hidden');
-                                        parent = parent.parentElement;
-                                    }
+                        // 根据字符位置二分查找所在的节点
+                        function findLine(pos) {
+                            let low = 0, high = lowerNames.length - 1;
+                            while (low < high) {
+                                const mid = (low + high + 1) >> 1;
+                                if (lineStarts[mid] <= pos) {
+                                    low = mid;
                                 } else {
-                                    item.style.display = 'none';
+                                    high = mid - 1;
                                 }
-                            });
+                            }
+                            return low;
+                        }
+
+                        function searchIds(query, candidates) {
+                            if (candidates) {
+                                return candidates.filter(id => lowerNames[id].includes(query));
+                            }
+                            const hits = [];
+                            let pos = searchText.indexOf(query);
+                            while (pos >= 0) {
+                                const id = findLine(pos);
+                                hits.push(id);
+                                pos = searchText.indexOf(query, lineStarts[id + 1]);
+                            }
+                            return hits;
+                        }
+
+                        // 搜索功能：显示匹配的项及其所有上级文件夹，只重置上次标记过的节点
+                        function applySearch(query) {
+                            marked.forEach(id => matched[id] = 0);
+                            marked = [];
+                            searching = Boolean(query);
+                            if (searching) {
+                                // 新的关键字包含上次的关键字时，只需在上次的结果中继续筛选
+                                const narrowed = lastHits && query.includes(lastQuery);
+                                const hits = searchIds(query, narrowed ? lastHits : null);
+                                hits.forEach(id => {
+                                    if (!matched[id]) {
+                                        matched[id] = 1;
+                                        marked.push(id);
+                                    }
+                                    for (let parent = parents[id]; parent >= 0; parent = parents[parent]) {
+                                        expanded[parent] = 1;
+                                        if (matched[parent]) {
+                                            break;
+                                        }
+                                        matched[parent] = 1;
+                                        marked.push(parent);
+                                    }
+                                });
+                                lastHits = hits;
+                            } else {
+                                lastHits = null;
+                            }
+                            lastQuery = query;
+                            container.scrollTop = 0;
+                            rebuildRows();
+                        }
 
-                            noResults.style.display = hasResults ? 'none' : 'block';
-                            updateCounts();
+                        searchInput.addEventListener('input', function() {
+                            const query = this.value.toLowerCase();
+                            clearTimeout(searchTimer);
+                            searchTimer = setTimeout(function() {
+                                applySearch(query);
+                            }, SEARCH_DELAY);
                         });
+
+                        document.getElementById('totalCount').textContent = names.length;
+                        rebuildRows();
                     });
                 </script>
             </body>
@@ -370,14 +524,18 @@ class HtmlFileTreePrinter:
     """
 
     @classmethod
-    def print(cls, paths, base_paths, title):
-        root = TreeNode.build_file_tree(paths)
-        if not root:
-            return
-        base_options = cls.generate_base_path_options(base_paths)
-        html_content = cls.generate_html_tree(root, base_options, title)
-        output_file = cls.write_html_file(html_content)
-        cls.open_in_browser(output_file)
+    def print(cls, paths, base_paths, title, compress=False):
+        # compress为True时报告写入.html.gz，不自动打开浏览器
+        with METRICS.phase("render"):
+            root = TreeNode.build_file_tree(paths)
+            if not root:
+                return
+            base_options = cls.generate_base_path_options(base_paths)
+            output_file = cls.write_html_file(root, base_options, title, compress)
+        if compress:
+            print(f"HTML报告已保存：{output_file}")
+        else:
+            cls.open_in_browser(output_file)
 
     @staticmethod
     def generate_base_path_options(base_paths):
@@ -390,38 +548,79 @@ class HtmlFileTreePrinter:
 
     @classmethod
     def generate_html_tree(cls, node, base_options, title):
-        sb = []
-        cls.generate_html_tree_content(node, sb)
-        return cls.HTML_TEMPLATE % (title, title, "".join(sb), base_options)
+        f = io.StringIO()
+        cls.write_html_tree(f, node, base_options, title)
+        return f.getvalue()
 
     @classmethod
-    def generate_html_tree_content(cls, node, sb):
-        if not node.name:
-            for child in node.children.values():
-                cls.generate_html_tree_content(child, sb)
-            return
-        display_name = node.get_compressed_name()
-        has_children = bool(node.get_actual_children())
-        sb.append(f'<div class="tree-item{" file" if not has_children else ""}" '
-                  f'data-path="{node.get_original_path()}">')
-        if has_children:
-            sb.append('<span class="arrow"></span>')
-        sb.append(f'<i>{"📁" if has_children else "📄"}</i>')
-        sb.append(f'<span>{display_name}</span></div>')
-        if has_children:
-            sb.append('<div class="tree-content">')
-            for child in node.get_actual_children().values():
-                cls.generate_html_tree_content(child, sb)
-            sb.append('</div>')
+    def write_html_tree(cls, f, node, base_options, title):
+        head, middle, tail = (cls.HTML_TEMPLATE % (title, title, base_options, HTML_DATA_SLOT, HTML_DATA_SLOT)
+                              ).split(HTML_DATA_SLOT)
+        # 按批序列化节点并直接写入文件，内存中不会拼出整个文档
+        f.write(head)
+        f.writelines(cls.iter_tree_data(node))
+        f.write(middle)
+        f.writelines(cls.iter_search_index(node))
+        f.write(tail)
 
     @staticmethod
-    def write_html_file(content):
+    def iter_node_batches(root):
+        # 先序遍历，与页面中的节点编号顺序一致；每批返回深度列表和节点列表，不为每个节点创建元组，避免频繁触发垃圾回收
+        depths = []
+        nodes = []
+        stack = [iter(root.children.values())]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                continue
+            depths.append(len(stack) - 1)
+            nodes.append(node)
+            if node.children:
+                stack.append(iter(node.children.values()))
+            if len(nodes) >= HTML_BATCH_SIZE:
+                yield depths, nodes
+                depths = []
+                nodes = []
+        if nodes:
+            yield depths, nodes
+
+    @classmethod
+    def iter_tree_data(cls, root):
+        # 每个节点输出 深度 * 2 + 是否为文件夹、名称 两项，不受目录层数限制
+        separator = "["
+        for depths, nodes in cls.iter_node_batches(root):
+            items = [None] * (len(nodes) * 2)
+            items[0::2] = [depth * 2 + bool(node.children) for depth, node in zip(depths, nodes)]
+            items[1::2] = [node.name for node in nodes]
+            yield separator + cls.to_script_json(items)[1:-1]
+            separator = ","
+        yield "]" if separator == "," else "[]"
+
+    @classmethod
+    def iter_search_index(cls, root):
+        # 所有名称的小写形式以换行分隔，整体作为一个JSON字符串
+        separator = '"'
+        for _, nodes in cls.iter_node_batches(root):
+            names = "\n".join([node.name.replace("\n", " ") for node in nodes]).lower()
+            yield separator + cls.to_script_json(names)[1:-1]
+            separator = "\\n"
+        yield '"'
+
+    @staticmethod
+    def to_script_json(data):
+        # "<" 转义后JSON中不会出现 </script>
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace("<", "\\u003c")
+
+    @classmethod
+    def write_html_file(cls, node, base_options, title, compress=False):
         try:
-            with tempfile.NamedTemporaryFile(
-                    mode="w", encoding="utf-8", suffix=".html", delete=False
-            ) as f:
-                f.write(content)
-                return f.name
+            with tempfile.NamedTemporaryFile(suffix=".html.gz" if compress else ".html", delete=False) as f:
+                file_path = f.name
+            with (gzip.open(file_path, "wt", encoding="utf-8", compresslevel=6) if compress
+                  else open(file_path, "w", encoding="utf-8")) as f:
+                cls.write_html_tree(f, node, base_options, title)
+            return file_path
         except Exception as e:
             raise RuntimeError("生成HTML文件失败") from e
 
@@ -433,9 +632,361 @@ class HtmlFileTreePrinter:
             raise RuntimeError("打开浏览器失败") from e
 
 
+class MoveDetector:
+    @staticmethod
+    def detect_moves(base_path1, base_path2, diff_info, ig_ls=None):
+        print("正在检测移动/重命名的文件中...")
+        unmatched1, owners1 = MoveDetector.collect_unmatched_files(
+            base_path1, diff_info["1_not_in_2_folder"], diff_info["1_not_in_2_file"], ig_ls)
+        unmatched2, owners2 = MoveDetector.collect_unmatched_files(
+            base_path2, diff_info["2_not_in_1_folder"], diff_info["2_not_in_1_file"], ig_ls)
+        sizes1 = MoveDetector.group_by_size(unmatched1)
+        sizes2 = MoveDetector.group_by_size(unmatched2)
+        # 只有另一侧存在相同大小的文件才需要计算sha256，空文件无法区分，不参与匹配
+        common_sizes = (sizes1.keys() & sizes2.keys()) - {0}
+        candidates = [(base_path1, rel_path) for size in common_sizes for rel_path in sizes1[size]]
+        candidates += [(base_path2, rel_path) for size in common_sizes for rel_path in sizes2[size]]
+        hashes = MoveDetector.hash_candidates(candidates)
+        index1 = defaultdict(list)
+        index2 = defaultdict(list)
+        for size in common_sizes:
+            for rel_path in sizes1[size]:
+                index1[(size, hashes[(base_path1, rel_path)])].append(rel_path)
+            for rel_path in sizes2[size]:
+                index2[(size, hashes[(base_path2, rel_path)])].append(rel_path)
+        moves = []
+        for key in index1.keys() & index2.keys():
+            moves.extend(MoveDetector.pair_paths(index1[key], index2[key]))
+        moves.sort()
+        MoveDetector.remove_moved(diff_info["1_not_in_2_folder"], diff_info["1_not_in_2_file"],
+                                  {rel1 for rel1, _ in moves}, unmatched1, owners1)
+        MoveDetector.remove_moved(diff_info["2_not_in_1_folder"], diff_info["2_not_in_1_file"],
+                                  {rel2 for _, rel2 in moves}, unmatched2, owners2)
+        return moves
+
+    @staticmethod
+    def collect_unmatched_files(base_path, missing_folders, missing_files, ig_ls=None):
+        unmatched = {}
+        owners = {}  # 缺失文件夹下的文件 -> 所属的缺失文件夹
+        for rel_path in missing_files:
+            try:
+                unmatched[rel_path] = os.path.getsize(os.path.join(base_path, rel_path))
+            except OSError:
+                pass
+        for folder in missing_folders:
+            for root, dirs, files in os.walk(os.path.join(base_path, folder)):
+                if ig_ls:
+                    dirs[:] = [d for d in dirs if d not in ig_ls]
+                relative = os.path.relpath(root, base_path)
+                for file in files:
+                    rel_path = os.path.join(relative, file)
+                    try:
+                        unmatched[rel_path] = os.path.getsize(os.path.join(root, file))
+                    except OSError:
+                        continue
+                    owners[rel_path] = folder
+        return unmatched, owners
+
+    @staticmethod
+    def group_by_size(unmatched):
+        sizes = defaultdict(list)
+        for rel_path, size in unmatched.items():
+            sizes[size].append(rel_path)
+        return sizes
+
+    @staticmethod
+    def hash_candidates(candidates):
+        hashes = {}
+        if not candidates:
+            return hashes
+        with ThreadPoolExecutor(max_workers=os.cpu_count() * 2) as executor:
+            futures = {executor.submit(calculate_sha256, os.path.join(base_path, rel_path)): (base_path, rel_path)
+                       for base_path, rel_path in candidates}
+            for future in as_completed(futures):
+                hashes[futures[future]] = future.result()
+        return hashes
+
+    @staticmethod
+    def pair_paths(paths1, paths2):
+        # 内容相同的文件按文件名配对（移动）；名称不同时只有两侧各剩一个才能确定是重命名，多个时无法判断对应关系，不配对
+        pairs = []
+        by_name = defaultdict(list)
+        for rel_path in sorted(paths2, reverse=True):
+            by_name[os.path.basename(rel_path)].append(rel_path)
+        matched2 = set()
+        remaining1 = []
+        for rel_path in sorted(paths1):
+            same_name = by_name.get(os.path.basename(rel_path))
+            if same_name:
+                match = same_name.pop()
+                matched2.add(match)
+                pairs.append((rel_path, match))
+            else:
+                remaining1.append(rel_path)
+        remaining2 = [rel_path for rel_path in paths2 if rel_path not in matched2]
+        if len(remaining1) == 1 and len(remaining2) == 1:
+            pairs.append((remaining1[0], remaining2[0]))
+        return pairs
+
+    @staticmethod
+    def remove_moved(missing_folders, missing_files, moved, unmatched, owners):
+        kept = [rel_path for rel_path in missing_files if rel_path not in moved]
+        missing_files.clear()
+        missing_files.extend(kept)
+        touched_folders = {owners[rel_path] for rel_path in moved if rel_path in owners}
+        if not touched_folders:
+            return
+        # 部分文件被移动的缺失文件夹，展开为其中仍然缺失的文件
+        missing_folders[:] = [folder for folder in missing_folders if folder not in touched_folders]
+        missing_files.extend(rel_path for rel_path in unmatched
+                             if owners.get(rel_path) in touched_folders and rel_path not in moved)
+
+    @staticmethod
+    def print_moves(base_path1, base_path2, moves, compress=False):
+        if not moves:
+            print("未检测到移动/重命名的文件。")
+            return
+        print(f"检测到{len(moves)}个移动/重命名的文件（详情见弹出的html）：")
+        for rel1, rel2 in moves:
+            print(f"{rel1} -> {rel2}")
+        HtmlFileTreePrinter.print([rel2 for _, rel2 in moves], [base_path2],
+                                  f"{base_path1}与{base_path2}中移动/重命名的文件", compress)
+
+
+class TreeDigest:
+    DIGEST_FILE = os.path.join("sha256", "tree_digest.tsv")
+    # 文件名中可能包含制表符和换行符，保存时转义，避免破坏按行、按制表符分隔的格式
+    ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+    UNESCAPES = {"t": "\t", "n": "\n", "r": "\r"}
+
+    def __init__(self, files, dirs=None, errors=None):
+        self.files = files  # 相对路径 -> (大小, 修改时间, sha256)
+        self.errors = errors or {}  # 读取失败的文件 -> 错误信息，不参与所在文件夹的摘要
+        self.dirs = {}  # 相对路径 -> (大小, 摘要)
+        self.children = defaultdict(list)  # 相对路径 -> [(名称, 是否文件夹)]
+        for rel_path in dirs or ():
+            self.add_dir(rel_path)
+        for rel_path in files:
+            parent, name = TreeDigest.split(rel_path)
+            self.add_dir(parent)
+            self.children[parent].append((name, False))
+        self.compute_dir_digests()
+
+    @staticmethod
+    def split(rel_path):
+        parent, _, name = rel_path.replace("\\", "/").rpartition("/")
+        return parent, name
+
+    def add_dir(self, rel_path):
+        while rel_path not in self.dirs:
+            self.dirs[rel_path] = None
+            if not rel_path:
+                break
+            parent, name = TreeDigest.split(rel_path)
+            self.children[parent].append((name, True))
+            rel_path = parent
+
+    def compute_dir_digests(self):
+        # 自底向上计算：文件夹摘要 = sha256(按名称排序的子项名称、大小、摘要)
+        for rel_path in sorted(self.dirs, key=lambda p: p.count("/") + bool(p), reverse=True):
+            sha256 = hashlib.sha256()
+            total_size = 0
+            for name, is_dir in sorted(self.children[rel_path]):
+                child = f"{rel_path}/{name}" if rel_path else name
+                size, digest = self.dirs[child] if is_dir else (self.files[child][0], self.files[child][2])
+                total_size += size
+                sha256.update(f"{'D' if is_dir else 'F'}\t{name}\t{size}\t{digest}\n".encode("utf-8"))
+            self.dirs[rel_path] = (total_size, sha256.hexdigest())
+
+    @classmethod
+    def build(cls, base_path, ig_ls=None, previous=None):
+        files = {}
+        dirs = []
+        errors = {}
+        to_hash = []
+        for root, sub_dirs, names in os.walk(base_path):
+            sub_dirs[:] = [d for d in sub_dirs if d != "sha256" and not (ig_ls and d in ig_ls)]
+            relative = os.path.relpath(root, base_path).replace("\\", "/")
+            relative = "" if relative == "." else relative
+            dirs.append(relative)
+            for name in names:
+                rel_path = f"{relative}/{name}" if relative else name
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                cached = previous.files.get(rel_path) if previous else None
+                # 大小和修改时间未变化的文件直接复用上次的sha256
+                if cached and cached[2] and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+                    files[rel_path] = cached
+                else:
+                    files[rel_path] = (stat.st_size, stat.st_mtime_ns, None)
+                    to_hash.append(rel_path)
+        if to_hash:
+            with ThreadPoolExecutor(max_workers=os.cpu_count() * 2) as executor:
+                futures = {executor.submit(calculate_sha256, os.path.join(base_path, rel_path)): rel_path
+                           for rel_path in to_hash}
+                for future in as_completed(futures):
+                    rel_path = futures[future]
+                    try:
+                        sha256 = future.result()
+                        if not sha256:
+                            raise FileNotFoundError("文件已不存在")
+                    except OSError as e:
+                        # 单个文件读取失败时记录错误并继续，该文件不计入摘要，也不会被保存，下次重新计算
+                        print(f"计算sha256失败：{os.path.join(base_path, rel_path)} - {str(e)}")
+                        errors[rel_path] = str(e)
+                        del files[rel_path]
+                        continue
+                    files[rel_path] = (*files[rel_path][:2], sha256)
+        return cls(files, dirs, errors)
+
+    @classmethod
+    def load(cls, base_path):
+        digest_file = os.path.join(base_path, cls.DIGEST_FILE)
+        if not os.path.isfile(digest_file):
+            return None
+        with open(digest_file, encoding="utf-8") as f:
+            return cls.from_lines(f)
+
+    @classmethod
+    def from_lines(cls, lines):
+        files = {}
+        dirs = []
+        errors = {}
+        for line in lines:
+            kind, rel_path, size, mtime, digest = line.rstrip("\n").split("\t")
+            rel_path = TreeDigest.unescape(rel_path)
+            if kind == "F":
+                files[rel_path] = (int(size), int(mtime), digest)
+            elif kind == "E":
+                errors[rel_path] = TreeDigest.unescape(digest)
+            else:
+                dirs.append(rel_path)
+        return cls(files, dirs, errors)
+
+    def to_lines(self):
+        for rel_path, (size, digest) in sorted(self.dirs.items()):
+            yield f"D\t{rel_path.translate(self.ESCAPES)}\t{size}\t0\t{digest}\n"
+        for rel_path, (size, mtime, digest) in sorted(self.files.items()):
+            yield f"F\t{rel_path.translate(self.ESCAPES)}\t{size}\t{mtime}\t{digest}\n"
+        for rel_path, message in sorted(self.errors.items()):
+            yield f"E\t{rel_path.translate(self.ESCAPES)}\t0\t0\t{message.translate(self.ESCAPES)}\n"
+
+    @staticmethod
+    def unescape(rel_path):
+        if "\\" not in rel_path:
+            return rel_path
+        chars = []
+        escaped = False
+        for char in rel_path:
+            if escaped:
+                chars.append(TreeDigest.UNESCAPES.get(char, char))
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            else:
+                chars.append(char)
+        return "".join(chars)
+
+    def save(self, base_path):
+        digest_file = os.path.join(base_path, self.DIGEST_FILE)
+        os.makedirs(os.path.dirname(digest_file), exist_ok=True)
+        tmp_file = digest_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.writelines(self.to_lines())
+        os.replace(tmp_file, digest_file)
+
+    @classmethod
+    def update(cls, base_path, ig_ls=None, rehash=False):
+        # 保存的摘要只用来跳过大小和修改时间都未变化的文件，每次仍然检查所有文件，避免把修改过的文件当作一致
+        digest = cls.build(base_path, ig_ls, None if rehash else cls.load(base_path))
+        try:
+            digest.save(base_path)
+        except OSError as e:
+            # 只读的副本等无法保存时仍然使用本次计算的摘要，只是下次需要重新计算
+            print(f"保存文件夹摘要失败：{os.path.join(base_path, cls.DIGEST_FILE)} - {str(e)}")
+        return digest
+
+    @staticmethod
+    def diff(digest1, digest2):
+        diff_info = {
+            "1_not_in_2_folder": [],
+            "2_not_in_1_folder": [],
+            "1_not_in_2_file": [],
+            "2_not_in_1_file": [],
+            "sha256_not_match": [],
+            "sha256_hashes": {},  # sha256不一致的文件 -> (path1中的sha256, path2中的sha256)
+            "errors": sorted(digest1.errors.keys() | digest2.errors.keys())  # 任一侧读取失败，无法比对的文件
+        }
+        errors = set(diff_info["errors"])
+        visited = 0
+        stack = [""]
+        while stack:
+            relative = stack.pop()
+            visited += 1
+            # 摘要一致的子树内容完全相同，无需继续向下比较
+            if digest1.dirs[relative][1] == digest2.dirs[relative][1]:
+                continue
+            children1 = dict(digest1.children[relative])
+            children2 = dict(digest2.children[relative])
+            for name in sorted(children1.keys() | children2.keys()):
+                rel_path = f"{relative}/{name}" if relative else name
+                if rel_path in errors:
+                    continue
+                is_dir1 = children1.get(name)
+                is_dir2 = children2.get(name)
+                if is_dir1 and is_dir2:
+                    stack.append(rel_path)
+                    continue
+                if is_dir1 is not None and is_dir1 != is_dir2:
+                    diff_info["1_not_in_2_folder" if is_dir1 else "1_not_in_2_file"].append(rel_path)
+                if is_dir2 is not None and is_dir2 != is_dir1:
+                    diff_info["2_not_in_1_folder" if is_dir2 else "2_not_in_1_file"].append(rel_path)
+                if is_dir1 is False and is_dir2 is False:
+                    visited += 1
+                    if digest1.files[rel_path][2] != digest2.files[rel_path][2]:
+                        diff_info["sha256_not_match"].append(rel_path)
+                        diff_info["sha256_hashes"][rel_path] = (digest1.files[rel_path][2], digest2.files[rel_path][2])
+        return diff_info, visited
+
+
+@dataclass(frozen=True, slots=True)
+class MissingFolderEvent:
+    rel_path: str
+    side: int  # 1表示仅存在于path1，2表示仅存在于path2
+
+
+@dataclass(frozen=True, slots=True)
+class MissingFileEvent:
+    rel_path: str
+    side: int
+
+
+@dataclass(frozen=True, slots=True)
+class ContentMismatchEvent:
+    rel_path: str
+    hash1: str
+    hash2: str
+
+
+@dataclass(frozen=True, slots=True)
+class ErrorEvent:
+    rel_path: str
+    message: str
+
+
+@dataclass(frozen=True, slots=True)
+class ProgressEvent:
+    phase: str  # walk1、walk2、sha256
+    processed: int
+    total: int | None = None
+
+
 class FolderComparator:
     @staticmethod
-    def compare_folders(path1, path2, compare_sha256, ig_list=None):
+    def compare_folders(path1, path2, compare_sha256, ig_list=None, detect_moves=False, analyze_delta=False,
+                        compress=False):
         if not os.path.exists(path1):
             print(f"{path1}不存在")
             return
@@ -444,111 +995,450 @@ class FolderComparator:
             return
         base_path1 = os.path.normpath(path1)
         base_path2 = os.path.normpath(path2)
-        same_path_files, diff_info = FolderComparator.collect_file_differences(base_path1, base_path2, ig_list)
+        with METRICS.phase("walk"):
+            archives = ArchiveTree.open_bases(base_path1, base_path2, with_sha256=compare_sha256)
+            same_path_files, diff_info = FolderComparator.collect_file_differences(
+                base_path1, base_path2, ig_list, archives)
+        if detect_moves and archives:
+            print("压缩包不支持检测移动/重命名的文件，已跳过")
+        elif detect_moves:
+            with METRICS.phase("move_detect"):
+                moves = MoveDetector.detect_moves(base_path1, base_path2, diff_info, ig_list)
+            MoveDetector.print_moves(base_path1, base_path2, moves, compress)
+        FolderComparator.print_diff_info(base_path2, diff_info["1_not_in_2_folder"], diff_info["1_not_in_2_file"],
+                                         compress)
+        FolderComparator.print_diff_info(base_path1, diff_info["2_not_in_1_folder"], diff_info["2_not_in_1_file"],
+                                         compress)
         if compare_sha256:
-            FolderComparator.compare_files_in_parallel(same_path_files, base_path1, base_path2)
+            diff_info["sha256_hashes"] = {}
+            diff_info["sha256_not_match"] = FolderComparator.compare_files_in_parallel(
+                same_path_files, base_path1, base_path2, archives, diff_info["sha256_hashes"], compress)
+            if analyze_delta and diff_info["sha256_not_match"] and not archives:
+                with METRICS.phase("delta"):
+                    diff_info["delta"] = analyze_mismatched_files(diff_info["sha256_not_match"], base_path1, base_path2)
         print("文件夹比对结束")
+        return diff_info
 
     @staticmethod
-    def collect_file_differences(base_path1: LiteralString, base_path2: LiteralString, ig_ls=None):
-        lock = threading.Lock()
-        same_path_files = []
-        diff_info = {
-            "1_not_in_2_folder": [],
-            "2_not_in_1_folder": [],
-            "1_not_in_2_file": [],
-            "2_not_in_1_file": []
-        }
+    def verify_sample(path1, path2, ig_list=None, max_rate=0.01, confidence=0.95, time_budget=None,
+                      stratified=True, rotate=True, compress=False):
+        if not os.path.exists(path1):
+            print(f"{path1}不存在")
+            return
+        if not os.path.exists(path2):
+            print(f"{path2}不存在")
+            return
+        base_path1 = os.path.normpath(path1)
+        base_path2 = os.path.normpath(path2)
+        same_path_files = PathStore()
+        print(f"正在读取{base_path1}和{base_path2}中两侧都存在的文件...")
+        for _ in FolderComparator.iter_file_differences(base_path1, base_path2, ig_list, same_path_files):
+            pass
+        sizes = {}
+        for rel_path in same_path_files:
+            try:
+                sizes[rel_path] = os.path.getsize(os.path.join(base_path1, rel_path))
+            except OSError:
+                continue
+        verifier = SampleVerifier(max_rate, confidence, time_budget, stratified)
+        sampled_before = SampleVerifier.load_state(base_path1) if rotate else ()
+        samples = verifier.order(list(sizes), sizes, sampled_before)
+        print(f"正在抽样校验{len(samples)}个文件...")
+        with METRICS.phase("sample"):
+            report = verifier.run(samples, lambda rel_path: FolderComparator.verify_sample_file(
+                base_path1, base_path2, rel_path, sizes[rel_path], verifier.random, verifier.stopped))
+        verifier.print_report(report, len(samples))
+        if report["mismatches"]:
+            HtmlFileTreePrinter.print(report["mismatches"], [base_path1, base_path2], "抽样校验中SHA256不一致的文件",
+                                      compress)
+        if rotate:
+            SampleVerifier.save_state(base_path1, sampled_before, report["sampled"], sizes)
+        return report
+
+    @staticmethod
+    def verify_sample_file(base_path1, base_path2, rel_path, size, rng, cancel=None):
+        path1 = os.path.join(base_path1, rel_path)
+        path2 = os.path.join(base_path2, rel_path)
+        try:
+            if os.path.getsize(path2) != size:
+                return False
+        except OSError:
+            return None
+        if size < SAMPLE_RANGE_THRESHOLD:
+            return calculate_sha256(path1, cancel=cancel) == calculate_sha256(path2, cancel=cancel)
+        # 大文件只随机比对其中几个区间
+        for _ in range(SAMPLE_RANGE_COUNT):
+            if cancel is not None and cancel.is_set():
+                raise CancelledError(f"已取消：{rel_path}")
+            offset = rng.randrange(size - SAMPLE_RANGE_SIZE + 1)
+            if (calculate_range_sha256(path1, offset, SAMPLE_RANGE_SIZE)
+                    != calculate_range_sha256(path2, offset, SAMPLE_RANGE_SIZE)):
+                return False
+        return True
+
+    @staticmethod
+    def compare_folders_by_digest(path1, path2, ig_list=None, refresh=False, compress=False):
+        for path in (path1, path2):
+            if not path.startswith(AGENT_SCHEME) and not os.path.exists(path):
+                print(f"{path}不存在")
+                return
+        base_path1 = path1 if path1.startswith(AGENT_SCHEME) else os.path.normpath(path1)
+        base_path2 = path2 if path2.startswith(AGENT_SCHEME) else os.path.normpath(path2)
+        with METRICS.phase("digest"):
+            digests = [FolderComparator.load_digest(base_path, ig_list, refresh)
+                       for base_path in (base_path1, base_path2)]
+        with METRICS.phase("digest_diff"):
+            diff_info, visited = TreeDigest.diff(*digests)
+        print(f"摘要比对结束，共比较{visited}个文件/文件夹")
+        FolderComparator.print_diff_info(base_path2, diff_info["1_not_in_2_folder"], diff_info["1_not_in_2_file"],
+                                         compress)
+        FolderComparator.print_diff_info(base_path1, diff_info["2_not_in_1_folder"], diff_info["2_not_in_1_file"],
+                                         compress)
+        mismatched = diff_info["sha256_not_match"]
+        print(f"存在{len(mismatched)}个文件sha256不一致")
+        if diff_info["errors"]:
+            print(f"另有{len(diff_info['errors'])}个文件读取失败，未参与比对：{'，'.join(diff_info['errors'])}")
+        if mismatched:
+            HtmlFileTreePrinter.print(mismatched, [base_path1, base_path2], "SHA256不一致的文件", compress)
+        print("文件夹比对结束")
+        return diff_info
 
-        def walk_directory(base_path: LiteralString, other_base: LiteralString, folder_list, file_list, append_same):
-            for root, dirs, files in os.walk(base_path):
+    @staticmethod
+    def load_digest(base_path, ig_list=None, refresh=False):
+        if base_path.startswith(AGENT_SCHEME):
+            # 远程文件夹由其所在主机上的hash_agent计算摘要，只传输文件列表和sha256
+            from hash_agent import HashAgentClient  # hash_agent依赖本模块，延迟导入避免循环引用
+            print(f"正在从{base_path}读取文件夹摘要中...")
+            return HashAgentClient.from_address(base_path).fetch_digest(refresh)
+        print(f"正在更新{base_path}的文件夹摘要中...")
+        return TreeDigest.update(base_path, ig_list, refresh)
+
+    @staticmethod
+    def iter_compare(path1, path2, compare_sha256=True, ig_list=None, cancel=None):
+        for path in (path1, path2):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"{path}不存在")
+        base_path1 = os.path.normpath(path1)
+        base_path2 = os.path.normpath(path2)
+        same_path_files = PathStore()
+        archives = ArchiveTree.open_bases(base_path1, base_path2, with_sha256=compare_sha256)
+        yield from FolderComparator.iter_file_differences(base_path1, base_path2, ig_list, same_path_files, cancel,
+                                                          archives)
+        if compare_sha256 and not (cancel and cancel.is_set()):
+            yield from FolderComparator.iter_sha256_differences(same_path_files, base_path1, base_path2, cancel,
+                                                                archives)
+
+    @staticmethod
+    async def aiter_compare(path1, path2, compare_sha256=True, ig_list=None):
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue(maxsize=1024)
+        cancel = threading.Event()
+        done = object()
+
+        def put(item):
+            # 队列已满时定期检查是否已取消，调用方退出后事件循环可能不再运行，put永远不会完成
+            if cancel.is_set():
+                return False
+            coroutine = events.put(item)
+            try:
+                future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+            except RuntimeError:
+                coroutine.close()  # 事件循环已关闭
+                return False
+            while not cancel.is_set() and not loop.is_closed():
+                try:
+                    future.result(timeout=0.1)
+                    return True
+                except FuturesTimeoutError:
+                    continue
+            future.cancel()
+            return False
+
+        def produce():
+            events_iter = FolderComparator.iter_compare(path1, path2, compare_sha256, ig_list, cancel)
+            try:
+                for event in events_iter:
+                    if not put(event):
+                        return
+                item = done
+            except Exception as e:
+                item = e
+            finally:
+                # 立即关闭生成器，执行其中的finally关闭线程池，不等待垃圾回收
+                events_iter.close()
+            put(item)
+
+        producer = threading.Thread(target=produce, name="aiter_compare", daemon=True)
+        producer.start()
+        try:
+            while True:
+                event = await events.get()
+                if event is done:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            # 调用方提前退出时通知工作线程停止，并清空队列让阻塞的put返回
+            cancel.set()
+            while not events.empty():
+                events.get_nowait()
+
+    @staticmethod
+    def iter_file_differences(base_path1, base_path2, ig_ls=None, same_path_files=None, cancel=None, archives=None):
+        if archives is None:
+            archives = ArchiveTree.open_bases(base_path1, base_path2)
+        for side, base_path, other_base in ((1, base_path1, base_path2), (2, base_path2, base_path1)):
+            yield ProgressEvent(f"walk{side}", 0)
+            processed = 0
+            last_report = time.monotonic()
+            # 压缩包按其中的文件列表遍历，不需要解压
+            walk = archives[base_path].walk() if base_path in archives else os.walk(base_path)
+            if other_base in archives:
+                exists = archives[other_base].exists
+            else:
+                exists = FolderComparator.timed_exists if METRICS.enabled else os.path.exists
+            for root, dirs, files in walk:
+                if cancel and cancel.is_set():
+                    return
                 relative = os.path.relpath(root, base_path)
                 if relative == ".":
                     relative = ""
                 target = os.path.join(other_base, relative)
                 if ig_ls:
                     dirs[:] = [d for d in dirs if d not in ig_ls]  # 过滤忽略的文件夹
-                if not os.path.exists(target):
-                    with lock:
-                        folder_list.append(relative)
+                if not exists(target):
+                    yield MissingFolderEvent(relative, side)
                     dirs[:] = []  # 跳过子目录
                     continue
+                if relative == "sha256":
+                    # 文件夹摘要、抽样记录和快照是比对工具自己生成的状态，两侧不同是正常的
+                    dirs[:] = [d for d in dirs if d not in TOOL_STATE_DIRS]
+                    files = [f for f in files if f.removesuffix(".tmp") not in TOOL_STATE_FILES]
+                same = []
                 for file in files:
-                    rel_path = os.path.join(relative, file) if relative else file
-                    target_file = os.path.join(other_base, rel_path)
-                    if not os.path.exists(target_file):
-                        with lock:
-                            file_list.append(rel_path)
+                    if not exists(os.path.join(target, file)):
+                        yield MissingFileEvent(os.path.join(relative, file) if relative else file, side)
+                    elif side == 1 and same_path_files is not None:
+                        same.append(file)
+                if same:
+                    same_path_files.add_files(relative, same)
+                processed += len(files)
+                METRICS.count("dirs_walked")
+                METRICS.count("files_walked", len(files))
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    yield ProgressEvent(f"walk{side}", processed)
+            yield ProgressEvent(f"walk{side}", processed, processed)
+
+    @staticmethod
+    def timed_exists(path):
+        start = time.perf_counter()
+        try:
+            return os.path.exists(path)
+        finally:
+            METRICS.add_phase("exists_probe", time.perf_counter() - start)
+
+    @staticmethod
+    def iter_sha256_differences(common_files, base_path1, base_path2, cancel=None, archives=None):
+        total_files = len(common_files)
+        if not total_files:
+            return
+        if archives:
+            yield from FolderComparator.iter_archive_sha256_differences(
+                common_files, base_path1, base_path2, archives, cancel)
+            return
+
+        # 两侧的文件分别交给所在设备的读取线程，各设备的并发数根据测得的吞吐量自动调整
+        tuner = ConcurrencyTuner([base_path1, base_path2])
+        try:
+            # 限制同时排队的任务数量，避免为每个文件预先创建Future
+            files = iter(common_files)
+            pending = {}
+            hashes = {}
+            processed = 0
+            last_report = time.monotonic()
+            while True:
+                while len(hashes) < tuner.total_workers() * 4 and not (cancel and cancel.is_set()):
+                    rel_path = next(files, None)
+                    if rel_path is None:
+                        break
+                    hashes[rel_path] = [None, None]
+                    for side, base_path in enumerate((base_path1, base_path2)):
+                        file_path = os.path.join(base_path, rel_path)
+                        pending[tuner.submit(base_path, file_path, calculate_sha256, file_path)] = (rel_path, side)
+                if not pending or (cancel and cancel.is_set()):
+                    break
+                METRICS.gauge("hash_pending", len(hashes))
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rel_path, side = pending.pop(future)
+                    result = hashes[rel_path]
+                    # 被取消的任务没有结果，future.exception()也会抛出CancelledError
+                    if future.cancelled():
+                        result[side] = CancelledError("计算sha256的任务已取消")
                     else:
-                        with lock:
-                            if append_same:
-                                same_path_files.append(rel_path)
-
-        print(f"正在读取{base_path1}并收集{base_path2}缺失的文件中...")
-        walk_directory(base_path1, base_path2, diff_info["1_not_in_2_folder"], diff_info["1_not_in_2_file"], True)
-        FolderComparator.print_diff_info(base_path2, diff_info["1_not_in_2_folder"],
-                                         diff_info["1_not_in_2_file"])
-        print(f"正在读取{base_path2}并收集{base_path1}缺失的文件中...")
-        walk_directory(base_path2, base_path1, diff_info["2_not_in_1_folder"], diff_info["2_not_in_1_file"], False)
-        FolderComparator.print_diff_info(base_path1, diff_info["2_not_in_1_folder"],
-                                         diff_info["2_not_in_1_file"])
+                        result[side] = future.exception() or future.result()
+                    if None in result:
+                        continue
+                    del hashes[rel_path]
+                    processed += 1
+                    event = FolderComparator.sha256_event(rel_path, *result)
+                    if event:
+                        yield event
+                if processed == total_files or time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    yield ProgressEvent("sha256", processed, total_files)
+        finally:
+            tuner.close()
+
+    @staticmethod
+    def sha256_event(rel_path, hash1, hash2):
+        for result in (hash1, hash2):
+            if isinstance(result, Exception):
+                return ErrorEvent(rel_path, str(result))
+        if hash1 != hash2:
+            return ContentMismatchEvent(rel_path, hash1, hash2)
+        return None
+
+    @staticmethod
+    def iter_archive_sha256_differences(common_files, base_path1, base_path2, archives, cancel=None):
+        # 压缩包只能按存储顺序高效读取：一个线程顺序解压并计算成员的sha256，另一侧的同名文件在线程池中并行计算
+        total_files = len(common_files)
+        wanted = set(common_files)
+        archive_side = 1 if base_path1 in archives else 2
+        archive_base, other_base = (base_path1, base_path2) if archive_side == 1 else (base_path2, base_path1)
+        # 两侧都是压缩包时先读取另一侧的全部sha256
+        other_hashes = dict(archives[other_base].iter_sha256(wanted)) if other_base in archives else None
+
+        def process_file(rel_path, archive_hash):
+            if isinstance(archive_hash, Exception):
+                other_hash = ""
+            elif other_hashes is None:
+                try:
+                    other_hash = calculate_sha256(os.path.join(other_base, rel_path))
+                except Exception as e:
+                    other_hash = e
+            else:
+                other_hash = other_hashes.get(rel_path, "")
+            hash1, hash2 = (archive_hash, other_hash) if archive_side == 1 else (other_hash, archive_hash)
+            return FolderComparator.sha256_event(rel_path, hash1, hash2)
+
+        tuner = ConcurrencyTuner([other_base])
+        try:
+            pending = set()
+            processed = 0
+            last_report = time.monotonic()
+            members = archives[archive_base].iter_sha256(wanted)
+            while True:
+                while len(pending) < tuner.total_workers() * 4 and not (cancel and cancel.is_set()):
+                    try:
+                        item = next(members, None)
+                    except Exception as e:
+                        # tar格式无法跳过损坏的部分，剩余的文件都无法读取
+                        yield ErrorEvent(archive_base, str(e))
+                        item = None
+                        members = iter(())
+                    if item is None:
+                        break
+                    pending.add(tuner.submit(other_base, os.path.join(other_base, item[0]), process_file, *item))
+                if not pending or (cancel and cancel.is_set()):
+                    break
+                METRICS.gauge("hash_pending", len(pending))
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    processed += 1
+                    event = future.result()
+                    if event:
+                        yield event
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    yield ProgressEvent("sha256", processed, total_files)
+            yield ProgressEvent("sha256", processed, total_files)
+        finally:
+            tuner.close()
+
+    @staticmethod
+    def collect_file_differences(base_path1: LiteralString, base_path2: LiteralString, ig_ls=None, archives=None):
+        same_path_files = PathStore()
+        diff_info = {
+            "1_not_in_2_folder": [],
+            "2_not_in_1_folder": [],
+            "1_not_in_2_file": PathStore(),
+            "2_not_in_1_file": PathStore()
+        }
+        for event in FolderComparator.iter_file_differences(base_path1, base_path2, ig_ls, same_path_files,
+                                                            archives=archives):
+            if isinstance(event, MissingFolderEvent):
+                diff_info[f"{event.side}_not_in_{3 - event.side}_folder"].append(event.rel_path)
+            elif isinstance(event, MissingFileEvent):
+                diff_info[f"{event.side}_not_in_{3 - event.side}_file"].append(event.rel_path)
+            elif event.processed == 0 and event.total is None:
+                source, target = (base_path1, base_path2) if event.phase == "walk1" else (base_path2, base_path1)
+                print(f"正在读取{source}并收集{target}缺失的文件中...")
         return same_path_files, diff_info
 
     @staticmethod
-    def print_diff_info(base_path2, missing_folders, missing_files):
-        all_missing = missing_folders + missing_files
-        if not all_missing:
+    def print_diff_info(base_path2, missing_folders, missing_files, compress=False):
+        missing_count = len(missing_folders) + len(missing_files)
+        if not missing_count:
             print(f"读取文件完毕，{base_path2}中不存在文件/文件夹缺失。")
             return
-        print(f"读取文件完毕，{base_path2}中缺失{len(all_missing)}个文件/文件夹（详情见弹出的html）。")
-        HtmlFileTreePrinter.print(all_missing, [base_path2], f"{base_path2}中缺失的文件/文件夹")
+        print(f"读取文件完毕，{base_path2}中缺失{missing_count}个文件/文件夹（详情见弹出的html）。")
+        all_missing = PathStore(missing_folders)
+        all_missing.extend(missing_files)
+        HtmlFileTreePrinter.print(all_missing, [base_path2], f"{base_path2}中缺失的文件/文件夹", compress)
 
     @staticmethod
-    def compare_files_in_parallel(common_files, base_path1, base_path2):
-        if not common_files:
-            return
-        total_files = len(common_files)
-        processed = 0
-        lock = threading.Lock()
+    def compare_files_in_parallel(common_files, base_path1, base_path2, archives=None, mismatch_hashes=None,
+                                  compress=False):
         results = []
-        progress_lock = threading.Lock()
-
-        def process_file(rel_path):
-            nonlocal processed
-            path1 = os.path.join(base_path1, rel_path)
-            path2 = os.path.join(base_path2, rel_path)
-            hash1 = calculate_sha256(path1)
-            hash2 = calculate_sha256(path2)
-            with lock:
-                if hash1 != hash2:
-                    results.append(rel_path)
-                processed += 1
-                with progress_lock:
-                    progress = processed / total_files * 100
-                    sys.stdout.write(f"\r正在计算并比对sha256中，进度: {processed}/{total_files} ({progress:.2f}%)")
+        with METRICS.phase("sha256"):
+            for event in FolderComparator.iter_sha256_differences(common_files, base_path1, base_path2,
+                                                                  archives=archives):
+                if isinstance(event, ContentMismatchEvent):
+                    results.append(event.rel_path)
+                    if mismatch_hashes is not None:
+                        mismatch_hashes[event.rel_path] = (event.hash1, event.hash2)
+                elif isinstance(event, ErrorEvent):
+                    print(f"\n未知错误: {event.rel_path} - {event.message}")
+                else:
+                    progress = event.processed / event.total * 100
+                    sys.stdout.write(f"\r正在计算并比对sha256中，进度: {event.processed}/{event.total} ({progress:.2f}%)")
                     sys.stdout.flush()
-
-            return hash1 != hash2
-
-        with ThreadPoolExecutor(max_workers=os.cpu_count() * 2) as executor:
-            futures = [executor.submit(process_file, rel_path) for rel_path in common_files]
-            for _ in as_completed(futures):
-                pass  # 结果已通过回调处理
+        if not common_files:
+            return results
         print(f"\n计算并比对文件sha256结束，存在{len(results)}个文件sha256不一致")
         if results:
-            HtmlFileTreePrinter.print(results, [base_path1, base_path2], "SHA256不一致的文件")
+            HtmlFileTreePrinter.print(results, [base_path1, base_path2], "SHA256不一致的文件", compress)
+        return results
 
 
-def calculate_sha256(file_path):
+def calculate_sha256(file_path, queue_depth=PIPELINE_QUEUE_DEPTH, cancel=None):
     if not os.path.isfile(file_path):
         return ""
+    start = time.perf_counter()
     sha256 = hashlib.sha256()
+    THROTTLE.before_open()
     with open(file_path, 'rb') as f:
-        while True:
-            data = f.read(1024 * 1024)  # 1MB chunk
-            if not data:
-                break
+        file_size = os.fstat(f.fileno()).st_size
+        # 只有大文件才值得启用读取线程
+        if file_size < PIPELINE_MIN_SIZE:
+            queue_depth = 0
+        for data in read_chunks(f, 1024 * 1024, queue_depth):  # 1MB chunk
+            if cancel is not None and cancel.is_set():
+                raise CancelledError(f"已取消：{file_path}")
             sha256.update(data)
+    METRICS.observe_hash(file_path, file_size, time.perf_counter() - start)
+    return sha256.hexdigest()
+
+
+def calculate_range_sha256(file_path, offset, length):
+    sha256 = hashlib.sha256()
+    THROTTLE.before_open()
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        sha256.update(THROTTLE.read(f, length))
     return sha256.hexdigest()
 
 
@@ -556,7 +1446,7 @@ if __name__ == "__main__":
     folder1 = input(r"请输入源文件夹路径（默认为D:\Workspaces）：")
     if folder1.strip() == "":
         folder1 = r"D:\Workspaces"
-    folder2 = input(r"请输入需要对比的文件夹路径（默认为V:\Workspaces）：")
+    folder2 = input(r"请输入需要对比的文件夹路径，远程文件夹可输入agent://主机:端口，也可以输入zip/tar压缩包（默认为V:\Workspaces）：")
     if folder2.strip() == "":
         folder2 = r"V:\Workspaces"
     is_compare_sha256 = True
@@ -574,5 +1464,26 @@ if __name__ == "__main__":
             ignore_list = ["node_modules", ".git", ".svn"]
         else:
             ignore_list = [f.strip() for f in ignore_input.split(',') if f.strip()]
-
-    FolderComparator.compare_folders(folder1, folder2, is_compare_sha256, ignore_list)
+    prompt_limits()
+    # 压缩包只支持完整比对，不提示抽样校验和摘要比对
+    is_archive_input = is_archive(folder1) or is_archive(folder2)
+    is_sample, time_budget = (False, None) if is_archive_input else prompt_sample(
+        "是否抽样校验(默认为完整比对，输入抽样的时间预算秒数时在预算内抽样校验，输入Y时抽样到置信度达标为止)：")
+    is_use_digest = not is_sample and not is_archive_input and input(
+        "是否使用文件夹摘要比对(默认为逐个文件比对，输入Y时使用摘要跳过相同的子文件夹)：").strip() == "Y"
+    if is_sample:
+        task = partial(FolderComparator.verify_sample, folder1, folder2, ignore_list, time_budget=time_budget)
+    elif is_use_digest or folder1.startswith(AGENT_SCHEME) or folder2.startswith(AGENT_SCHEME):
+        is_refresh = input("是否重新计算所有文件的sha256(默认只计算大小或修改时间变化的文件，输入Y时全部重新计算)：").strip() == "Y"
+        task = partial(FolderComparator.compare_folders_by_digest, folder1, folder2, ignore_list, is_refresh)
+    else:
+        is_detect_moves = input("是否检测移动/重命名的文件(默认为不检测，输入Y时检测)：").strip() == "Y"
+        is_analyze_delta = is_compare_sha256 and not is_archive_input and input(
+            f"是否分析SHA256不一致的大文件的差异(默认为不分析，输入Y时对超过{DELTA_MIN_SIZE // 1024 // 1024}MB的文件"
+            f"按内容分块比对，估算需要传输的数据量)：").strip() == "Y"
+        task = partial(FolderComparator.compare_folders, folder1, folder2, is_compare_sha256, ignore_list,
+                       is_detect_moves, is_analyze_delta)
+    is_compress = input("是否将HTML报告压缩保存为.html.gz(默认为不压缩并在浏览器中打开，输入Y时压缩)：").strip() == "Y"
+    task = partial(task, compress=is_compress)
+    metrics_output, is_profile = prompt_metrics()
+    run_with_metrics(task, output_file=metrics_output, profile=is_profile)
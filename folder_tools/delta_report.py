@@ -0,0 +1,177 @@
+import hashlib
+import os
+import random
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from io_throttle import THROTTLE
+from metrics import METRICS
+
+CHUNK_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".folder_tools", "chunks")
+CHUNK_CACHE_MAGIC = b"FTCDC1"
+CHUNK_CACHE_HEADER = struct.Struct("<6sQqIIII")
+CHUNK_RECORD = struct.Struct("<I16s")
+DELTA_MIN_SIZE = 64 * 1024 * 1024  # 只分析超过该大小的文件，小文件直接重新复制即可
+MIN_CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+SYMBOL_BITS = 4  # 每个字节映射为4位的符号，4个符号组成16位的边界模式
+ANCHOR_BITS = 16  # 随机数据上平均每64KB出现一次边界
+READ_SIZE = 8 * 1024 * 1024
+MAX_PRINTED_RANGES = 20
+
+
+def make_symbol_table():
+    # 固定种子把256个字节值平均分成16组，每组映射为一个符号
+    symbols = [value % (1 << SYMBOL_BITS) for value in range(256)]
+    random.Random(0x5EED).shuffle(symbols)
+    return bytes(symbols)
+
+
+SYMBOL_TABLE = make_symbol_table()
+# 由不同符号组成的模式，连续相同的字节不会形成边界
+ANCHOR = bytes((0xB38B >> shift) & ((1 << SYMBOL_BITS) - 1) for shift in range(0, ANCHOR_BITS, SYMBOL_BITS))
+
+
+def iter_chunks(f):
+    # 基于内容的分块：每个字节映射为一个符号，边界前几个字节的符号等于ANCHOR时切分。
+    # 边界只取决于附近的内容，插入或删除数据后只有附近的分块会变化，后面的分块仍然能对上。
+    # translate和find都在C中逐字节处理，Python只需要处理每个分块；符号只有0和1时find明显变慢，因此每个字节取4位
+    buffer = b""
+    pos = 0
+    while True:
+        data = THROTTLE.read(f, READ_SIZE)
+        buffer = buffer[pos:] + data
+        symbols = buffer.translate(SYMBOL_TABLE)
+        view = memoryview(buffer)
+        pos = 0
+        while len(buffer) - pos >= MAX_CHUNK_SIZE or (not data and pos < len(buffer)):
+            index = symbols.find(ANCHOR, pos + MIN_CHUNK_SIZE - len(ANCHOR), pos + MAX_CHUNK_SIZE)
+            end = index + len(ANCHOR) if index >= 0 else min(pos + MAX_CHUNK_SIZE, len(buffer))
+            yield end - pos, hashlib.sha256(view[pos:end]).digest()[:16]
+            pos = end
+        if not data:
+            return
+
+
+def chunk_cache_file(file_path):
+    digest = hashlib.sha256(os.path.abspath(file_path).encode("utf-8", "surrogateescape")).hexdigest()[:16]
+    return os.path.join(CHUNK_CACHE_DIR, f"{digest}.chunks")
+
+
+def load_chunks(file_path):
+    # 分块索引按文件路径缓存，文件大小和修改时间未变时直接读取缓存，不需要再读取文件
+    stat = os.stat(file_path)
+    header = CHUNK_CACHE_HEADER.pack(CHUNK_CACHE_MAGIC, stat.st_size, stat.st_mtime_ns,
+                                     MIN_CHUNK_SIZE, MAX_CHUNK_SIZE, SYMBOL_BITS, ANCHOR_BITS)
+    cache_file = chunk_cache_file(file_path)
+    try:
+        with open(cache_file, "rb") as f:
+            if f.read(CHUNK_CACHE_HEADER.size) == header:
+                return list(CHUNK_RECORD.iter_unpack(f.read()))
+    except (OSError, struct.error):
+        pass
+    start = time.perf_counter()
+    THROTTLE.before_open()
+    with open(file_path, "rb") as f:
+        chunks = list(iter_chunks(f))
+    METRICS.count("delta_bytes_read", stat.st_size)
+    METRICS.add_phase("delta_chunking", time.perf_counter() - start)
+    try:
+        os.makedirs(CHUNK_CACHE_DIR, exist_ok=True)
+        with open(cache_file + ".tmp", "wb") as f:
+            f.write(header)
+            f.writelines(CHUNK_RECORD.pack(length, digest) for length, digest in chunks)
+        os.replace(cache_file + ".tmp", cache_file)
+    except OSError as e:
+        print(f"保存分块索引失败：{cache_file} - {str(e)}")
+    return chunks
+
+
+def analyze_delta(source_path, target_path):
+    # 估算把目标文件更新为源文件需要传输的数据：源文件中目标文件已有的分块可以直接复用
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        source_future = executor.submit(load_chunks, source_path)
+        target_future = executor.submit(load_chunks, target_path)
+        source_chunks, target_chunks = source_future.result(), target_future.result()
+    target_offsets = {}
+    target_digests = {}
+    offset = 0
+    for length, digest in target_chunks:
+        target_offsets.setdefault(digest, offset)
+        target_digests[offset] = digest
+        offset += length
+    report = {"source_size": sum(length for length, _ in source_chunks), "target_size": offset,
+              "chunks": len(source_chunks), "matched_chunks": 0, "transfer": 0, "matching": [], "differing": []}
+    sent = set()
+    offset = 0
+    for length, digest in source_chunks:
+        last = report["matching"][-1] if report["matching"] else None
+        # 同样的内容在目标文件中出现多次时优先接着上一段相同区间匹配
+        if last and last[0] + last[2] == offset and target_digests.get(last[1] + last[2]) == digest:
+            target_offset = last[1] + last[2]
+        else:
+            target_offset = target_offsets.get(digest)
+        if target_offset is not None:
+            report["matched_chunks"] += 1
+            # 源文件和目标文件中都连续的分块合并为一段：[源偏移, 目标偏移, 长度]
+            if last and last[0] + last[2] == offset and last[1] + last[2] == target_offset:
+                last[2] += length
+            else:
+                report["matching"].append([offset, target_offset, length])
+        else:
+            if digest not in sent:
+                sent.add(digest)  # 源文件中重复出现的分块只需传输一次
+                report["transfer"] += length
+            last = report["differing"][-1] if report["differing"] else None
+            if last and last[0] + last[1] == offset:
+                last[1] += length
+            else:
+                report["differing"].append([offset, length])
+        offset += length
+    return report
+
+
+def print_delta_report(rel_path, report):
+    size = report["source_size"]
+    matched = sum(length for _, _, length in report["matching"])
+    print(f"{rel_path}：{size / 1024 / 1024:.1f} MB（目标文件{report['target_size'] / 1024 / 1024:.1f} MB），"
+          f"共{report['chunks']}个分块，其中{report['matched_chunks']}个在目标文件中已存在；"
+          f"相同的区间{len(report['matching'])}段共{matched / 1024 / 1024:.1f} MB，"
+          f"不同的区间{len(report['differing'])}段共{(size - matched) / 1024 / 1024:.1f} MB，"
+          f"预计需要传输{report['transfer'] / 1024 / 1024:.1f} MB（{report['transfer'] / max(size, 1) * 100:.2f}%）")
+    for offset, length in report["differing"][:MAX_PRINTED_RANGES]:
+        print(f"  不同：{offset}-{offset + length}（{length} B）")
+    if len(report["differing"]) > MAX_PRINTED_RANGES:
+        print(f"  ……其余{len(report['differing']) - MAX_PRINTED_RANGES}段未显示")
+
+
+def analyze_mismatched_files(rel_paths, base_path1, base_path2, min_size=DELTA_MIN_SIZE):
+    reports = {}
+    for rel_path in rel_paths:
+        path1 = os.path.join(base_path1, rel_path)
+        path2 = os.path.join(base_path2, rel_path)
+        try:
+            if os.path.getsize(path1) < min_size:
+                continue
+            reports[rel_path] = analyze_delta(path1, path2)
+        except OSError as e:
+            print(f"分析文件差异失败：{rel_path} - {str(e)}")
+            continue
+        print_delta_report(rel_path, reports[rel_path])
+    if not reports:
+        print(f"没有超过{min_size / 1024 / 1024:.0f} MB的SHA256不一致的文件需要分析差异")
+    else:
+        transfer = sum(report["transfer"] for report in reports.values())
+        total = sum(report["source_size"] for report in reports.values())
+        print(f"分析了{len(reports)}个大文件的差异，预计需要传输{transfer / 1024 / 1024:.1f} MB，"
+              f"完整复制需要{total / 1024 / 1024:.1f} MB")
+    return reports
+
+
+if __name__ == "__main__":
+    source_input = input("请输入源文件路径：").strip()
+    target_input = input("请输入需要对比的目标文件路径：").strip()
+    start_time = time.time()
+    print_delta_report(source_input, analyze_delta(source_input, target_input))
+    print(f"差异分析完成，耗时{time.time() - start_time:.2f} s")
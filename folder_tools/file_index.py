@@ -0,0 +1,162 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+INDEX_DIR = os.path.join(os.path.expanduser("~"), ".folder_tools", "index")
+INDEX_FORMAT = "2"  # 收录规则变化时递增，旧格式的索引会被清空后重新建立
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    CREATE TABLE IF NOT EXISTS dirs (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime_ns INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, dir_id INTEGER NOT NULL, name TEXT NOT NULL,
+                                      lower_name TEXT NOT NULL);
+    CREATE INDEX IF NOT EXISTS files_dir ON files(dir_id);
+    CREATE INDEX IF NOT EXISTS files_lower_name ON files(lower_name);
+"""
+# trigram分词的全文索引，可以在毫秒级完成任意位置的子串查询，需要SQLite 3.34以上
+TRIGRAM_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5(lower_name, content='files', content_rowid='id',
+                                                        tokenize='trigram');
+    CREATE TRIGGER IF NOT EXISTS files_insert AFTER INSERT ON files BEGIN
+        INSERT INTO names(rowid, lower_name) VALUES (new.id, new.lower_name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS files_delete AFTER DELETE ON files BEGIN
+        INSERT INTO names(names, rowid, lower_name) VALUES ('delete', old.id, old.lower_name);
+    END;
+"""
+
+
+class FileIndex:
+    def __init__(self, root_dir, index_file=None, ig_ls=None):
+        self.root_dir = os.path.abspath(root_dir)
+        self.index_file = index_file or self.default_index_file(self.root_dir)
+        self.ig_ls = ig_ls
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_file)), exist_ok=True)
+        self.conn = sqlite3.connect(self.index_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(TRIGRAM_SCHEMA)
+            self.has_trigram = True
+        except sqlite3.OperationalError:
+            self.has_trigram = False  # 不支持fts5/trigram时退回到逐行匹配
+        self.check_format()
+
+    def check_format(self):
+        # 建立索引时的分词方式与现在不同时（例如之前的SQLite不支持trigram），全文索引与文件表对不上，需要重新建立；
+        # 忽略列表不同时，mtime未变的文件夹沿用的子文件夹也与现在的忽略列表不一致，同样需要重新建立
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        expected = {"format": INDEX_FORMAT, "tokenizer": "trigram" if self.has_trigram else "none",
+                    "ignore": "\n".join(sorted(self.ig_ls or ()))}
+        if meta == expected:
+            return
+        if meta:
+            print(f"索引格式或忽略列表已变化，正在清空后重新建立：{self.index_file}")
+        with self.conn:
+            self.conn.execute("DROP TRIGGER IF EXISTS files_insert")
+            self.conn.execute("DROP TRIGGER IF EXISTS files_delete")
+            self.conn.execute("DROP TABLE IF EXISTS names")
+            self.conn.execute("DELETE FROM files")
+            self.conn.execute("DELETE FROM dirs")
+            self.conn.execute("DELETE FROM meta")
+            self.conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", expected.items())
+        if self.has_trigram:
+            self.conn.executescript(TRIGRAM_SCHEMA)
+
+    @staticmethod
+    def default_index_file(root_dir):
+        digest = hashlib.sha256(os.path.abspath(root_dir).encode("utf-8", "surrogateescape")).hexdigest()[:16]
+        return os.path.join(INDEX_DIR, f"{digest}.db")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM dirs LIMIT 1").fetchone() is None
+
+    def refresh(self):
+        # 文件夹的mtime只在其直接包含的条目增删或重命名时改变，mtime未变的文件夹无需重新列出
+        start = time.time()
+        known = {path: (dir_id, mtime_ns) for dir_id, path, mtime_ns in
+                 self.conn.execute("SELECT id, path, mtime_ns FROM dirs")}
+        subdirs = {}
+        for path in known:
+            if path:
+                subdirs.setdefault(os.path.dirname(path), []).append(path)
+        seen = set()
+        changed = 0
+        stack = [""]
+        with self.conn:
+            while stack:
+                relative = stack.pop()
+                try:
+                    mtime_ns = os.stat(os.path.join(self.root_dir, relative)).st_mtime_ns
+                except OSError:
+                    continue
+                seen.add(relative)
+                dir_id, known_mtime = known.get(relative, (None, None))
+                if known_mtime == mtime_ns:
+                    stack.extend(subdirs.get(relative, ()))
+                    continue
+                changed += 1
+                stack.extend(self.rescan_dir(relative, dir_id, mtime_ns))
+            removed = [(dir_id,) for path, (dir_id, _) in known.items() if path not in seen]
+            self.conn.executemany("DELETE FROM files WHERE dir_id = ?", removed)
+            self.conn.executemany("DELETE FROM dirs WHERE id = ?", removed)
+        print(f"索引已更新：检查了{len(seen)}个文件夹，其中{changed}个有变化，删除了{len(removed)}个，"
+              f"耗时{time.time() - start:.2f} s")
+
+    def rescan_dir(self, relative, dir_id, mtime_ns):
+        names = []
+        children = []
+        try:
+            with os.scandir(os.path.join(self.root_dir, relative)) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not (self.ig_ls and entry.name in self.ig_ls):
+                                children.append(os.path.join(relative, entry.name) if relative else entry.name)
+                        elif not (entry.is_symlink() and entry.is_dir()):
+                            names.append(entry.name)  # 与os.walk一致，指向文件夹的符号链接不作为文件收录
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"读取文件夹失败：{relative} - {str(e)}")
+        if dir_id is None:
+            dir_id = self.conn.execute("INSERT INTO dirs (path, mtime_ns) VALUES (?, ?)",
+                                       (relative, mtime_ns)).lastrowid
+        else:
+            self.conn.execute("UPDATE dirs SET mtime_ns = ? WHERE id = ?", (mtime_ns, dir_id))
+            self.conn.execute("DELETE FROM files WHERE dir_id = ?", (dir_id,))
+        self.conn.executemany("INSERT INTO files (dir_id, name, lower_name) VALUES (?, ?, ?)",
+                              ((dir_id, name, name.lower()) for name in names))
+        return children
+
+    def search(self, keyword, mode="substring", limit=None):
+        keyword = keyword.lower()
+        if mode == "name":
+            condition, params = "files.lower_name = ?", (keyword,)
+        elif mode == "prefix":
+            # 利用lower_name上的B树索引做范围查询
+            condition, params = "files.lower_name >= ? AND files.lower_name < ?", (keyword, keyword + "\U0010ffff")
+        elif self.has_trigram and len(keyword) >= 3:
+            condition = "files.id IN (SELECT rowid FROM names WHERE names MATCH ?)"
+            params = ('"' + keyword.replace('"', '""') + '"',)
+        else:
+            escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            condition, params = "files.lower_name LIKE ? ESCAPE '\\'", (f"%{escaped}%",)
+        sql = f"SELECT dirs.path, files.name FROM files JOIN dirs ON dirs.id = files.dir_id WHERE {condition}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        for dir_path, name in self.conn.execute(sql, params):
+            yield os.path.join(self.root_dir, dir_path, name)
+
+    def count_files(self):
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
@@ -0,0 +1,216 @@
+import errno
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from comparator import FolderComparator
+
+# 内核不支持零拷贝时可能返回的错误码，遇到这些错误时退回到普通读写
+ZERO_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.ENOTSUP}
+
+
+class FolderSynchronizer:
+    BUFFER_SIZE = 1024 * 1024  # 1MB
+
+    @staticmethod
+    def sync_folders(path1, path2, diff_info, reverse=False, dry_run=False, verify=True, ig_ls=None,
+                     max_workers=None):
+        source, target = (path2, path1) if reverse else (path1, path2)
+        source = os.path.normpath(source)
+        target = os.path.normpath(target)
+        folders, files = FolderSynchronizer.build_plan(source, diff_info, reverse, ig_ls)
+        if not folders and not files:
+            print(f"{target}与{source}一致，无需同步。")
+            return {}
+        if dry_run:
+            FolderSynchronizer.print_plan(source, target, folders, files)
+            return {}
+        for folder in folders:
+            os.makedirs(os.path.join(target, folder), exist_ok=True)
+        # 比对时已经计算过sha256的源文件，复制时计算的sha256必须与之一致
+        side = 1 if reverse else 0
+        expected = {rel_path: hashes[side] for rel_path, hashes in diff_info.get("sha256_hashes", {}).items()}
+        return FolderSynchronizer.copy_files_in_parallel(files, source, target, verify, max_workers, expected)
+
+    @staticmethod
+    def build_plan(source, diff_info, reverse=False, ig_ls=None):
+        prefix = "2_not_in_1" if reverse else "1_not_in_2"
+        folders = []
+        files = list(diff_info.get(f"{prefix}_file", []))
+        for folder in diff_info.get(f"{prefix}_folder", []):
+            for root, dirs, names in os.walk(os.path.join(source, folder)):
+                if ig_ls:
+                    dirs[:] = [d for d in dirs if d not in ig_ls]
+                relative = os.path.relpath(root, source)
+                folders.append(relative)
+                files.extend(os.path.join(relative, name) for name in names)
+        files.extend(diff_info.get("sha256_not_match", []))
+        return folders, files
+
+    @staticmethod
+    def print_plan(source, target, folders, files):
+        total_size = 0
+        for folder in folders:
+            print(f"[预览] 创建文件夹：{os.path.join(target, folder)}")
+        for rel_path in files:
+            size = os.path.getsize(os.path.join(source, rel_path))
+            total_size += size
+            print(f"[预览] 复制：{os.path.join(source, rel_path)} -> {os.path.join(target, rel_path)} ({size} B)")
+        print(f"预览结束，需要创建{len(folders)}个文件夹，复制{len(files)}个文件，共{total_size}字节")
+
+    @staticmethod
+    def copy_files_in_parallel(files, source, target, verify=True, max_workers=None, expected=None):
+        total_files = len(files)
+        processed = 0
+        lock = threading.Lock()
+        results = {}
+        failures = []
+
+        def process_file(rel_path):
+            nonlocal processed
+            try:
+                digest = FolderSynchronizer.copy_file(os.path.join(source, rel_path), os.path.join(target, rel_path),
+                                                      verify, expected.get(rel_path) if expected else None)
+            except Exception as e:
+                with lock:
+                    failures.append(rel_path)
+                    processed += 1
+                    print(f"\n复制失败: {rel_path} - {str(e)}")
+                return
+            with lock:
+                results[rel_path] = digest
+                processed += 1
+                progress = processed / total_files * 100
+                sys.stdout.write(f"\r正在同步文件中，进度: {processed}/{total_files} ({progress:.2f}%)")
+                sys.stdout.flush()
+
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() * 2) as executor:
+            futures = [executor.submit(process_file, rel_path) for rel_path in files]
+            for _ in as_completed(futures):
+                pass
+        print(f"\n同步结束，已复制{len(results)}个文件，{len(failures)}个文件复制失败")
+        return results
+
+    @staticmethod
+    def copy_file(src, dst, verify=True, expected=None):
+        dst_dir = os.path.dirname(dst)
+        os.makedirs(dst_dir, exist_ok=True)
+        # 先写入同目录下的临时文件，完成后再原子替换，避免留下不完整的目标文件
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(dst)}.", suffix=".tmp", dir=dst_dir)
+        try:
+            with open(src, 'rb') as fsrc, os.fdopen(fd, 'wb') as fdst:
+                # 优先零拷贝，需要校验时再读取写入的临时文件计算sha256；不支持零拷贝时逐块复制并同时计算
+                if FolderSynchronizer.zero_copy(fsrc, fdst):
+                    digest = FolderSynchronizer.hash_file(tmp_path) if verify else None
+                else:
+                    digest = FolderSynchronizer.stream_copy(fsrc, fdst)
+                if verify and expected and digest != expected:
+                    raise ValueError(f"复制的内容与比对时的sha256不一致，源文件可能已被修改：{expected} -> {digest}")
+                fdst.flush()
+                os.fsync(fdst.fileno())
+            shutil.copystat(src, tmp_path)
+            os.replace(tmp_path, dst)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return digest
+
+    @staticmethod
+    def zero_copy(fsrc, fdst):
+        in_fd = fsrc.fileno()
+        out_fd = fdst.fileno()
+        size = os.fstat(in_fd).st_size
+        for copy in (FolderSynchronizer.copy_with_copy_file_range, FolderSynchronizer.copy_with_sendfile):
+            try:
+                if copy(in_fd, out_fd, size):
+                    return True
+            except OSError as e:
+                if e.errno not in ZERO_COPY_UNSUPPORTED:
+                    raise
+            # 失败时回到文件开头，交给下一种方式重新复制
+            os.lseek(in_fd, 0, os.SEEK_SET)
+            os.lseek(out_fd, 0, os.SEEK_SET)
+            os.ftruncate(out_fd, 0)
+        return False
+
+    @staticmethod
+    def copy_with_copy_file_range(in_fd, out_fd, size):
+        if not hasattr(os, "copy_file_range"):
+            return False
+        # 只复制开始时的大小，复制期间文件变大时不会超出；提前读到文件末尾（文件变小）时交给其他方式重新复制
+        copied = 0
+        while copied < size:
+            sent = os.copy_file_range(in_fd, out_fd, min(size - copied, FolderSynchronizer.BUFFER_SIZE))
+            if sent == 0:
+                break
+            copied += sent
+        return copied == size
+
+    @staticmethod
+    def copy_with_sendfile(in_fd, out_fd, size):
+        if not hasattr(os, "sendfile") or not sys.platform.startswith("linux"):
+            return False
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(out_fd, in_fd, offset, min(size - offset, FolderSynchronizer.BUFFER_SIZE))
+            if sent == 0:
+                break
+            offset += sent
+        return offset == size
+
+    @staticmethod
+    def hash_file(path):
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(FolderSynchronizer.BUFFER_SIZE)
+                if not data:
+                    break
+                sha256.update(data)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def stream_copy(fsrc, fdst):
+        # 复制的同时计算sha256，无需再次读取目标文件进行校验
+        sha256 = hashlib.sha256()
+        while True:
+            data = fsrc.read(FolderSynchronizer.BUFFER_SIZE)
+            if not data:
+                break
+            sha256.update(data)
+            fdst.write(data)
+        return sha256.hexdigest()
+
+
+if __name__ == "__main__":
+    folder1 = input(r"请输入源文件夹路径（默认为D:\Workspaces）：")
+    if folder1.strip() == "":
+        folder1 = r"D:\Workspaces"
+    folder2 = input(r"请输入需要同步的文件夹路径（默认为V:\Workspaces）：")
+    if folder2.strip() == "":
+        folder2 = r"V:\Workspaces"
+    is_reverse = input("同步方向(默认为源文件夹同步到目标文件夹，输入R时反向同步)：").strip() == "R"
+    is_dry_run = input("是否仅预览同步操作(默认为执行同步，输入Y时仅预览)：").strip() == "Y"
+    is_verify = input("是否在复制后校验sha256(默认为校验，输入N时不校验)：").strip() != "N"
+
+    ignore_input = input(
+        "请输入要忽略的文件夹（多个用逗号分隔），输入N表示不忽略任何文件夹，直接回车使用默认值[node_modules, .git, .svn]："
+    ).strip()
+    if ignore_input == "N":
+        ignore_list = []
+    else:
+        if not ignore_input:
+            ignore_list = ["node_modules", ".git", ".svn"]
+        else:
+            ignore_list = [f.strip() for f in ignore_input.split(',') if f.strip()]
+
+    info = FolderComparator.compare_folders(folder1, folder2, True, ignore_list)
+    if info is not None:
+        FolderSynchronizer.sync_folders(folder1, folder2, info, is_reverse, is_dry_run, is_verify, ignore_list)
@@ -0,0 +1,415 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from comparator import TreeDigest, calculate_sha256
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+RESCAN = None  # 事件队列溢出时需要全量重新扫描
+
+
+def scan_tree(base_path, ig_ls=None):
+    files = {}
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        try:
+            entries = list(os.scandir(os.path.join(base_path, relative)))
+        except OSError:
+            continue
+        for entry in entries:
+            rel_path = os.path.join(relative, entry.name) if relative else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != "sha256" and not (ig_ls and entry.name in ig_ls):
+                        stack.append(rel_path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+    return files
+
+
+class InotifyWatcher:
+    def __init__(self, base_path, ig_ls=None, poll_interval=5.0):
+        self.base_path = base_path
+        self.ig_ls = ig_ls
+        self.poll_interval = poll_interval
+        self.polled = {}  # 无法监听的文件夹的相对路径 -> 上次扫描的文件，定时扫描这些文件夹
+        self.last_poll = time.monotonic()
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1失败")
+        self.watches = {}  # wd -> 相对路径
+        self.add_watches("")
+
+    @staticmethod
+    def is_supported():
+        return sys.platform.startswith("linux") and ctypes.util.find_library("c") is not None
+
+    def add_watches(self, relative):
+        for root, dirs, _ in os.walk(os.path.join(self.base_path, relative)):
+            dirs[:] = [d for d in dirs if d != "sha256" and not (self.ig_ls and d in self.ig_ls)]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOENT:
+                    continue  # 文件夹在开始监听前已被删除
+                raise OSError(error, f"无法监听文件夹：{root}")
+            rel = os.path.relpath(root, self.base_path)
+            self.watches[wd] = "" if rel == "." else rel
+
+    def remove_watches(self, relative):
+        prefix = relative + os.sep
+        for wd, rel in list(self.watches.items()):
+            if rel == relative or rel.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+        for rel in list(self.polled):
+            if rel == relative or rel.startswith(prefix):
+                del self.polled[rel]
+
+    def poll_subtrees(self):
+        now = time.monotonic()
+        if not self.polled or now - self.last_poll < self.poll_interval:
+            return []
+        self.last_poll = now
+        changes = []
+        for relative, files in list(self.polled.items()):
+            scanned = scan_tree(os.path.join(self.base_path, relative), self.ig_ls)
+            changes.extend(os.path.join(relative, rel) for rel, stat in scanned.items() if files.get(rel) != stat)
+            changes.extend(os.path.join(relative, rel) for rel in files if rel not in scanned)
+            self.polled[relative] = scanned
+        return changes
+
+    def read_changes(self, timeout):
+        changes = self.poll_subtrees()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changes
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changes
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return [RESCAN]
+            relative = self.watches.get(wd)
+            if relative is None or mask & IN_IGNORED:
+                continue
+            if not name:
+                continue  # 监听的文件夹自身被删除或移动，由上级文件夹的事件处理
+            if name == "sha256" or (self.ig_ls and name in self.ig_ls):
+                continue
+            rel_path = os.path.join(relative, name) if relative else name
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.remove_watches(rel_path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self.add_watches(rel_path)
+                    except OSError as e:
+                        # 例如超过inotify监听数量上限（ENOSPC），之后定时扫描该文件夹发现其中的变化
+                        print(f"\n监听新文件夹失败，改为定时扫描该文件夹：{rel_path} - {str(e)}")
+                        self.remove_watches(rel_path)
+                        self.polled[rel_path] = scan_tree(os.path.join(self.base_path, rel_path), self.ig_ls)
+            changes.append(rel_path)
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, base_path, ig_ls=None, interval=5.0):
+        self.base_path = base_path
+        self.ig_ls = ig_ls
+        self.interval = interval
+        self.files = scan_tree(base_path, ig_ls)
+
+    def read_changes(self, timeout):
+        time.sleep(max(timeout, self.interval))
+        files = scan_tree(self.base_path, self.ig_ls)
+        changes = [rel_path for rel_path, stat in files.items() if self.files.get(rel_path) != stat]
+        changes.extend(rel_path for rel_path in self.files if rel_path not in files)
+        self.files = files
+        return changes
+
+    def close(self):
+        pass
+
+
+class FolderWatcher:
+    def __init__(self, paths, ig_ls=None, debounce=1.0, poll_interval=5.0, force_polling=False, persist_records=True):
+        self.base_paths = [os.path.normpath(p) for p in paths]
+        self.ig_ls = ig_ls
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.records = [{} for _ in self.base_paths]  # 相对路径 -> (大小, 修改时间, sha256)
+        self.persist_records = persist_records
+        self.record_counts = [Counter() for _ in self.base_paths]  # (文件名, sha256, 大小) -> 文件数
+        self.only_in = [set() for _ in self.base_paths]
+        self.mismatched = set()
+        self.lock = threading.Lock()
+        self.events = queue.Queue()
+        self.stopped = threading.Event()
+        self.on_change = None
+
+    def create_watcher(self, base_path):
+        if not self.force_polling and InotifyWatcher.is_supported():
+            try:
+                return InotifyWatcher(base_path, self.ig_ls, self.poll_interval)
+            except OSError as e:
+                print(f"inotify不可用，改为定时扫描：{str(e)}")
+        return PollingWatcher(base_path, self.ig_ls, self.poll_interval)
+
+    def run(self):
+        watchers = []
+        for side, base_path in enumerate(self.base_paths):
+            watcher = self.create_watcher(base_path)
+            watchers.append(watcher)
+            print(f"正在读取{base_path}并计算sha256中...")
+            self.rescan(side)
+        print(f"初始扫描结束，{self.summary()}")
+        threads = [threading.Thread(target=self.pump_events, args=(side, watcher), daemon=True)
+                   for side, watcher in enumerate(watchers)]
+        for thread in threads:
+            thread.start()
+        try:
+            self.process_events()
+        finally:
+            self.stopped.set()
+            for thread in threads:
+                thread.join()
+            for watcher in watchers:
+                watcher.close()
+
+    def stop(self):
+        self.stopped.set()
+
+    def pump_events(self, side, watcher):
+        while not self.stopped.is_set():
+            try:
+                changes = watcher.read_changes(0.5)
+            except OSError as e:
+                # 读取事件失败时不能让监听线程退出，否则该侧之后的变化都不会再被发现
+                print(f"\n读取{self.base_paths[side]}的文件变化失败，将重新扫描：{str(e)}")
+                changes = [RESCAN]
+                time.sleep(self.poll_interval)
+            for rel_path in changes:
+                self.events.put((side, rel_path))
+
+    def process_events(self):
+        pending = {}  # (侧, 相对路径) -> 最后一次事件时间
+        while not self.stopped.is_set():
+            try:
+                side, rel_path = self.events.get(timeout=self.debounce / 2)
+                pending[(side, rel_path)] = time.monotonic()
+            except queue.Empty:
+                pass
+            # 同一文件在防抖时间内的连续写入只处理一次
+            now = time.monotonic()
+            ready = [key for key, last in pending.items() if now - last >= self.debounce]
+            if not ready:
+                continue
+            for key in ready:
+                del pending[key]
+            self.apply_changes(ready)
+
+    def apply_changes(self, changes):
+        rescan_sides = {side for side, rel_path in changes if rel_path is RESCAN}
+        for side in rescan_sides:
+            self.rescan(side)
+        files = {}
+        for side, rel_path in changes:
+            if side in rescan_sides:
+                continue
+            files.update(self.expand_change(side, rel_path))
+        changed = self.hash_files(files)
+        if changed or rescan_sides:
+            print(f"{len(changed)}个文件发生变化，{self.summary()}")
+            if self.on_change:
+                self.on_change(changed, self.diff())
+
+    def expand_change(self, side, rel_path):
+        full_path = os.path.join(self.base_paths[side], rel_path)
+        if os.path.isdir(full_path):
+            scanned = {os.path.join(rel_path, rel): stat for rel, stat in scan_tree(full_path, self.ig_ls).items()}
+            prefix = rel_path + os.sep
+            removed = {rel: None for rel in self.records[side] if rel.startswith(prefix) and rel not in scanned}
+            return {(side, rel): stat for rel, stat in (scanned | removed).items()}
+        try:
+            stat = os.stat(full_path)
+            return {(side, rel_path): (stat.st_size, stat.st_mtime_ns)}
+        except OSError:
+            prefix = rel_path + os.sep
+            removed = [rel for rel in self.records[side] if rel == rel_path or rel.startswith(prefix)]
+            return {(side, rel): None for rel in removed}
+
+    def hash_files(self, files):
+        # 只重新计算大小或修改时间发生变化的文件，上次读取失败的文件也重新计算
+        to_hash = [key for key, stat in files.items() if stat is not None and self.is_stale(key, stat)]
+        hashes = {}
+        with ThreadPoolExecutor(max_workers=os.cpu_count() * 2) as executor:
+            futures = {executor.submit(calculate_sha256, os.path.join(self.base_paths[key[0]], key[1])): key
+                       for key in to_hash}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    hashes[key] = future.result() or None
+                except FileNotFoundError:
+                    hashes[key] = None
+                except OSError as e:
+                    # 读取失败的文件不能让监听退出，记录为sha256未知，与另一侧比对时视为不一致，之后再次计算
+                    print(f"\n计算sha256失败：{os.path.join(self.base_paths[key[0]], key[1])} - {str(e)}")
+                    hashes[key] = None
+                    continue
+                if hashes[key] is None:
+                    files[key] = None  # 计算前已被删除
+        changed = []
+        updates = []
+        with self.lock:
+            for (side, rel_path), stat in files.items():
+                if stat is None:
+                    old = self.records[side].pop(rel_path, None)
+                    if old is None:
+                        continue
+                    new = None
+                elif (side, rel_path) in hashes:
+                    old = self.records[side].get(rel_path)
+                    new = self.records[side][rel_path] = (*stat, hashes[(side, rel_path)])
+                else:
+                    continue
+                updates.append((side, rel_path, old, new))
+                self.update_diff(rel_path)
+                changed.append(os.path.join(self.base_paths[side], rel_path))
+        if self.persist_records:
+            self.write_records(updates)
+        return changed
+
+    def is_stale(self, key, stat):
+        record = self.records[key[0]].get(key[1])
+        return record is None or record[:2] != stat or record[2] is None
+
+    def write_records(self, updates):
+        # 与generate_sha256相同的记录格式 sha256/{文件名}.{sha256}.{大小}.sha256，记录只按文件名区分，
+        # 同名同内容的文件共用一个记录，最后一个文件变化后才删除
+        for side, rel_path, old, new in updates:
+            name = os.path.basename(rel_path)
+            sha256_folder = os.path.join(self.base_paths[side], "sha256")
+            try:
+                if new is not None and new[2]:
+                    key = (name, new[2], new[0])
+                    self.record_counts[side][key] += 1
+                    if self.record_counts[side][key] == 1:
+                        os.makedirs(sha256_folder, exist_ok=True)
+                        open(os.path.join(sha256_folder, f"{name}.{new[2]}.{new[0]}.sha256"), "a").close()
+                if old is not None and old[2]:
+                    key = (name, old[2], old[0])
+                    self.record_counts[side][key] -= 1
+                    if self.record_counts[side][key] <= 0:
+                        del self.record_counts[side][key]
+                        os.remove(os.path.join(sha256_folder, f"{name}.{old[2]}.{old[0]}.sha256"))
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"\n更新sha256记录失败：{os.path.join(self.base_paths[side], rel_path)} - {str(e)}")
+
+    def rescan(self, side):
+        files = scan_tree(self.base_paths[side], self.ig_ls)
+        removed = {(side, rel_path): None for rel_path in self.records[side] if rel_path not in files}
+        self.hash_files({(side, rel_path): stat for rel_path, stat in files.items()} | removed)
+
+    def update_diff(self, rel_path):
+        if len(self.base_paths) < 2:
+            return
+        record1 = self.records[0].get(rel_path)
+        record2 = self.records[1].get(rel_path)
+        self.only_in[0].discard(rel_path)
+        self.only_in[1].discard(rel_path)
+        self.mismatched.discard(rel_path)
+        if record1 and not record2:
+            self.only_in[0].add(rel_path)
+        elif record2 and not record1:
+            self.only_in[1].add(rel_path)
+        elif record1 and record2 and (record1[2] is None or record1[2] != record2[2]):
+            self.mismatched.add(rel_path)
+
+    def diff(self):
+        with self.lock:
+            return {
+                "1_not_in_2_folder": [],
+                "2_not_in_1_folder": [],
+                "1_not_in_2_file": sorted(self.only_in[0]),
+                "2_not_in_1_file": sorted(self.only_in[1]) if len(self.only_in) > 1 else [],
+                "sha256_not_match": sorted(self.mismatched)
+            }
+
+    def get_records(self, side=0):
+        with self.lock:
+            return dict(self.records[side])
+
+    def build_digest(self, side=0):
+        with self.lock:
+            files = {rel_path.replace(os.sep, "/"): record for rel_path, record in self.records[side].items()}
+        errors = {rel_path: "读取失败" for rel_path, record in files.items() if record[2] is None}
+        return TreeDigest({rel_path: record for rel_path, record in files.items() if rel_path not in errors},
+                          errors=errors)
+
+    def summary(self):
+        with self.lock:
+            if len(self.base_paths) < 2:
+                return f"共{len(self.records[0])}个文件"
+            return (f"{self.base_paths[1]}中缺失{len(self.only_in[0])}个文件，"
+                    f"{self.base_paths[0]}中缺失{len(self.only_in[1])}个文件，"
+                    f"{len(self.mismatched)}个文件sha256不一致")
+
+
+if __name__ == "__main__":
+    folder1 = input("请输入需要监听的文件夹路径：").strip()
+    folder2 = input("请输入需要对比的文件夹路径（直接回车表示只监听并计算sha256）：").strip()
+    debounce_input = input("请输入防抖时间（秒，默认为1）：").strip()
+    is_polling = input("是否强制使用定时扫描(默认使用inotify，输入Y时定时扫描)：").strip() == "Y"
+    is_persist = input("是否同步更新sha256文件夹中的记录(默认为更新，输入N时只在内存中比对)：").strip() != "N"
+    folder_watcher = FolderWatcher([folder1, folder2] if folder2 else [folder1],
+                                   ["node_modules", ".git", ".svn"],
+                                   float(debounce_input) if debounce_input else 1.0,
+                                   force_polling=is_polling, persist_records=is_persist)
+    try:
+        folder_watcher.run()
+    except KeyboardInterrupt:
+        print(f"\n已停止监听，{folder_watcher.summary()}")
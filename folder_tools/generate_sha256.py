@@ -1,11 +1,21 @@
 import hashlib
 import os
+import threading
 import time
+from collections import Counter
 from pathlib import Path
 from typing import Optional
 
+from archive_tree import ArchiveTree, is_archive
+from comparator import TreeDigest
+from io_throttle import THROTTLE, prompt_limits, read_chunks
+from metrics import METRICS, prompt_metrics, run_with_metrics
+from sampling import SampleVerifier, prompt_sample
+from snapshot import write_snapshot
 
-def calculate_sha256(file_path: Path) -> Optional[str]:
+
+def calculate_sha256(file_path: Path, show_progress: bool = True, queue_depth: int = 4,
+                     cancel: Optional[threading.Event] = None) -> Optional[str]:
     try:
         sha256 = hashlib.sha256()
         buffer_size = 1024 * 1024  # 1MB
@@ -13,18 +23,19 @@ def calculate_sha256(file_path: Path) -> Optional[str]:
         total_read = 0.0
         start_time = time.time() * 1000  # 毫秒
         last_update_time = start_time
+        THROTTLE.before_open()
         with open(file_path, 'rb', buffering=8192) as f:
-            while True:
-                buffer = f.read(buffer_size)
-                if not buffer:
-                    break
+            for buffer in read_chunks(f, buffer_size, queue_depth if file_size >= buffer_size * 8 else 0):
+                if cancel is not None and cancel.is_set():
+                    return None  # 抽样已结束，不再继续读取
                 sha256.update(buffer)
                 current_time = time.time() * 1000
                 total_read += len(buffer)
-                if current_time - last_update_time >= 100.0 or total_read == file_size:
+                if show_progress and (current_time - last_update_time >= 100.0 or total_read == file_size):
                     total_read_time = current_time - start_time
                     print_progress_info(total_read, file_size, total_read_time)
                     last_update_time = current_time
+        METRICS.observe_hash(file_path, file_size, (time.time() * 1000 - start_time) / 1000)
         return sha256.hexdigest()
     except Exception as e:
         print(f"未知错误: {file_path} - {str(e)}")
@@ -77,8 +88,12 @@ def format_speed(speed_bytes: float) -> str:
 
 
 def process_folder(folder_path: str):
+    if is_archive(folder_path):
+        process_archive(folder_path)
+        return
     path = Path(folder_path)
-    total_files = count_files(path)
+    with METRICS.phase("count"):
+        total_files = count_files(path)
     if total_files == 0:
         print("该文件夹下不存在文件！")
         return
@@ -91,7 +106,8 @@ def process_folder(folder_path: str):
             processed_files += 1
             print(f"正在处理第 {processed_files} 个文件，共 {total_files} 个，已创建 {create_count} 个sha256文件...")
             print(f"正在读取 {file_path.name} 并计算sha256中...")
-            sha256 = calculate_sha256(file_path)
+            with METRICS.phase("sha256"):
+                sha256 = calculate_sha256(file_path)
             if sha256 is None:
                 continue
             print(f"\n文件：{file_path.name}")
@@ -111,6 +127,93 @@ def process_folder(folder_path: str):
     print(f"总文件数：{total_files} ，已创建 {create_count} 个sha256文件，已存在 {exist_count} 个sha256文件")
 
 
+def process_archive(archive_path: str):
+    # 压缩包当作文件夹处理，成员直接从压缩包中流式读取计算sha256，记录保存在压缩包所在文件夹的sha256/{压缩包名}中
+    path = Path(archive_path)
+    print(f"正在读取压缩包{archive_path}中...")
+    with METRICS.phase("count"):
+        tree = ArchiveTree(archive_path, with_sha256=True)
+    total_files = len(tree.files)
+    if total_files == 0:
+        print("该压缩包中不存在文件！")
+        return
+    create_count = 0
+    exist_count = 0
+    sha256_folder = path.parent / 'sha256' / path.name
+    with METRICS.phase("sha256"):
+        for processed_files, (rel_path, sha256) in enumerate(tree.iter_sha256(), 1):
+            print(f"正在处理第 {processed_files} 个文件，共 {total_files} 个，已创建 {create_count} 个sha256文件...")
+            if isinstance(sha256, Exception):
+                print(f"未知错误: {path / rel_path} - {str(sha256)}")
+                continue
+            file_name = os.path.basename(rel_path)
+            print(f"文件：{rel_path}")
+            print(f"SHA256：{sha256}")
+            created = create_file_with_directories(sha256_folder / f"{file_name}.{sha256}.{tree.files[rel_path]}.sha256")
+            if created:
+                create_count += 1
+            else:
+                exist_count += 1
+            print()
+    print(f"总文件数：{total_files} ，已创建 {create_count} 个sha256文件，已存在 {exist_count} 个sha256文件")
+
+
+def verify_sample(folder_path: str, max_rate: float = 0.01, confidence: float = 0.95,
+                  time_budget: Optional[float] = None, stratified: bool = True):
+    path = Path(folder_path)
+    records = load_records(path / 'sha256')
+    digest = TreeDigest.load(path)
+    sizes = {}
+    for file_path in path.rglob('*'):
+        if file_path.is_file() and not file_path.name.endswith('.sha256') and 'sha256' not in file_path.parent.parts:
+            sizes[str(file_path.relative_to(path))] = file_path.stat().st_size
+    if not sizes:
+        print("该文件夹下不存在文件！")
+        return None
+
+    # sha256记录只按文件名保存，不同子文件夹中的同名文件无法区分，只用来校验文件名唯一的文件；
+    # 文件夹摘要按相对路径保存，优先使用
+    names = Counter(Path(rel_path).name for rel_path in sizes)
+
+    def expected_sha256(rel_path: str) -> Optional[set]:
+        entry = digest.files.get(Path(rel_path).as_posix()) if digest else None
+        if entry:
+            return {(entry[2], entry[0])}
+        name = Path(rel_path).name
+        return records.get(name) if names[name] == 1 else None
+
+    def check(rel_path: str) -> Optional[bool]:
+        file_path = path / rel_path
+        expected = expected_sha256(rel_path)
+        if not expected:
+            return None  # 没有sha256记录的文件无法校验
+        sha256 = calculate_sha256(file_path, show_progress=False, cancel=verifier.stopped)
+        if sha256 is None:
+            return None
+        return (sha256, file_path.stat().st_size) in expected
+
+    verifier = SampleVerifier(max_rate, confidence, time_budget, stratified)
+    sampled_before = SampleVerifier.load_state(folder_path)
+    report = verifier.run(verifier.order(list(sizes), sizes, sampled_before), check)
+    verifier.print_report(report, len(sizes))
+    for rel_path in report["mismatches"]:
+        print(f"sha256与记录不一致：{path / rel_path}")
+    SampleVerifier.save_state(folder_path, sampled_before, report["sampled"], sizes)
+    return report
+
+
+def load_records(sha256_folder: Path) -> dict:
+    records = {}
+    if not sha256_folder.is_dir():
+        return records
+    for record in sha256_folder.glob('*.sha256'):
+        # 记录文件名格式：{文件名}.{sha256}.{文件大小}.sha256
+        parts = record.name.rsplit('.', 3)
+        if len(parts) == 4 and parts[2].isdigit():
+            records.setdefault(parts[0], set()).add((parts[1], int(parts[2])))
+    return records
+
+
 def count_files(path: Path) -> int:
     return sum(1 for _ in path.rglob('*')
                if _.is_file()
@@ -131,7 +234,7 @@ def create_file_with_directories(file_path: Path) -> bool:
 
 
 if __name__ == "__main__":
-    user_input = input("请输入需要计算sha256值的根文件目录（默认为当前用户Downloads文件夹 ，直接回车使用默认值）：")
+    user_input = input("请输入需要计算sha256值的根文件目录或zip/tar压缩包（默认为当前用户Downloads文件夹 ，直接回车使用默认值）：")
     if user_input.strip() == "":
         user_profile = os.environ.get('USERPROFILE')
         if user_profile:
@@ -141,4 +244,20 @@ if __name__ == "__main__":
             raise Exception("读取环境变量USERPROFILE失败，无法读取默认值，请输入文件目录")
     else:
         result = user_input
-    process_folder(result)
+    prompt_limits()
+    # 压缩包只支持生成sha256文件
+    is_archive_input = is_archive(result)
+    is_sample, time_budget = (False, None) if is_archive_input else prompt_sample(
+        "是否抽样校验已有的sha256记录(默认为生成sha256文件，输入抽样的时间预算秒数时在预算内抽样校验，输入Y时抽样到置信度达标为止)：")
+    is_snapshot = not is_sample and not is_archive_input and input(
+        "是否生成快照(默认为生成sha256文件，输入Y时生成快照文件，未修改的文件沿用上一个快照中的sha256)：").strip() == "Y"
+    metrics_output, is_profile = prompt_metrics()
+    if is_sample:
+        run_with_metrics(verify_sample, result, time_budget=time_budget, output_file=metrics_output, profile=is_profile)
+    elif is_snapshot:
+        run_with_metrics(write_snapshot, result, output_file=metrics_output, profile=is_profile)
+    else:
+        run_with_metrics(process_folder, result, output_file=metrics_output, profile=is_profile)
+        if not is_archive_input and input("是否同时更新文件夹摘要(默认为不更新，输入Y时更新)：").strip() == "Y":
+            TreeDigest.update(result)
+            print(f"文件夹摘要已保存：{os.path.join(result, TreeDigest.DIGEST_FILE)}")
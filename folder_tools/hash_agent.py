@@ -0,0 +1,169 @@
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import struct
+import threading
+import time
+import uuid
+import zlib
+
+from comparator import AGENT_SCHEME, TreeDigest
+
+FRAME_HEADER = struct.Struct(">I")
+BATCH_SIZE = 64 * 1024
+SESSION_TTL = 600  # 会话保留时间（秒），断线后在此时间内可以续传
+MAX_REQUEST_SIZE = 4096
+TOKEN_ENV = "FOLDER_TOOLS_AGENT_TOKEN"  # 地址中没有令牌时从该环境变量读取
+
+
+class HashAgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            line = self.rfile.readline(MAX_REQUEST_SIZE + 1)
+            if len(line) > MAX_REQUEST_SIZE or not line.endswith(b"\n"):
+                raise ValueError("请求过长或不完整")
+            request = json.loads(line)
+            # 令牌校验通过前不读取任何文件信息
+            if not hmac.compare_digest(str(request.get("token", "")).encode("utf-8"), self.server.token.encode("utf-8")):
+                raise PermissionError("令牌错误")
+            entries, session_id = self.server.get_entries(request)
+        except Exception as e:
+            self.send_header({"error": str(e)})
+            return
+        offset = int(request.get("offset", 0))
+        self.send_header({"session": session_id, "total": len(entries)})
+        # 文件列表按行压缩后分帧发送，每帧独立刷新，客户端收到即可解析
+        compressor = zlib.compressobj(6)
+        batch = []
+        batch_size = 0
+        for line in entries[offset:]:
+            batch.append(line)
+            batch_size += len(line)
+            if batch_size >= BATCH_SIZE:
+                self.send_frame(compressor.compress("".join(batch).encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH))
+                batch = []
+                batch_size = 0
+        self.send_frame(compressor.compress("".join(batch).encode("utf-8")) + compressor.flush())
+        self.send_frame(b"")
+
+    def send_header(self, header):
+        self.wfile.write(json.dumps(header).encode("utf-8") + b"\n")
+
+    def send_frame(self, data):
+        self.wfile.write(FRAME_HEADER.pack(len(data)) + data)
+
+
+class HashAgent(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, base_path, host="127.0.0.1", port=8765, ig_ls=None, token=None):
+        super().__init__((host, port), HashAgentHandler)
+        self.base_path = os.path.normpath(base_path)
+        self.token = token or secrets.token_urlsafe(16)
+        self.ig_ls = ig_ls
+        self.sessions = {}  # 会话id -> (最后访问时间, 文件列表)
+        self.lock = threading.Lock()
+        self.hash_lock = threading.Lock()
+
+    def get_entries(self, request):
+        session_id = request.get("session")
+        now = time.monotonic()
+        with self.lock:
+            for expired in [k for k, (last, _) in self.sessions.items() if now - last > SESSION_TTL]:
+                del self.sessions[expired]
+            if session_id in self.sessions:
+                entries = self.sessions[session_id][1]
+                self.sessions[session_id] = (now, entries)
+                return entries, session_id
+        if session_id:
+            raise ValueError(f"会话{session_id}不存在或已过期")
+        with self.hash_lock:
+            print(f"正在更新{self.base_path}的文件夹摘要中...")
+            digest = TreeDigest.update(self.base_path, self.ig_ls, bool(request.get("refresh", False)))
+        entries = list(digest.to_lines())
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[session_id] = (time.monotonic(), entries)
+        print(f"会话{session_id}：共{len(entries)}个文件/文件夹")
+        return entries, session_id
+
+
+class HashAgentClient:
+    def __init__(self, host, port, token=None, retries=3, timeout=None):
+        self.host = host
+        self.port = port
+        self.token = token if token is not None else os.environ.get(TOKEN_ENV, "")
+        self.retries = retries
+        self.timeout = timeout
+
+    @classmethod
+    def from_address(cls, address):
+        # agent://令牌@主机:端口
+        token, _, location = address[len(AGENT_SCHEME):].rstrip("/").rpartition("@")
+        host, _, port = location.rpartition(":")
+        return cls(host, int(port), token or None)
+
+    def fetch_digest(self, refresh=False):
+        return TreeDigest.from_lines(self.fetch_entries(refresh))
+
+    def fetch_entries(self, refresh=False):
+        entries = []
+        session = {"session": None, "total": None}  # 收到响应头后立即记录，断线后用于续传
+        attempts = 0
+        while session["total"] is None or len(entries) < session["total"]:
+            try:
+                self.receive(entries, session, refresh)
+            except (OSError, zlib.error, EOFError) as e:
+                attempts += 1
+                if attempts > self.retries:
+                    raise
+                # 断线后带上会话id和已收到的条数重新连接，从断点继续传输
+                print(f"连接{self.host}:{self.port}中断，正在从第{len(entries)}条续传：{str(e)}")
+                time.sleep(min(attempts, 5))
+        return entries
+
+    def receive(self, entries, session, refresh):
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            stream = sock.makefile("rb")
+            request = {"token": self.token, "session": session["session"], "offset": len(entries), "refresh": refresh}
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            header = json.loads(stream.readline() or b"null")
+            if header is None:
+                raise EOFError("未收到响应")
+            if "error" in header:
+                raise RuntimeError(f"{self.host}:{self.port}拒绝了请求：{header['error']}")
+            session.update(session=header["session"], total=header["total"])
+            decompressor = zlib.decompressobj()
+            pending = ""
+            while True:
+                frame_header = stream.read(FRAME_HEADER.size)
+                if len(frame_header) < FRAME_HEADER.size:
+                    raise EOFError("连接提前关闭")
+                (length,) = FRAME_HEADER.unpack(frame_header)
+                if length == 0:
+                    break
+                data = stream.read(length)
+                if len(data) < length:
+                    raise EOFError("连接提前关闭")
+                lines = (pending + decompressor.decompress(data).decode("utf-8")).split("\n")
+                pending = lines.pop()
+                entries.extend(line + "\n" for line in lines)
+
+
+if __name__ == "__main__":
+    folder = input("请输入需要提供sha256的文件夹路径：").strip()
+    port_input = input("请输入监听端口（默认为8765）：").strip()
+    host_input = input("请输入监听地址（默认为127.0.0.1只允许本机访问，输入0.0.0.0时允许其他主机访问）：").strip()
+    token_input = input("请输入访问令牌（默认随机生成）：").strip()
+    agent = HashAgent(folder, host_input or "127.0.0.1", int(port_input) if port_input else 8765,
+                      ["node_modules", ".git", ".svn"], token_input or None)
+    print(f"hash_agent已启动，比对时请输入{AGENT_SCHEME}{agent.token}@<本机地址>:{agent.server_address[1]}"
+          f"（也可以把令牌放在环境变量{TOKEN_ENV}中）")
+    try:
+        agent.serve_forever()
+    except KeyboardInterrupt:
+        print("\nhash_agent已停止")
@@ -0,0 +1,185 @@
+import json
+import os
+import queue
+import threading
+import time
+
+MAX_BACKOFF = 10.0  # 延迟升高时每次读取后最多等待读取耗时的10倍
+
+
+class TokenBucket:
+    def __init__(self, rate=None, burst=None):
+        self.lock = threading.Lock()
+        self.rate = None
+        self.burst = 0.0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        with self.lock:
+            self.rate = rate or None
+            self.burst = float(burst or rate or 0)
+            self.tokens = min(self.tokens, self.burst)
+            self.updated = time.monotonic()
+
+    def acquire(self, amount):
+        with self.lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # 允许令牌为负数，超出的部分通过等待来偿还，大于桶容量的请求也不会一直阻塞
+            self.tokens -= amount
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+    def refund(self, amount):
+        with self.lock:
+            if self.rate:
+                self.tokens = min(self.burst, self.tokens + amount)
+
+
+class IoThrottle:
+    def __init__(self, bytes_per_second=None, opens_per_second=None, latency_target=None):
+        self.bytes = TokenBucket()
+        self.opens = TokenBucket()
+        self.lock = threading.Lock()
+        self.latency_target = None
+        self.latency = 0.0  # 每MB读取耗时的指数移动平均（秒）
+        self.backoff = 0.0
+        self.enabled = False
+        self.set_limits(bytes_per_second, opens_per_second, latency_target)
+
+    def set_limits(self, bytes_per_second=None, opens_per_second=None, latency_target=None):
+        self.bytes.set_rate(bytes_per_second)
+        self.opens.set_rate(opens_per_second)
+        with self.lock:
+            self.latency_target = latency_target or None
+            if not self.latency_target:
+                self.backoff = 0.0
+        self.enabled = bool(bytes_per_second or opens_per_second or latency_target)
+
+    def before_open(self):
+        if self.enabled:
+            self.opens.acquire(1)
+
+    def read(self, f, size):
+        if not self.enabled:
+            return f.read(size)
+        self.bytes.acquire(size)
+        start = time.monotonic()
+        data = f.read(size)
+        elapsed = time.monotonic() - start
+        self.bytes.refund(size - len(data))
+        if self.latency_target and data:
+            self.adjust_backoff(elapsed * 1024 * 1024 / len(data))
+            if self.backoff:
+                time.sleep(elapsed * self.backoff)
+        return data
+
+    def adjust_backoff(self, latency):
+        with self.lock:
+            self.latency = latency if not self.latency else self.latency * 0.8 + latency * 0.2
+            # 延迟超过目标值时成倍增加等待时间，恢复后逐渐减少
+            if self.latency > self.latency_target:
+                self.backoff = min(MAX_BACKOFF, self.backoff * 2 if self.backoff else 0.1)
+            elif self.backoff:
+                self.backoff = self.backoff * 0.9 if self.backoff > 0.01 else 0.0
+
+    def watch_config(self, config_file, interval=1.0):
+        # 运行期间修改配置文件即可调整限速，例如 {"mb_per_second": 50, "opens_per_second": 200}
+        def reload():
+            last_mtime = None
+            while True:
+                try:
+                    mtime = os.stat(config_file).st_mtime_ns
+                    if mtime != last_mtime:
+                        last_mtime = mtime
+                        with open(config_file, encoding="utf-8") as f:
+                            config = json.load(f)
+                        self.set_limits(config.get("mb_per_second", 0) * 1024 * 1024,
+                                        config.get("opens_per_second"), config.get("latency_ms", 0) / 1000)
+                        print(f"\n已重新加载限速配置：{config}")
+                except (OSError, ValueError) as e:
+                    if last_mtime is not None:
+                        print(f"\n读取限速配置失败：{config_file} - {str(e)}")
+                        last_mtime = None
+                time.sleep(interval)
+
+        threading.Thread(target=reload, daemon=True).start()
+
+
+THROTTLE = IoThrottle()  # 全局限速器，所有sha256计算共用，默认不限速
+
+
+def prompt_number(message):
+    # 直接回车返回None，输入不是正数时重新输入
+    while True:
+        number_input = input(message).strip()
+        if not number_input:
+            return None
+        try:
+            number = float(number_input)
+        except ValueError:
+            number = 0
+        if number > 0:
+            return number
+        print(f"输入无效：{number_input}，请输入大于0的数字")
+
+
+def prompt_limits():
+    mb_per_second = prompt_number("请输入读取限速（MB/s，直接回车不限速）：")
+    opens_per_second = prompt_number("请输入每秒最多打开的文件数（直接回车不限制）：")
+    latency_ms = prompt_number("请输入读取延迟上限（毫秒/MB，超过时自动降速，直接回车不启用）：")
+    THROTTLE.set_limits(mb_per_second * 1024 * 1024 if mb_per_second else None, opens_per_second,
+                        latency_ms / 1000 if latency_ms else None)
+    config_input = input("请输入限速配置文件路径（运行期间修改该文件可调整限速，直接回车不启用）：").strip()
+    if config_input:
+        THROTTLE.watch_config(config_input)
+
+
+def read_chunks(f, chunk_size, queue_depth=0):
+    if queue_depth <= 0:
+        while True:
+            data = THROTTLE.read(f, chunk_size)
+            if not data:
+                return
+            yield data
+    # 读取线程提前读取后续数据块，与当前数据块的sha256计算并行进行
+    chunks = queue.Queue(maxsize=queue_depth)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def reader():
+        try:
+            while not stopped.is_set():
+                data = THROTTLE.read(f, chunk_size)
+                put(data)
+                if not data:
+                    return
+        except Exception as e:
+            put(e)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = chunks.get()
+            if isinstance(item, Exception):
+                raise item
+            if not item:
+                return
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
@@ -0,0 +1,191 @@
+import cProfile
+import heapq
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+HASH_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60, 300)
+SLOWEST_COUNT = 20
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.trace_file = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.phases = {}  # 阶段 -> [墙钟时间, CPU时间, 次数]
+            self.counters = {}
+            self.gauges = {}  # 名称 -> [当前值, 最大值]
+            self.hash_buckets = [0] * (len(HASH_LATENCY_BUCKETS) + 1)
+            self.hash_sum = 0.0
+            self.slowest_files = []  # 小顶堆，保留耗时最长的文件
+            self.dir_seconds = {}
+
+    def enable(self, trace_file=None):
+        self.enabled = True
+        if trace_file:
+            self.trace_file = open(trace_file, "w", encoding="utf-8", buffering=1)
+            self.trace_file.write("path\tsize\tseconds\n")
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add_phase(self, name, wall, cpu=0.0):
+        with self.lock:
+            totals = self.phases.setdefault(name, [0.0, 0.0, 0])
+            totals[0] += wall
+            totals[1] += cpu
+            totals[2] += 1
+
+    def count(self, name, value=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        if self.enabled:
+            with self.lock:
+                current = self.gauges.setdefault(name, [0, 0])
+                current[0] = value
+                current[1] = max(current[1], value)
+
+    def observe_hash(self, file_path, size, seconds):
+        if not self.enabled:
+            return
+        file_path = str(file_path)
+        bucket = next((i for i, bound in enumerate(HASH_LATENCY_BUCKETS) if seconds <= bound), -1)
+        with self.lock:
+            self.hash_buckets[bucket] += 1
+            self.hash_sum += seconds
+            self.counters["files_hashed"] = self.counters.get("files_hashed", 0) + 1
+            self.counters["bytes_hashed"] = self.counters.get("bytes_hashed", 0) + size
+            if self.trace_file:
+                self.trace_file.write(f"{file_path}\t{size}\t{seconds:.6f}\n")
+                item = (seconds, file_path, size)
+                if len(self.slowest_files) < SLOWEST_COUNT:
+                    heapq.heappush(self.slowest_files, item)
+                elif item > self.slowest_files[0]:
+                    heapq.heapreplace(self.slowest_files, item)
+                dir_path = os.path.dirname(file_path)
+                self.dir_seconds[dir_path] = self.dir_seconds.get(dir_path, 0.0) + seconds
+
+    def summary(self):
+        with self.lock:
+            return {
+                "phases": {name: {"wall_seconds": wall, "cpu_seconds": cpu, "count": count}
+                           for name, (wall, cpu, count) in self.phases.items()},
+                "counters": dict(self.counters),
+                "gauges": {name: {"current": current, "max": peak} for name, (current, peak) in self.gauges.items()},
+                "hash_latency": {
+                    "buckets": {str(bound): count for bound, count in
+                                zip((*HASH_LATENCY_BUCKETS, "+Inf"), self.hash_buckets)},
+                    "sum_seconds": self.hash_sum
+                },
+                "slowest_files": [{"path": path, "size": size, "seconds": seconds}
+                                  for seconds, path, size in sorted(self.slowest_files, reverse=True)],
+                "slowest_dirs": [{"path": path, "seconds": seconds} for path, seconds in
+                                 heapq.nlargest(SLOWEST_COUNT, self.dir_seconds.items(), key=lambda item: item[1])]
+            }
+
+    def to_prometheus(self):
+        summary = self.summary()
+        lines = ["# TYPE folder_tools_phase_wall_seconds gauge"]
+        lines += [f'folder_tools_phase_wall_seconds{{phase="{name}"}} {phase["wall_seconds"]:.6f}'
+                  for name, phase in summary["phases"].items()]
+        lines.append("# TYPE folder_tools_phase_cpu_seconds gauge")
+        lines += [f'folder_tools_phase_cpu_seconds{{phase="{name}"}} {phase["cpu_seconds"]:.6f}'
+                  for name, phase in summary["phases"].items()]
+        for name, value in summary["counters"].items():
+            lines.append(f"# TYPE folder_tools_{name}_total counter")
+            lines.append(f"folder_tools_{name}_total {value}")
+        lines.append("# TYPE folder_tools_queue_depth_max gauge")
+        lines += [f'folder_tools_queue_depth_max{{queue="{name}"}} {gauge["max"]}'
+                  for name, gauge in summary["gauges"].items()]
+        lines.append("# TYPE folder_tools_hash_latency_seconds histogram")
+        cumulative = 0
+        for bound, count in summary["hash_latency"]["buckets"].items():
+            cumulative += count
+            lines.append(f'folder_tools_hash_latency_seconds_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'folder_tools_hash_latency_seconds_sum {summary["hash_latency"]["sum_seconds"]:.6f}')
+        lines.append(f"folder_tools_hash_latency_seconds_count {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, output_file):
+        # .prom 文件供 node_exporter 的 textfile collector 读取，其余按 JSON 输出
+        if output_file.endswith(".prom"):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.summary(), ensure_ascii=False, indent=2)
+        with open(output_file + ".tmp", "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(output_file + ".tmp", output_file)
+
+    def print_summary(self):
+        summary = self.summary()
+        for name, phase in summary["phases"].items():
+            print(f"阶段 {name}：耗时 {phase['wall_seconds']:.3f} s，CPU {phase['cpu_seconds']:.3f} s，{phase['count']} 次")
+        for name, value in summary["counters"].items():
+            print(f"{name}：{value}")
+        for item in summary["slowest_files"][:5]:
+            print(f"最慢的文件：{item['path']}（{item['size']} B，{item['seconds']:.3f} s）")
+        for item in summary["slowest_dirs"][:5]:
+            print(f"最慢的文件夹：{item['path']}（{item['seconds']:.3f} s）")
+
+    def close(self):
+        if self.trace_file:
+            self.trace_file.close()
+            self.trace_file = None
+
+
+METRICS = Metrics()  # 全局性能统计，默认关闭
+
+
+def run_profiled(func, *args, profile_output=None, **kwargs):
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        if profile_output:
+            profiler.dump_stats(profile_output)
+            print(f"cProfile结果已保存：{profile_output}")
+        else:
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
+
+
+def prompt_metrics():
+    output_file = input("请输入性能统计输出文件路径（.json或.prom，直接回车不统计）：").strip()
+    trace_file = input("请输入逐个文件耗时记录的输出路径（直接回车不记录）：").strip()
+    profile_input = input("是否使用cProfile分析本次运行(默认为不分析，输入Y时分析)：").strip() == "Y"
+    if output_file or trace_file:
+        METRICS.enable(trace_file)
+    return output_file, profile_input
+
+
+def run_with_metrics(func, *args, output_file=None, profile=False, **kwargs):
+    try:
+        if profile:
+            return run_profiled(func, *args, **kwargs)
+        return func(*args, **kwargs)
+    finally:
+        if METRICS.enabled:
+            METRICS.print_summary()
+            if output_file:
+                METRICS.write(output_file)
+                print(f"性能统计已保存：{output_file}")
+            METRICS.close()
@@ -0,0 +1,82 @@
+import os
+from array import array
+
+
+class PathStore:
+    # 文件夹路径只保存一次，文件名以UTF-8紧凑存放在同一个bytearray中，每个文件只占用约 12 字节 + 文件名长度
+    def __init__(self, paths=()):
+        self.dir_ids = {}  # 文件夹相对路径 -> 文件夹id
+        self.dir_paths = []
+        self.file_dirs = array("I")
+        self.name_ends = array("Q")
+        self.names = bytearray()
+        self.extend(paths)
+
+    def intern_dir(self, dir_path):
+        dir_id = self.dir_ids.get(dir_path)
+        if dir_id is None:
+            dir_id = len(self.dir_paths)
+            self.dir_ids[dir_path] = dir_id
+            self.dir_paths.append(dir_path)
+        return dir_id
+
+    def add_files(self, dir_path, names):
+        dir_id = self.intern_dir(dir_path)
+        for name in names:
+            self.names += name.encode("utf-8", "surrogateescape")
+            self.name_ends.append(len(self.names))
+            self.file_dirs.append(dir_id)
+
+    def append(self, rel_path):
+        dir_path, name = os.path.split(rel_path)
+        self.add_files(dir_path, (name,))
+
+    def extend(self, paths):
+        if isinstance(paths, PathStore):
+            for dir_path, name in paths.iter_parts():
+                self.add_files(dir_path, (name,))
+            return
+        for rel_path in paths:
+            self.append(rel_path)
+
+    def clear(self):
+        self.__init__()
+
+    def get_parts(self, index):
+        start = self.name_ends[index - 1] if index else 0
+        name = self.names[start:self.name_ends[index]].decode("utf-8", "surrogateescape")
+        return self.dir_paths[self.file_dirs[index]], name
+
+    def iter_parts(self):
+        start = 0
+        for dir_id, end in zip(self.file_dirs, self.name_ends):
+            yield self.dir_paths[dir_id], self.names[start:end].decode("utf-8", "surrogateescape")
+            start = end
+
+    def iter_sorted_parts(self):
+        # 按文件夹分组并排序，每次只需要解码一个文件夹下的文件名
+        by_dir = {}
+        for index, dir_id in enumerate(self.file_dirs):
+            by_dir.setdefault(dir_id, array("Q")).append(index)
+        for dir_path in sorted(self.dir_ids):
+            indexes = by_dir.get(self.dir_ids[dir_path])
+            if indexes:
+                yield dir_path, sorted(self.get_parts(index)[1] for index in indexes)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PathStore index out of range")
+        dir_path, name = self.get_parts(index)
+        return os.path.join(dir_path, name) if dir_path else name
+
+    def __iter__(self):
+        for dir_path, name in self.iter_parts():
+            yield os.path.join(dir_path, name) if dir_path else name
+
+    def __len__(self):
+        return len(self.file_dirs)
+
+    def __repr__(self):
+        return f"PathStore({len(self)} paths, {len(self.dir_paths)} folders)"
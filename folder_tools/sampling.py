@@ -0,0 +1,187 @@
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from statistics import NormalDist
+
+STATE_FILE = os.path.join("sha256", "sample_state.txt")
+
+
+class SampleVerifier:
+    def __init__(self, max_rate=0.01, confidence=0.95, time_budget=None, stratified=True, seed=None):
+        self.max_rate = max_rate
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.time_budget = time_budget
+        self.stratified = stratified
+        self.random = random.Random(seed)
+        self.stopped = threading.Event()  # 抽样结束时设置，正在计算的sha256在下一个数据块前停止
+        self.strata = {}  # 文件 -> 所在的层，不分层时为空
+        self.population = Counter()  # 层 -> 该层的文件总数
+
+    @staticmethod
+    def wilson_interval(mismatches, samples, z):
+        if samples == 0:
+            return 0.0, 1.0
+        rate = mismatches / samples
+        denominator = 1 + z * z / samples
+        center = (rate + z * z / (2 * samples)) / denominator
+        margin = z * math.sqrt(rate * (1 - rate) / samples + z * z / (4 * samples * samples)) / denominator
+        return max(0.0, center - margin), min(1.0, center + margin)
+
+    def estimate(self, samples, mismatches):
+        # samples、mismatches：层 -> 抽样数、不一致数；返回 (估计的不一致率, 置信下限, 置信上限)
+        total = sum(samples.values())
+        if not self.population:
+            rate = sum(mismatches.values()) / total if total else 0.0
+            return rate, *self.wilson_interval(sum(mismatches.values()), total, self.z)
+        # 分层抽样时各层被抽中的比例不同，按各层在全部文件中的占比加权估计不一致率，
+        # 用Kish有效样本量代入Wilson区间；尚未抽到的层按全部不一致计入上限
+        sampled = {stratum: count for stratum, count in samples.items() if count}
+        if not sampled:
+            return 0.0, 0.0, 1.0
+        population = sum(self.population.values())
+        covered = sum(self.population[stratum] for stratum in sampled) / population
+        weights = {stratum: self.population[stratum] / population / covered for stratum in sampled}
+        rate = sum(weights[stratum] * mismatches[stratum] / count for stratum, count in sampled.items())
+        effective = 1 / sum(weights[stratum] ** 2 / count for stratum, count in sampled.items())
+        low, high = self.wilson_interval(rate * effective, effective, self.z)
+        return rate, low * covered, high * covered + (1 - covered)
+
+    def order(self, files, sizes=None, sampled_before=()):
+        # 优先抽取之前未抽到的文件，多次运行后会轮流覆盖所有文件
+        sampled_before = set(sampled_before)
+        if self.stratified and sizes:
+            self.strata = {f: sizes[f].bit_length() for f in files}
+            self.population = Counter(self.strata.values())
+        fresh = [f for f in files if f not in sampled_before]
+        seen = [f for f in files if f in sampled_before]
+        return self.arrange(fresh, sizes) + self.arrange(seen, sizes)
+
+    def arrange(self, files, sizes):
+        self.random.shuffle(files)
+        if not self.stratified or not sizes:
+            return files
+        # 按文件大小的数量级分层，轮流从每一层抽取，避免样本全是小文件
+        strata = {}
+        for f in files:
+            strata.setdefault(self.strata.get(f, sizes[f].bit_length()), []).append(f)
+        ordered = []
+        layers = list(strata.values())
+        for i in range(max(len(layer) for layer in layers) if layers else 0):
+            ordered.extend(layer[i] for layer in layers if i < len(layer))
+        return ordered
+
+    def run(self, items, check, max_workers=None):
+        max_workers = max_workers or os.cpu_count() * 2
+        start = time.monotonic()
+        samples = 0
+        mismatches = []
+        skipped = 0
+        reason = "已抽取全部文件"
+        sampled = []
+        counts, bad = Counter(), Counter()  # 层 -> 抽样数、不一致数
+        self.stopped.clear()
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            items = iter(items)
+            pending = {}
+            while True:
+                while len(pending) < max_workers:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    pending[executor.submit(check, item)] = item
+                if not pending:
+                    break
+                # 单个大文件也不能让抽样超出时间预算
+                timeout = max(0.0, start + self.time_budget - time.monotonic()) if self.time_budget else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except OSError as e:
+                        print(f"抽样校验失败：{item} - {str(e)}")
+                        result = None
+                    if result is None:
+                        skipped += 1
+                        continue
+                    samples += 1
+                    sampled.append(item)
+                    stratum = self.strata.get(item)
+                    counts[stratum] += 1
+                    if not result:
+                        mismatches.append(item)
+                        bad[stratum] += 1
+                rate, low, high = self.estimate(counts, bad)
+                if high <= self.max_rate:
+                    reason = f"不一致率已在{self.confidence:.0%}置信度下低于{self.max_rate:.2%}"
+                    break
+                if low > self.max_rate:
+                    reason = f"不一致率已在{self.confidence:.0%}置信度下高于{self.max_rate:.2%}"
+                    break
+                if self.time_budget and time.monotonic() - start >= self.time_budget:
+                    reason = f"已达到时间预算{self.time_budget}秒"
+                    break
+        finally:
+            self.stopped.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        rate, low, high = self.estimate(counts, bad)
+        return {
+            "samples": samples,
+            "skipped": skipped,
+            "mismatches": mismatches,
+            "rate": rate,
+            "low": low,
+            "high": high,
+            "reason": reason,
+            "sampled": sampled,
+            "elapsed": time.monotonic() - start
+        }
+
+    def print_report(self, report, total):
+        print(f"抽样校验结束（{report['reason']}），共{total}个文件，抽样{report['samples']}个，"
+              f"跳过{report['skipped']}个，发现{len(report['mismatches'])}个不一致，耗时{report['elapsed']:.2f} s")
+        print(f"估计不一致率：{report['rate']:.4%}（{self.confidence:.0%}置信区间：{report['low']:.4%} ~ {report['high']:.4%}）")
+
+    @staticmethod
+    def load_state(base_path):
+        state_file = os.path.join(base_path, STATE_FILE)
+        if not os.path.isfile(state_file):
+            return set()
+        with open(state_file, encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f}
+
+    @staticmethod
+    def save_state(base_path, sampled_before, sampled, all_files):
+        state = set(sampled_before) | set(sampled)
+        all_files = set(all_files)
+        state &= all_files
+        if state >= all_files:
+            state = set(sampled)  # 所有文件都已抽到过，开始新一轮
+        state_file = os.path.join(base_path, STATE_FILE)
+        os.makedirs(os.path.dirname(state_file), exist_ok=True)
+        with open(state_file + ".tmp", "w", encoding="utf-8") as f:
+            f.writelines(f"{rel_path}\n" for rel_path in sorted(state))
+        os.replace(state_file + ".tmp", state_file)
+
+
+def prompt_sample(message):
+    # 返回 (是否抽样, 时间预算)，输入不是正数秒数或Y时重新输入
+    while True:
+        sample_input = input(message).strip()
+        if not sample_input:
+            return False, None
+        if sample_input == "Y":
+            return True, None
+        try:
+            time_budget = float(sample_input)
+        except ValueError:
+            time_budget = 0
+        if time_budget > 0:
+            return True, time_budget
+        print(f"输入无效：{sample_input}，请输入抽样的时间预算秒数或Y")
@@ -1,25 +1,453 @@
+import fnmatch
+import heapq
+import mmap
 import os
+import re
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
 
+from comparator import TreeDigest, calculate_sha256
+from file_index import FileIndex
+from generate_sha256 import load_records
 
-def search_files(root_dir, keyword):
+MATCH_MODES = {"1": "substring", "2": "prefix", "3": "name", "4": "glob", "5": "regex", "6": "fuzzy", "7": "content",
+               "8": "hash"}
+INDEX_MODES = ("substring", "prefix", "name")  # 文件名索引支持的匹配方式
+WALK_WORKERS = 16  # 同时列出文件夹的线程数，网络盘延迟较高时可以适当增加
+BINARY_CHECK_SIZE = 8192  # 文件开头这部分中出现空字节时视为二进制文件
+CONTENT_MMAP_THRESHOLD = 1024 * 1024  # 超过该大小的文件使用mmap查找，不整体读入内存
+SEARCH_CHUNK_SIZE = 16 * 1024 * 1024
+MAX_LINE_LENGTH = 300
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+SORT_KEYS = {"size": lambda result: result[1].st_size, "mtime": lambda result: result[1].st_mtime_ns}
+
+
+class MetadataFilter:
+    def __init__(self, min_size=None, max_size=None, min_mtime=None, max_mtime=None, extensions=None, empty=False):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.min_mtime = min_mtime
+        self.max_mtime = max_mtime
+        self.extensions = tuple(e.lower() if e.startswith(".") else f".{e.lower()}" for e in extensions or ())
+        self.empty = empty
+        # 只有用到大小或修改时间时才需要stat，Linux上DirEntry.stat()需要一次系统调用
+        self.needs_stat = empty or any(value is not None for value in (min_size, max_size, min_mtime, max_mtime))
+
+    def match_name(self, name):
+        return not self.extensions or name.lower().endswith(self.extensions)
+
+    def match_stat(self, stat):
+        if self.empty and stat.st_size:
+            return False
+        if self.min_size is not None and stat.st_size < self.min_size:
+            return False
+        if self.max_size is not None and stat.st_size > self.max_size:
+            return False
+        if self.min_mtime is not None and stat.st_mtime < self.min_mtime:
+            return False
+        if self.max_mtime is not None and stat.st_mtime > self.max_mtime:
+            return False
+        return True
+
+
+def compile_matcher(pattern, kind="substring"):
+    # 每次查询只编译一次，返回判断文件名是否匹配的函数
+    if kind == "substring":
+        keyword = pattern.lower()
+        return lambda name: keyword in name.lower()
+    if kind == "prefix":
+        keyword = pattern.lower()
+        return lambda name: name.lower().startswith(keyword)
+    if kind == "name":
+        keyword = pattern.lower()
+        return lambda name: name.lower() == keyword
+    if kind == "glob":
+        return re.compile(fnmatch.translate(pattern), re.IGNORECASE).match
+    if kind == "regex":
+        return re.compile(pattern, re.IGNORECASE).search
+    if kind == "fuzzy":
+        # 按顺序包含关键字中的每个字符即可，例如 cmpr 可以匹配 comparator.py
+        return re.compile(".*?".join(map(re.escape, pattern)), re.IGNORECASE).search
+    raise ValueError(f"不支持的匹配方式：{kind}")
+
+
+def list_dir(path):
+    try:
+        with os.scandir(path) as entries:
+            return list(entries)
+    except OSError as e:
+        print(f"读取文件夹失败：{path} - {str(e)}")
+        return []
+
+
+def walk_entries(root_dir, ig_ls=None, max_workers=WALK_WORKERS):
+    # 多个线程同时列出文件夹，网络盘上每次列出的延迟可以相互重叠；生成器关闭后不再提交新的文件夹
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending_dirs = [root_dir]
+    running = set()
+    try:
+        while pending_dirs or running:
+            while pending_dirs and len(running) < max_workers * 2:
+                running.add(executor.submit(list_dir, pending_dirs.pop()))
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                for entry in future.result():
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        # 与os.walk一致：指向文件夹的符号链接既不当作文件返回，也不进入
+                        is_dir_link = not is_dir and entry.is_symlink() and entry.is_dir()
+                    except OSError:
+                        continue
+                    if is_dir_link:
+                        continue
+                    if not is_dir:
+                        yield entry
+                    elif not (ig_ls and entry.name in ig_ls):
+                        pending_dirs.append(entry.path)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_search(root_dir, pattern, kind="substring", ig_ls=None, limit=None, max_workers=WALK_WORKERS):
+    match = compile_matcher(pattern, kind)
+    count = 0
+    for entry in walk_entries(root_dir, ig_ls, max_workers):
+        if match(entry.name):
+            yield entry.path
+            count += 1
+            if limit and count >= limit:
+                return
+
+
+def search_files(root_dir, keyword, kind="substring", ig_ls=None, limit=None):
     count = 0
     print(f"正在搜索 {root_dir} 下的文件包含关键字 {keyword}")
     file_count = 0
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            file_count += 1
-            if keyword.lower() in file.lower():
-                print(os.path.join(root, file))
-                count += 1
+    match = compile_matcher(keyword, kind)
+    for entry in walk_entries(root_dir, ig_ls):
+        file_count += 1
+        if match(entry.name):
+            print(entry.path)
+            count += 1
+            if limit and count >= limit:
+                print(f"已达到结果数量上限{limit}，停止搜索")
+                break
     print(f"共查询到{file_count}个文件，其中包含关键字 {keyword} 的文件有 {count} 个")
 
 
+def count_lines(data, start, end):
+    # mmap没有count方法，分段复制后统计换行符
+    if isinstance(data, bytes):
+        return data.count(b"\n", start, end)
+    return sum(data[i:min(i + SEARCH_CHUNK_SIZE, end)].count(b"\n") for i in range(start, end, SEARCH_CHUNK_SIZE))
+
+
+def iter_positions(data, needle, ignore_case):
+    # 分块查找，不区分大小写时先将整块转换为小写，bytes.find比忽略大小写的正则表达式快一个数量级
+    for offset in range(0, len(data), SEARCH_CHUNK_SIZE):
+        window = data[offset:offset + SEARCH_CHUNK_SIZE + len(needle) - 1]
+        if ignore_case:
+            window = window.lower()
+        pos = window.find(needle)
+        while 0 <= pos < SEARCH_CHUNK_SIZE:
+            yield offset + pos
+            pos = window.find(needle, pos + 1)
+
+
+def search_file_content(path, needle, ignore_case=True):
+    # 返回 (匹配的行, 读取的字节数)，二进制文件返回None
+    with open(path, "rb") as f:
+        head = f.read(BINARY_CHECK_SIZE)
+        if b"\0" in head:
+            return None
+        size = os.fstat(f.fileno()).st_size
+        if size <= len(head):
+            data = head
+        elif size >= CONTENT_MMAP_THRESHOLD:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = head + f.read()
+    matches = []
+    try:
+        line_no = 1
+        counted = 0
+        next_line = 0
+        for start in iter_positions(data, needle, ignore_case):
+            if start < next_line:
+                continue  # 每行只报告一次
+            line_no += count_lines(data, counted, start)
+            counted = start
+            line_start = data.rfind(b"\n", 0, start) + 1
+            line_end = data.find(b"\n", start)
+            if line_end < 0:
+                line_end = len(data)
+            line = data[line_start:min(line_end, line_start + MAX_LINE_LENGTH * 4)]
+            matches.append((line_no, line.decode("utf-8", "replace").rstrip("\r")[:MAX_LINE_LENGTH]))
+            next_line = line_end + 1
+        return matches, len(data)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def iter_content_search(root_dir, keyword, ig_ls=None, ignore_case=True, limit=None, max_workers=None, stats=None):
+    # 多个线程并行读取文件，按完成顺序返回 (文件路径, 行号, 行内容)
+    if not keyword:
+        raise ValueError("搜索的内容不能为空")  # 空字符串在每个位置都能匹配
+    needle = keyword.encode("utf-8")
+    if ignore_case:
+        needle = needle.lower()
+    max_workers = max_workers or os.cpu_count() * 2
+    stats = stats if stats is not None else {}
+    for key in ("files", "binary", "errors", "bytes"):
+        stats.setdefault(key, 0)
+    entries = walk_entries(root_dir, ig_ls)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {}
+    count = 0
+    try:
+        while True:
+            while len(pending) < max_workers * 4:
+                entry = next(entries, None)
+                if entry is None:
+                    break
+                try:
+                    if not entry.is_file():
+                        continue  # 跳过管道、设备等特殊文件
+                except OSError:
+                    continue
+                pending[executor.submit(search_file_content, entry.path, needle, ignore_case)] = entry.path
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                stats["files"] += 1
+                try:
+                    result = future.result()
+                except (OSError, ValueError) as e:  # 文件在读取过程中被截断为空等情况下mmap抛出ValueError
+                    stats["errors"] += 1
+                    print(f"读取文件失败：{path} - {str(e)}")
+                    continue
+                if result is None:
+                    stats["binary"] += 1
+                    continue
+                matches, size = result
+                stats["bytes"] += size
+                for line_no, line in matches:
+                    yield path, line_no, line
+                    count += 1
+                    if limit and count >= limit:
+                        return
+    finally:
+        entries.close()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def search_content(root_dir, keyword, ig_ls=None, ignore_case=True, limit=None):
+    print(f"正在搜索 {root_dir} 下内容包含 {keyword} 的文件")
+    start = time.time()
+    stats = {}
+    count = 0
+    for path, line_no, line in iter_content_search(root_dir, keyword, ig_ls, ignore_case, limit, stats=stats):
+        print(f"{path}:{line_no}: {line}")
+        count += 1
+    elapsed = time.time() - start
+    print(f"共检查{stats['files']}个文件（跳过{stats['binary']}个二进制文件，{stats['errors']}个读取失败），"
+          f"找到{count}处匹配，读取{stats['bytes'] / 1024 / 1024:.1f} MB，"
+          f"耗时{elapsed:.2f} s（{stats['bytes'] / 1024 / 1024 / max(elapsed, 1e-6):.1f} MB/s）")
+
+
+def iter_metadata_search(root_dir, metadata_filter, pattern="", kind="substring", ig_ls=None, need_stat=False):
+    # 返回 (DirEntry, stat)，不需要stat时stat为None
+    match = compile_matcher(pattern, kind) if pattern else None
+    for entry in walk_entries(root_dir, ig_ls):
+        if match and not match(entry.name) or not metadata_filter.match_name(entry.name):
+            continue
+        stat = None
+        if metadata_filter.needs_stat or need_stat:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if not metadata_filter.match_stat(stat):
+                continue
+        yield entry, stat
+
+
+def search_metadata(root_dir, metadata_filter, pattern="", kind="substring", ig_ls=None, sort_by=None, limit=None):
+    print(f"正在按条件搜索 {root_dir} 下的文件")
+    start = time.time()
+    sort_key = SORT_KEYS.get(sort_by)
+    results = iter_metadata_search(root_dir, metadata_filter, pattern, kind, ig_ls, need_stat=bool(sort_key))
+    if sort_key and limit:
+        # 堆中只保留前limit个结果，不需要对所有结果排序
+        results = heapq.nlargest(limit, results, key=sort_key)
+    elif sort_key:
+        results = sorted(results, key=sort_key, reverse=True)
+    elif limit:
+        results = islice(results, limit)
+    count = 0
+    for entry, stat in results:
+        if stat is None:
+            print(entry.path)
+        else:
+            print(f"{entry.path}\t{stat.st_size}\t{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stat.st_mtime))}")
+        count += 1
+    print(f"找到{count}个符合条件的文件，耗时{time.time() - start:.2f} s")
+
+
+def parse_size(text):
+    size = text.strip().upper().removesuffix("B")
+    unit = size[-1] if size and size[-1] in SIZE_UNITS else ""
+    try:
+        return int(float(size[:len(size) - len(unit)]) * SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"文件大小格式不正确：{text}") from None
+
+
+def prompt_filter():
+    size_input = input("请输入文件大小范围（如 1G- 表示不小于1G，-10M、100K-2M，直接回车不限制）：").strip()
+    days_input = input("请输入修改时间范围（距今天数，如 7 表示7天内，30- 表示30天以前，7-30，直接回车不限制）：").strip()
+    ext_input = input("请输入扩展名（多个用逗号分隔，如 .log,.tmp，直接回车不限制）：").strip()
+    is_empty = input("是否只查找空文件(默认为否，输入Y时只查找空文件)：").strip() == "Y"
+    sort_by = {"1": "size", "2": "mtime"}.get(
+        input("请选择结果排序方式（1 按大小从大到小，2 按修改时间从新到旧，直接回车不排序）：").strip())
+    min_size = max_size = min_mtime = max_mtime = None
+    if size_input:
+        low, _, high = size_input.partition("-")
+        min_size = parse_size(low) if low.strip() else None
+        max_size = parse_size(high) if high.strip() else None
+    if days_input:
+        low, separator, high = days_input.partition("-")
+        if not separator:
+            low, high = "0", low
+        now = time.time()
+        max_mtime = now - float(low) * 86400 if low.strip() else None
+        min_mtime = now - float(high) * 86400 if high.strip() else None
+    extensions = [e.strip() for e in ext_input.split(',') if e.strip()]
+    return MetadataFilter(min_size, max_size, min_mtime, max_mtime, extensions, is_empty), sort_by
+
+
+def find_by_hash(root_dir, digest, size=None, ig_ls=None, max_workers=None, stats=None):
+    # 未修改的文件直接用目录摘要回答，其余文件只有大小与摘要或sha256记录中的大小相同时才计算sha256；返回 (文件路径, 来源)
+    # sha256记录只按文件名区分，不同文件夹中同名同大小的文件无法区分，因此只用来缩小需要计算的范围
+    digest = digest.strip().lower()
+    if not re.fullmatch("[0-9a-f]{64}", digest):
+        raise ValueError(f"sha256格式不正确：{digest}")
+    catalog = TreeDigest.load(root_dir)
+    catalog_files = catalog.files if catalog else {}
+    sizes = {size} if size is not None else set()
+    sizes.update(file_size for file_size, _, sha256 in catalog_files.values() if sha256 == digest)
+    sizes.update(file_size for entries in load_records(Path(root_dir) / "sha256").values()
+                 for sha256, file_size in entries if sha256 == digest)
+    if not sizes:
+        print("没有找到该sha256的记录，也没有指定文件大小，需要计算所有文件的sha256")
+    stats = stats if stats is not None else {}
+    for key in ("files", "candidates", "hashed"):
+        stats.setdefault(key, 0)
+    max_workers = max_workers or os.cpu_count() * 2
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {}
+
+    def finished(return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            path = pending.pop(future)
+            try:
+                sha256 = future.result()
+            except OSError as e:
+                print(f"计算sha256失败：{path} - {str(e)}")
+                continue
+            stats["hashed"] += 1
+            if sha256 == digest:
+                yield path, "sha256"
+
+    try:
+        for entry in walk_entries(root_dir, list(ig_ls or ()) + ["sha256"]):
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            stats["files"] += 1
+            if sizes and stat.st_size not in sizes:
+                continue
+            stats["candidates"] += 1
+            known = catalog_files.get(os.path.relpath(entry.path, root_dir).replace(os.sep, "/"))
+            if known and known[:2] == (stat.st_size, stat.st_mtime_ns):
+                if known[2] == digest:
+                    yield entry.path, "catalog"
+                continue  # 文件未修改，目录摘要中的sha256仍然有效
+            pending[executor.submit(calculate_sha256, entry.path)] = entry.path
+            if len(pending) >= max_workers * 4:
+                yield from finished(FIRST_COMPLETED)
+        while pending:
+            yield from finished(ALL_COMPLETED)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def search_hash(root_dir, digest, size=None, ig_ls=None):
+    print(f"正在搜索 {root_dir} 下sha256为 {digest} 的文件")
+    start = time.time()
+    stats = {}
+    sources = {"catalog": "文件夹摘要", "sha256": "计算sha256"}
+    count = 0
+    for path, source in find_by_hash(root_dir, digest, size, ig_ls, stats=stats):
+        print(f"{path}（{sources[source]}）")
+        count += 1
+    print(f"共检查{stats['files']}个文件，其中{stats['candidates']}个大小相符，计算了{stats['hashed']}个文件的sha256，"
+          f"找到{count}个文件，耗时{time.time() - start:.2f} s")
+
+
+def search_index(root_dir, keyword, mode="substring", refresh=True, index_file=None, ig_ls=None, limit=None):
+    print(f"正在通过索引搜索 {root_dir} 下的文件，关键字 {keyword}")
+    with FileIndex(root_dir, index_file, ig_ls) as index:
+        if refresh or index.is_empty():
+            index.refresh()
+        start = time.time()
+        count = 0
+        for path in index.search(keyword, mode, limit):
+            print(path)
+            count += 1
+        print(f"索引中共{index.count_files()}个文件，其中匹配关键字 {keyword} 的文件有 {count} 个，"
+              f"查询耗时{(time.time() - start) * 1000:.1f} ms")
+
+
 def main():
     root_directory = input("请输入要搜索的根目录（默认为当前目录，请直接回车）：")
     if not root_directory:
         root_directory = '.'
-    search_keyword = input("请输入要搜索的关键字：")
-    search_files(root_directory, search_keyword)
+    search_keyword = input("请输入要搜索的关键字（按sha256搜索时输入sha256）：")
+    mode = MATCH_MODES.get(input("请选择匹配方式（1 包含关键字，2 以关键字开头，3 文件名相同，4 通配符，"
+                                 "5 正则表达式，6 模糊匹配，7 文件内容，8 sha256，默认为1）：").strip(), "substring")
+    ignore_input = input("请输入要忽略的文件夹（多个用逗号分隔，直接回车不忽略）：").strip()
+    ignore_list = [f.strip() for f in ignore_input.split(',') if f.strip()]
+    limit_input = input("请输入最多显示的结果数量（直接回车显示全部）：").strip()
+    limit = int(limit_input) if limit_input else None
+    if mode == "hash":
+        size_input = input("请输入文件大小（字节，直接回车使用sha256记录和文件夹摘要中的大小）：").strip()
+        search_hash(root_directory, search_keyword, int(size_input) if size_input else None, ignore_list)
+        return
+    if mode == "content":
+        is_ignore_case = input("是否区分大小写(默认为不区分，输入Y时区分)：").strip() != "Y"
+        search_content(root_directory, search_keyword, ignore_list, is_ignore_case, limit)
+        return
+    if input("是否按大小、修改时间或扩展名筛选(默认为否，输入Y时设置筛选条件)：").strip() == "Y":
+        metadata_filter, sort_by = prompt_filter()
+        search_metadata(root_directory, metadata_filter, search_keyword, mode, ignore_list, sort_by, limit)
+        return
+    is_use_index = mode in INDEX_MODES and input(
+        "是否使用文件名索引(默认使用，输入N时直接遍历文件夹)：").strip() != "N"
+    if not is_use_index:
+        search_files(root_directory, search_keyword, mode, ignore_list, limit)
+        return
+    is_refresh = input("是否在查询前根据文件夹修改时间更新索引(默认更新，输入N时直接查询)：").strip() != "N"
+    search_index(root_directory, search_keyword, mode, is_refresh, ig_ls=ignore_list, limit=limit)
 
 
 if __name__ == "__main__":
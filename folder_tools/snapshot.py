@@ -0,0 +1,217 @@
+import glob
+import gzip
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from comparator import PROGRESS_INTERVAL, HtmlFileTreePrinter, calculate_sha256
+
+SNAPSHOT_DIR = os.path.join("sha256", "snapshots")
+SNAPSHOT_SUFFIX = ".snapshot.gz"
+SNAPSHOT_HEADER = "#folder_tools-snapshot-v1"
+
+
+def iter_sorted_files(base_path, ig_ls=None):
+    # 深度优先遍历，文件夹按“名称/”参与排序，输出顺序与完整相对路径的字符串顺序一致，两个快照可以直接归并
+    stack = [("", True, None)]
+    while stack:
+        relative, is_dir, stat = stack.pop()
+        if not is_dir:
+            yield relative, stat.st_size, stat.st_mtime_ns
+            continue
+        items = []
+        try:
+            with os.scandir(os.path.join(base_path, relative)) as entries:
+                for entry in entries:
+                    rel_path = f"{relative}/{entry.name}" if relative else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name != "sha256" and not (ig_ls and entry.name in ig_ls):
+                                items.append((entry.name + "/", rel_path, True, None))
+                        elif entry.is_file():
+                            items.append((entry.name, rel_path, False, entry.stat()))
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"读取文件夹失败：{relative} - {str(e)}")
+            continue
+        items.sort(reverse=True)
+        stack.extend(item[1:] for item in items)
+
+
+def iter_snapshot(snapshot_file):
+    # 返回 (相对路径, 大小, 修改时间, sha256)，路径按字符串顺序排列
+    with gzip.open(snapshot_file, "rt", encoding="utf-8", errors="surrogateescape") as f:
+        header = f.readline().rstrip("\n").split("\t")
+        if header[0] != SNAPSHOT_HEADER:
+            raise ValueError(f"不是有效的快照文件：{snapshot_file}")
+        rel_path = ""
+        for line in f:
+            # 每行只保存与上一行路径不同的部分：共同前缀长度、剩余部分
+            shared, suffix, size, mtime, sha256 = line.rstrip("\n").split("\t")
+            rel_path = rel_path[:int(shared)] + suffix
+            yield rel_path, int(size), int(mtime), sha256
+
+
+def read_snapshot_root(snapshot_file):
+    with gzip.open(snapshot_file, "rt", encoding="utf-8", errors="surrogateescape") as f:
+        header = f.readline().rstrip("\n").split("\t")
+    return header[1] if len(header) > 1 and header[0] == SNAPSHOT_HEADER else ""
+
+
+def check_same_root(old_file, new_root):
+    # 不同文件夹的快照之间没有可比性，沿用sha256或对比差异都会得到错误的结果；没有记录根路径的快照不检查
+    old_root = read_snapshot_root(old_file)
+    if old_root and new_root and os.path.normcase(old_root) != os.path.normcase(os.path.abspath(new_root)):
+        raise ValueError(f"快照属于不同的文件夹：{old_file}（{old_root}）与{new_root}")
+
+
+def new_snapshot_file(base_path):
+    # 文件名精确到微秒，同一时刻生成的快照再加序号，避免相互覆盖；按文件名排序即为生成顺序
+    now = time.time_ns()
+    name = time.strftime("%Y%m%d-%H%M%S", time.localtime(now // 10 ** 9)) + f".{now // 1000 % 10 ** 6:06d}"
+    output_file = os.path.join(base_path, SNAPSHOT_DIR, name + SNAPSHOT_SUFFIX)
+    counter = 1
+    while os.path.exists(output_file):
+        output_file = os.path.join(base_path, SNAPSHOT_DIR, f"{name}_{counter:03d}{SNAPSHOT_SUFFIX}")
+        counter += 1
+    return output_file
+
+
+def list_snapshots(base_path):
+    return sorted(glob.glob(os.path.join(glob.escape(base_path), SNAPSHOT_DIR, "*" + SNAPSHOT_SUFFIX)))
+
+
+def write_snapshot(base_path, output_file=None, previous_file=None, ig_ls=None, max_workers=None):
+    # 与上一个快照归并，大小和修改时间都未变的文件沿用原来的sha256，只计算新增或修改过的文件
+    if previous_file is None:
+        # 文件夹自己的快照，即使文件夹被移动过也可以沿用
+        snapshots = list_snapshots(base_path)
+        previous_file = snapshots[-1] if snapshots else None
+    else:
+        check_same_root(previous_file, base_path)
+    output_file = output_file or new_snapshot_file(base_path)
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    previous = iter_snapshot(previous_file) if previous_file else iter(())
+    old = next(previous, None)
+    max_workers = max_workers or os.cpu_count() * 2
+    window = deque()
+    counts = {"files": 0, "hashed": 0, "errors": 0}
+    last_path = ""
+    last_progress = 0.0
+
+    def write_next(f):
+        nonlocal last_path
+        rel_path, size, mtime, sha256 = window.popleft()
+        if not isinstance(sha256, str):
+            try:
+                sha256 = sha256.result()
+            except OSError as e:
+                counts["errors"] += 1
+                print(f"\n计算sha256失败：{rel_path} - {str(e)}")
+                return
+        shared = len(os.path.commonprefix((last_path, rel_path)))
+        f.write(f"{shared}\t{rel_path[shared:]}\t{size}\t{mtime}\t{sha256}\n")
+        last_path = rel_path
+
+    start = time.time()
+    with (ThreadPoolExecutor(max_workers=max_workers) as executor,
+          gzip.open(output_file + ".tmp", "wt", encoding="utf-8", errors="surrogateescape") as f):
+        f.write(f"{SNAPSHOT_HEADER}\t{os.path.abspath(base_path)}\t{int(start)}\n")
+        for rel_path, size, mtime in iter_sorted_files(base_path, ig_ls):
+            while old is not None and old[0] < rel_path:
+                old = next(previous, None)
+            if old is not None and old[:3] == (rel_path, size, mtime):
+                sha256 = old[3]
+            else:
+                # 按顺序提交，写入时按提交顺序取结果，快照中的路径保持有序
+                sha256 = executor.submit(calculate_sha256, os.path.join(base_path, rel_path))
+                counts["hashed"] += 1
+            window.append((rel_path, size, mtime, sha256))
+            counts["files"] += 1
+            while len(window) > max_workers * 4:
+                write_next(f)
+            if time.time() - last_progress >= PROGRESS_INTERVAL:
+                last_progress = time.time()
+                sys.stdout.write(f"\r正在生成快照，已处理{counts['files']}个文件，计算了{counts['hashed']}个文件的sha256")
+                sys.stdout.flush()
+        while window:
+            write_next(f)
+    os.replace(output_file + ".tmp", output_file)
+    print(f"\n快照已保存：{output_file}，共{counts['files'] - counts['errors']}个文件，"
+          f"计算了{counts['hashed']}个文件的sha256（其余沿用{previous_file or '无'}），耗时{time.time() - start:.2f} s")
+    return output_file
+
+
+def diff_snapshots(old_file, new_file, check_root=True):
+    # 两个快照都按路径排序，一次归并即可得到差异，不需要读取任何文件内容
+    if check_root:
+        check_same_root(old_file, read_snapshot_root(new_file))
+    diff = {"added": [], "removed": [], "modified": [], "moved": []}
+    old_entries = iter_snapshot(old_file)
+    new_entries = iter_snapshot(new_file)
+    old = next(old_entries, None)
+    new = next(new_entries, None)
+    while old is not None or new is not None:
+        if new is None or old is not None and old[0] < new[0]:
+            diff["removed"].append(old)
+            old = next(old_entries, None)
+        elif old is None or new[0] < old[0]:
+            diff["added"].append(new)
+            new = next(new_entries, None)
+        else:
+            if old[1] != new[1] or old[3] != new[3]:
+                diff["modified"].append(new[0])
+            old = next(old_entries, None)
+            new = next(new_entries, None)
+    # 删除和新增的文件中大小和sha256相同的视为移动/重命名，空文件不参与匹配
+    removed_by_content = {}
+    for rel_path, size, _, sha256 in diff["removed"]:
+        if size:
+            removed_by_content.setdefault((size, sha256), []).append(rel_path)
+    added = []
+    moved_from = set()
+    for rel_path, size, _, sha256 in diff["added"]:
+        candidates = removed_by_content.get((size, sha256))
+        if candidates:
+            old_path = candidates.pop()
+            moved_from.add(old_path)
+            diff["moved"].append((old_path, rel_path))
+        else:
+            added.append(rel_path)
+    diff["added"] = added
+    diff["removed"] = [entry[0] for entry in diff["removed"] if entry[0] not in moved_from]
+    return diff
+
+
+def print_snapshot_diff(old_file, new_file, diff):
+    root = read_snapshot_root(new_file)
+    print(f"{old_file} -> {new_file}：新增{len(diff['added'])}个文件，删除{len(diff['removed'])}个文件，"
+          f"修改{len(diff['modified'])}个文件，移动/重命名{len(diff['moved'])}个文件")
+    for old_path, new_path in diff["moved"]:
+        print(f"{old_path} -> {new_path}")
+    for key, title in (("added", "新增的文件"), ("removed", "删除的文件"), ("modified", "修改的文件")):
+        if diff[key]:
+            HtmlFileTreePrinter.print(diff[key], [root] if root else [], f"快照对比中{title}")
+    if diff["moved"]:
+        HtmlFileTreePrinter.print([new_path for _, new_path in diff["moved"]], [root] if root else [],
+                                  "快照对比中移动/重命名的文件")
+
+
+if __name__ == "__main__":
+    old_input = input("请输入旧快照文件路径（输入文件夹时比较该文件夹最近的两个快照）：").strip()
+    if os.path.isdir(old_input):
+        snapshot_files = list_snapshots(old_input)
+        if len(snapshot_files) < 2:
+            raise Exception(f"{old_input}中的快照少于两个，无法比较")
+        old_snapshot, new_snapshot = snapshot_files[-2:]
+    else:
+        old_snapshot = old_input
+        new_snapshot = input("请输入新快照文件路径：").strip()
+    start_time = time.time()
+    # 同一文件夹中的快照即使根路径不同（文件夹被移动过）也可以对比
+    snapshot_diff = diff_snapshots(old_snapshot, new_snapshot, check_root=not os.path.isdir(old_input))
+    print(f"快照对比完成，耗时{time.time() - start_time:.2f} s")
+    print_snapshot_diff(old_snapshot, new_snapshot, snapshot_diff)
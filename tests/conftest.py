@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "folder_tools"))
+
+import autotune  # noqa: E402
+import delta_report  # noqa: E402
+import file_index  # noqa: E402
+from comparator import HtmlFileTreePrinter  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    # 报告不打开浏览器，缓存和调优结果写入临时文件夹，不影响用户目录
+    monkeypatch.setattr(HtmlFileTreePrinter, "open_in_browser", staticmethod(lambda file_path: None))
+    monkeypatch.setattr(autotune, "AUTOTUNE_FILE", str(tmp_path / "state" / "autotune.json"))
+    monkeypatch.setattr(delta_report, "CHUNK_CACHE_DIR", str(tmp_path / "state" / "chunks"))
+    monkeypatch.setattr(file_index, "INDEX_DIR", str(tmp_path / "state" / "index"))
+
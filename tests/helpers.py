@@ -0,0 +1,9 @@
+import os
+
+
+def write_files(base_path, files):
+    for rel_path, content in files.items():
+        path = os.path.join(base_path, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content if isinstance(content, bytes) else content.encode("utf-8"))
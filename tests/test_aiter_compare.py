@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+from comparator import ContentMismatchEvent, FolderComparator, MissingFileEvent
+
+from tests.helpers import write_files
+
+
+def producer_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "aiter_compare"]
+
+
+def wait_for_producers(timeout=5):
+    deadline = time.monotonic() + timeout
+    while producer_threads() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return producer_threads()
+
+
+def test_async_compare_yields_all_events(tmp_path):
+    write_files(tmp_path / "a", {"same.txt": "1", "changed.txt": "2", "only_a.txt": "3"})
+    write_files(tmp_path / "b", {"same.txt": "1", "changed.txt": "x"})
+
+    async def collect():
+        return [event async for event in FolderComparator.aiter_compare(str(tmp_path / "a"), str(tmp_path / "b"))]
+
+    events = asyncio.run(collect())
+    assert [event.rel_path for event in events if isinstance(event, MissingFileEvent)] == ["only_a.txt"]
+    assert [event.rel_path for event in events if isinstance(event, ContentMismatchEvent)] == ["changed.txt"]
+    assert wait_for_producers() == []
+
+
+def test_closing_async_compare_stops_worker_thread(tmp_path):
+    # 文件数超过队列容量，调用方退出时工作线程正阻塞在put上
+    write_files(tmp_path / "a", {f"f{i}.txt": "" for i in range(3000)})
+    (tmp_path / "b").mkdir()
+
+    async def consume_one():
+        events = FolderComparator.aiter_compare(str(tmp_path / "a"), str(tmp_path / "b"), compare_sha256=False)
+        async for _ in events:
+            break
+        await asyncio.sleep(0.2)
+        await events.aclose()
+
+    asyncio.run(consume_one())
+    assert wait_for_producers() == []
+
+
+def test_cancelled_consumer_stops_worker_thread(tmp_path):
+    write_files(tmp_path / "a", {f"f{i}.txt": "" for i in range(3000)})
+    (tmp_path / "b").mkdir()
+    started = []
+
+    async def consume_slowly():
+        async for _ in FolderComparator.aiter_compare(str(tmp_path / "a"), str(tmp_path / "b"), compare_sha256=False):
+            started.append(True)
+            await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.create_task(consume_slowly())
+        while not started:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
+    assert wait_for_producers() == []
+
@@ -0,0 +1,56 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from archive_tree import ArchiveTree
+from comparator import FolderComparator
+
+from tests.helpers import write_files
+
+FILES = {"same.txt": "same", "sub/changed.txt": "new", "sub/only_folder.txt": "x"}
+
+
+def make_zip(path, files, prefix=""):
+    with zipfile.ZipFile(path, "w") as zf:
+        for rel_path, content in files.items():
+            zf.writestr(prefix + rel_path, content)
+
+
+def make_tar(path, source, arcname):
+    with tarfile.open(path, "w:gz") as tf:
+        tf.add(source, arcname=arcname)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    write_files(tmp_path / "folder", FILES)
+    return tmp_path / "folder"
+
+
+def expected_diff(diff_info):
+    return (sorted(diff_info["1_not_in_2_file"]), sorted(diff_info["2_not_in_1_file"]), diff_info["sha256_not_match"])
+
+
+def test_zip_compared_as_folder(tmp_path, folder):
+    archive = tmp_path / "backup.zip"
+    make_zip(archive, {"same.txt": "same", "sub/changed.txt": "old", "only_zip.txt": "z"})
+    diff_info = FolderComparator.compare_folders(str(folder), str(archive), True)
+    assert expected_diff(diff_info) == ([os.path.join("sub", "only_folder.txt")], ["only_zip.txt"],
+                                        [os.path.join("sub", "changed.txt")])
+
+
+def test_tar_with_top_level_folder_is_unwrapped(tmp_path, folder):
+    archive = tmp_path / "folder.tar.gz"
+    make_tar(archive, folder, "folder")
+    tree = ArchiveTree(str(archive))
+    assert sorted(tree.files) == sorted(os.path.join(*p.split("/")) for p in FILES)
+    diff_info = FolderComparator.compare_folders(str(folder), str(archive), True)
+    assert expected_diff(diff_info) == ([], [], [])
+
+
+def test_archive_members_outside_root_are_ignored(tmp_path):
+    archive = tmp_path / "evil.zip"
+    make_zip(archive, {"../escape.txt": "x", "ok.txt": "y"})
+    assert list(ArchiveTree(str(archive)).files) == ["ok.txt"]
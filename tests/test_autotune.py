@@ -0,0 +1,54 @@
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import autotune
+from autotune import ConcurrencyTuner, DeviceTuner
+from comparator import ErrorEvent, FolderComparator
+
+from tests.helpers import write_files
+
+
+def test_cancelled_tasks_are_not_measured(tmp_path):
+    write_files(tmp_path, {"a.bin": b"\0" * 1000})
+    tuner = DeviceTuner(str(tmp_path), 4)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = Future()
+        future.cancel()
+        tuner.active = 1
+        tuner.run(executor, future, str(tmp_path / "a.bin"), len, (b"",))
+        assert (tuner.active, tuner.window_tasks, tuner.window_work) == (0, 0, 0)
+        future = Future()
+        tuner.active = 1
+        tuner.run(executor, future, str(tmp_path / "a.bin"), len, (b"abc",))
+    assert future.result() == 3
+    assert tuner.window_tasks == 1
+    assert tuner.window_work == 1000 + autotune.FILE_WEIGHT
+
+
+def test_tuned_limits_saved_to_configured_file(tmp_path):
+    with ConcurrencyTuner([str(tmp_path)]) as tuner:
+        (device,) = tuner.devices.values()
+        device.best_rate, device.best_limit = 1.0, 7
+    with open(autotune.AUTOTUNE_FILE, encoding="utf-8") as f:
+        assert list(json.load(f).values()) == [7]
+
+
+def test_cancelled_hash_reported_as_error(tmp_path, monkeypatch):
+    write_files(tmp_path / "a", {"x.txt": "x", "y.txt": "y"})
+    write_files(tmp_path / "b", {"x.txt": "x", "y.txt": "y"})
+    submit = ConcurrencyTuner.submit
+
+    def cancelling_submit(self, base_path, file_path, fn, *args):
+        if file_path.endswith("y.txt"):
+            future = Future()
+            DeviceTuner.cancel_future(future)
+            return future
+        return submit(self, base_path, file_path, fn, *args)
+
+    monkeypatch.setattr(ConcurrencyTuner, "submit", cancelling_submit)
+    events = list(FolderComparator.iter_sha256_differences(["x.txt", "y.txt"], str(tmp_path / "a"),
+                                                            str(tmp_path / "b")))
+    errors = [event for event in events if isinstance(event, ErrorEvent)]
+    assert [event.rel_path for event in errors] == ["y.txt"]
+    assert not os.path.exists(tmp_path / "autotune.json")
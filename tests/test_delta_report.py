@@ -0,0 +1,58 @@
+import os
+import random
+
+import pytest
+
+import delta_report
+from delta_report import analyze_delta, analyze_mismatched_files, load_chunks
+
+
+@pytest.fixture
+def pair(tmp_path):
+    data = random.Random(1).randbytes(4 * 1024 * 1024)
+    inserted = data[:1000000] + b"inserted bytes" * 100 + data[1000000:]
+    (tmp_path / "source.bin").write_bytes(inserted)
+    (tmp_path / "target.bin").write_bytes(data)
+    return str(tmp_path / "source.bin"), str(tmp_path / "target.bin")
+
+
+def test_insertion_only_resends_nearby_chunks(pair):
+    source, target = pair
+    report = analyze_delta(source, target)
+    assert report["source_size"] == os.path.getsize(source)
+    assert report["target_size"] == os.path.getsize(target)
+    assert 0 < report["transfer"] < delta_report.MAX_CHUNK_SIZE * 3
+    matched = sum(length for _, _, length in report["matching"])
+    differing = sum(length for _, length in report["differing"])
+    assert matched + differing == report["source_size"]
+    (offset, length), = report["differing"]
+    assert offset <= 1000000 < offset + length
+
+
+def test_identical_files_need_no_transfer(pair):
+    source, _ = pair
+    report = analyze_delta(source, source)
+    assert report["transfer"] == 0
+    assert report["matching"] == [[0, 0, report["source_size"]]]
+
+
+def test_chunk_index_cached_until_file_changes(pair, monkeypatch):
+    source, _ = pair
+    chunks = load_chunks(source)
+    assert sum(length for length, _ in chunks) == os.path.getsize(source)
+    monkeypatch.setattr(delta_report, "iter_chunks", lambda f: pytest.fail("缓存未命中"))
+    assert load_chunks(source) == chunks
+    with open(source, "ab") as f:
+        f.write(b"more")
+    with pytest.raises(pytest.fail.Exception):
+        load_chunks(source)
+
+
+def test_only_large_mismatched_files_are_analyzed(tmp_path, pair):
+    source, target = pair
+    os.makedirs(tmp_path / "b")
+    os.replace(target, tmp_path / "b" / "source.bin")
+    assert analyze_mismatched_files(["source.bin"], str(tmp_path), str(tmp_path / "b")) == {}
+    reports = analyze_mismatched_files(["source.bin"], str(tmp_path), str(tmp_path / "b"), min_size=1)
+    assert list(reports) == ["source.bin"]
+    assert reports["source.bin"]["transfer"] < reports["source.bin"]["source_size"]
@@ -0,0 +1,78 @@
+import os
+import sqlite3
+
+import pytest
+
+import file_index
+from file_index import FileIndex
+
+from tests.helpers import write_files
+
+
+def search(index, keyword, mode="substring"):
+    return sorted(os.path.relpath(path, index.root_dir) for path in index.search(keyword, mode))
+
+
+def test_refresh_tracks_added_and_removed_files(tmp_path):
+    write_files(tmp_path / "root", {"a/report.txt": "1", "b/other.txt": "2"})
+    with FileIndex(str(tmp_path / "root")) as index:
+        index.refresh()
+        assert search(index, "report") == [os.path.join("a", "report.txt")]
+        os.remove(tmp_path / "root" / "a" / "report.txt")
+        write_files(tmp_path / "root", {"b/report2.txt": "3"})
+        index.refresh()
+        assert search(index, "report") == [os.path.join("b", "report2.txt")]
+        assert search(index, "oth", "prefix") == [os.path.join("b", "other.txt")]
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="需要符号链接")
+def test_directory_symlinks_are_not_indexed(tmp_path):
+    write_files(tmp_path / "root", {"real/a.txt": "a"})
+    os.symlink(tmp_path / "root" / "real", tmp_path / "root" / "link", target_is_directory=True)
+    with FileIndex(str(tmp_path / "root")) as index:
+        index.refresh()
+        assert index.count_files() == 1
+
+
+def test_index_rebuilt_when_tokenizer_changes(tmp_path, monkeypatch):
+    write_files(tmp_path / "root", {"a/report.txt": "1"})
+    index_file = str(tmp_path / "index.db")
+    with monkeypatch.context() as m:
+        # 模拟不支持trigram的SQLite建立的索引
+        m.setattr(file_index, "TRIGRAM_SCHEMA", "CREATE VIRTUAL TABLE names USING no_such_module()")
+        with FileIndex(str(tmp_path / "root"), index_file) as index:
+            assert not index.has_trigram
+            index.refresh()
+            assert search(index, "report") == [os.path.join("a", "report.txt")]
+    with FileIndex(str(tmp_path / "root"), index_file) as index:
+        if not index.has_trigram:
+            pytest.skip("当前SQLite不支持trigram")
+        assert index.is_empty()
+        index.refresh()
+        assert search(index, "report") == [os.path.join("a", "report.txt")]
+
+
+def test_index_without_metadata_is_rebuilt(tmp_path):
+    index_file = str(tmp_path / "index.db")
+    conn = sqlite3.connect(index_file)
+    conn.executescript(file_index.SCHEMA)
+    conn.execute("INSERT INTO dirs (path, mtime_ns) VALUES ('', 0)")
+    conn.commit()
+    conn.close()
+    with FileIndex(str(tmp_path), index_file) as index:
+        assert index.is_empty()
+
+
+def test_index_rebuilt_when_ignore_list_changes(tmp_path):
+    write_files(tmp_path / "root", {"a/report.txt": "1", "node_modules/pkg/report.js": "2"})
+    index_file = str(tmp_path / "index.db")
+    with FileIndex(str(tmp_path / "root"), index_file) as index:
+        index.refresh()
+        assert len(search(index, "report")) == 2
+    # 文件夹的mtime没有变化，沿用旧的子文件夹列表时会继续收录被忽略的文件夹
+    with FileIndex(str(tmp_path / "root"), index_file, ["node_modules"]) as index:
+        index.refresh()
+        assert search(index, "report") == [os.path.join("a", "report.txt")]
+    with FileIndex(str(tmp_path / "root"), index_file) as index:
+        index.refresh()
+        assert len(search(index, "report")) == 2
@@ -0,0 +1,77 @@
+import hashlib
+import os
+
+import pytest
+
+from comparator import FolderComparator
+from folder_sync import FolderSynchronizer
+
+from tests.helpers import write_files
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("verify", [True, False])
+def test_sync_copies_missing_and_changed_files(tmp_path, verify):
+    write_files(tmp_path / "a", {"same.txt": "same", "changed.txt": "new content", "sub/missing.bin": b"\0" * 3000000})
+    write_files(tmp_path / "b", {"same.txt": "same", "changed.txt": "old"})
+    diff_info = FolderComparator.compare_folders(str(tmp_path / "a"), str(tmp_path / "b"), True)
+    results = FolderSynchronizer.sync_folders(str(tmp_path / "a"), str(tmp_path / "b"), diff_info, verify=verify)
+    assert sorted(results) == sorted(["changed.txt", os.path.join("sub", "missing.bin")])
+    for rel_path, digest in results.items():
+        content = read(tmp_path / "a" / rel_path)
+        assert read(tmp_path / "b" / rel_path) == content
+        assert digest == (hashlib.sha256(content).hexdigest() if verify else None)
+
+
+def test_copy_rejects_source_changed_since_compare(tmp_path):
+    write_files(tmp_path / "a", {"changed.txt": "new content"})
+    write_files(tmp_path / "b", {"changed.txt": "old"})
+    diff_info = FolderComparator.compare_folders(str(tmp_path / "a"), str(tmp_path / "b"), True)
+    write_files(tmp_path / "a", {"changed.txt": "modified after compare"})
+    results = FolderSynchronizer.sync_folders(str(tmp_path / "a"), str(tmp_path / "b"), diff_info)
+    assert results == {}
+    assert read(tmp_path / "b" / "changed.txt") == b"old"
+    assert [name for name in os.listdir(tmp_path / "b") if name.endswith(".tmp")] == []
+
+
+@pytest.mark.parametrize("copy", [FolderSynchronizer.copy_with_copy_file_range, FolderSynchronizer.copy_with_sendfile])
+def test_zero_copy_stops_at_size_snapshot(tmp_path, copy):
+    content = os.urandom(FolderSynchronizer.BUFFER_SIZE * 2 + 123)
+    write_files(tmp_path, {"src.bin": content})
+    with open(tmp_path / "src.bin", "rb") as fsrc, open(tmp_path / "dst.bin", "wb") as fdst:
+        # 模拟复制期间文件变大：只应复制开始时记录的大小
+        if not copy(fsrc.fileno(), fdst.fileno(), len(content) - 1000):
+            pytest.skip("当前平台不支持该零拷贝方式")
+    assert read(tmp_path / "dst.bin") == content[:-1000]
+
+
+def test_verified_copy_uses_zero_copy(tmp_path, monkeypatch):
+    content = os.urandom(FolderSynchronizer.BUFFER_SIZE + 7)
+    write_files(tmp_path, {"src.bin": content})
+    with open(tmp_path / "src.bin", "rb") as fsrc, open(tmp_path / "probe.bin", "wb") as fdst:
+        if not FolderSynchronizer.zero_copy(fsrc, fdst):
+            pytest.skip("当前平台不支持零拷贝")
+
+    def stream_copy(fsrc, fdst):
+        raise AssertionError("校验时也应使用零拷贝")
+
+    monkeypatch.setattr(FolderSynchronizer, "stream_copy", stream_copy)
+    digest = FolderSynchronizer.copy_file(str(tmp_path / "src.bin"), str(tmp_path / "dst.bin"),
+                                          expected=hashlib.sha256(content).hexdigest())
+    assert digest == hashlib.sha256(content).hexdigest()
+    assert read(tmp_path / "dst.bin") == content
+
+
+def test_short_zero_copy_falls_back_to_stream_copy(tmp_path, monkeypatch):
+    content = os.urandom(FolderSynchronizer.BUFFER_SIZE * 2)
+    write_files(tmp_path, {"src.bin": content})
+    # 模拟源文件在复制过程中变短：零拷贝提前读到文件末尾
+    monkeypatch.setattr(os, "copy_file_range", lambda in_fd, out_fd, count: 0, raising=False)
+    monkeypatch.setattr(os, "sendfile", lambda out_fd, in_fd, offset, count: 0, raising=False)
+    digest = FolderSynchronizer.copy_file(str(tmp_path / "src.bin"), str(tmp_path / "dst.bin"))
+    assert digest == hashlib.sha256(content).hexdigest()
+    assert read(tmp_path / "dst.bin") == content
@@ -0,0 +1,116 @@
+import hashlib
+import os
+
+import pytest
+
+import folder_watcher
+from folder_watcher import RESCAN, FolderWatcher, InotifyWatcher
+
+from tests.helpers import write_files
+
+
+def record_names(base_path):
+    return sorted(os.listdir(os.path.join(base_path, "sha256")))
+
+
+def sha256(content):
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def test_changes_update_diff_and_records(tmp_path):
+    write_files(tmp_path / "a", {"x.txt": "one", "sub/y.txt": "two"})
+    write_files(tmp_path / "b", {"x.txt": "one"})
+    watcher = FolderWatcher([str(tmp_path / "a"), str(tmp_path / "b")])
+    watcher.rescan(0)
+    watcher.rescan(1)
+    assert watcher.diff()["1_not_in_2_file"] == [os.path.join("sub", "y.txt")]
+    assert record_names(tmp_path / "a") == sorted([f"x.txt.{sha256('one')}.3.sha256",
+                                                   f"y.txt.{sha256('two')}.3.sha256"])
+
+    write_files(tmp_path / "b", {"x.txt": "changed"})
+    os.remove(tmp_path / "a" / "sub" / "y.txt")
+    watcher.apply_changes([(1, "x.txt"), (0, "sub")])
+    diff = watcher.diff()
+    assert diff["1_not_in_2_file"] == []
+    assert diff["sha256_not_match"] == ["x.txt"]
+    assert record_names(tmp_path / "a") == [f"x.txt.{sha256('one')}.3.sha256"]
+    assert record_names(tmp_path / "b") == [f"x.txt.{sha256('changed')}.7.sha256"]
+
+
+def test_shared_record_kept_until_last_file_changes(tmp_path):
+    write_files(tmp_path / "a", {"p/same.txt": "data", "q/same.txt": "data"})
+    watcher = FolderWatcher([str(tmp_path / "a")])
+    watcher.rescan(0)
+    os.remove(tmp_path / "a" / "p" / "same.txt")
+    watcher.apply_changes([(0, os.path.join("p", "same.txt"))])
+    assert record_names(tmp_path / "a") == [f"same.txt.{sha256('data')}.4.sha256"]
+    os.remove(tmp_path / "a" / "q" / "same.txt")
+    watcher.apply_changes([(0, os.path.join("q", "same.txt"))])
+    assert record_names(tmp_path / "a") == []
+
+
+def test_read_error_requests_rescan_instead_of_stopping(tmp_path):
+    class FailingWatcher:
+        calls = 0
+
+        def read_changes(self, timeout):
+            self.calls += 1
+            if self.calls == 1:
+                raise OSError(28, "No space left on device")
+            watcher.stop()
+            return ["x.txt"]
+
+    write_files(tmp_path / "a", {"x.txt": "one"})
+    watcher = FolderWatcher([str(tmp_path / "a")], poll_interval=0, persist_records=False)
+    watcher.pump_events(0, FailingWatcher())
+    assert [watcher.events.get_nowait(), watcher.events.get_nowait()] == [(0, RESCAN), (0, "x.txt")]
+    assert not os.path.exists(tmp_path / "a" / "sha256")
+
+
+def test_unreadable_and_vanished_files_do_not_stop_watching(tmp_path, monkeypatch, capsys):
+    write_files(tmp_path / "a", {"x.txt": "one", "gone.txt": "two", "ok.txt": "three"})
+    write_files(tmp_path / "b", {"x.txt": "one"})
+    watcher = FolderWatcher([str(tmp_path / "a"), str(tmp_path / "b")], persist_records=False)
+
+    def calculate_sha256(file_path):
+        if file_path == str(tmp_path / "a" / "x.txt"):
+            raise PermissionError(13, "Permission denied")
+        if file_path.endswith("gone.txt"):
+            raise FileNotFoundError(2, "No such file or directory")
+        return sha256(open(file_path).read())
+
+    monkeypatch.setattr(folder_watcher, "calculate_sha256", calculate_sha256)
+    watcher.rescan(0)
+    watcher.rescan(1)
+    assert "计算sha256失败" in capsys.readouterr().out
+    records = watcher.get_records(0)
+    assert records["x.txt"][2] is None
+    assert "gone.txt" not in records
+    assert records["ok.txt"][2] == sha256("three")
+    assert watcher.diff()["sha256_not_match"] == ["x.txt"]
+    assert sorted(watcher.build_digest(0).errors) == ["x.txt"]
+
+    # 恢复读取权限后再次收到事件时重新计算
+    monkeypatch.setattr(folder_watcher, "calculate_sha256", lambda file_path: sha256(open(file_path).read()))
+    watcher.apply_changes([(0, "x.txt")])
+    assert watcher.get_records(0)["x.txt"][2] == sha256("one")
+    assert watcher.diff()["sha256_not_match"] == []
+
+
+@pytest.mark.skipif(not InotifyWatcher.is_supported(), reason="需要inotify")
+def test_watch_limit_on_new_folder_falls_back_to_polling(tmp_path, monkeypatch):
+    (tmp_path / "a").mkdir()
+    watcher = InotifyWatcher(str(tmp_path / "a"), poll_interval=0)
+    try:
+        def add_watches(relative):
+            raise OSError(28, "No space left on device")
+
+        monkeypatch.setattr(watcher, "add_watches", add_watches)
+        (tmp_path / "a" / "new").mkdir()
+        assert watcher.read_changes(1.0) == ["new"]
+        write_files(tmp_path / "a" / "new", {"x.txt": "one"})
+        assert watcher.read_changes(0.1) == [os.path.join("new", "x.txt")]
+        os.remove(tmp_path / "a" / "new" / "x.txt")
+        assert watcher.read_changes(0.1) == [os.path.join("new", "x.txt")]
+    finally:
+        watcher.close()
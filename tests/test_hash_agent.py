@@ -0,0 +1,76 @@
+import socket
+import threading
+
+import pytest
+
+import hash_agent
+from comparator import FolderComparator
+from hash_agent import HashAgent, HashAgentClient, HashAgentHandler
+
+from tests.helpers import write_files
+
+
+@pytest.fixture
+def start_agent():
+    agents = []
+
+    def start(base_path, token="secret"):
+        agent = HashAgent(str(base_path), port=0, token=token)
+        threading.Thread(target=agent.serve_forever, daemon=True).start()
+        agents.append(agent)
+        return f"agent://{token}@127.0.0.1:{agent.server_address[1]}"
+
+    yield start
+    for agent in agents:
+        agent.shutdown()
+        agent.server_close()
+
+
+def test_compare_two_agents_resumes_after_reset(tmp_path, start_agent, monkeypatch):
+    files = {f"d{i}/f{j}.txt": f"{i}-{j}" for i in range(5) for j in range(20)}
+    write_files(tmp_path / "a", files | {"changed.txt": "new", "only1.txt": "1"})
+    write_files(tmp_path / "b", files | {"changed.txt": "old"})
+    monkeypatch.setattr(hash_agent, "BATCH_SIZE", 256)
+    requests = []
+    get_entries = HashAgent.get_entries
+    send_frame = HashAgentHandler.send_frame
+    frames = []
+
+    def recording_get_entries(self, request):
+        requests.append(dict(request))
+        return get_entries(self, request)
+
+    def resetting_send_frame(self, data):
+        frames.append(data)
+        if len(frames) == 3:
+            # 第一次传输中途断开连接
+            self.connection.shutdown(socket.SHUT_RDWR)
+            raise ConnectionResetError("模拟连接中断")
+        send_frame(self, data)
+
+    monkeypatch.setattr(HashAgent, "get_entries", recording_get_entries)
+    monkeypatch.setattr(HashAgentHandler, "send_frame", resetting_send_frame)
+    diff_info = FolderComparator.compare_folders_by_digest(start_agent(tmp_path / "a"), start_agent(tmp_path / "b"))
+    assert diff_info["sha256_not_match"] == ["changed.txt"]
+    assert diff_info["1_not_in_2_file"] == ["only1.txt"]
+    resumed = [request for request in requests if request["session"]]
+    assert len(resumed) == 1 and resumed[0]["offset"] > 0
+    assert len(requests) == 3
+
+
+def test_agent_rejects_wrong_token(tmp_path, start_agent):
+    write_files(tmp_path / "a", {"x.txt": "x"})
+    address = start_agent(tmp_path / "a")
+    client = HashAgentClient.from_address(address)
+    client.token = "wrong"
+    with pytest.raises(RuntimeError, match="令牌错误"):
+        client.fetch_entries()
+    assert not (tmp_path / "a" / "sha256").exists()
+
+
+def test_agent_rejects_oversized_request(tmp_path, start_agent):
+    address = start_agent(tmp_path)
+    client = HashAgentClient.from_address(address)
+    with socket.create_connection((client.host, client.port)) as sock:
+        sock.sendall(b"{" + b" " * (hash_agent.MAX_REQUEST_SIZE * 2) + b"}\n")
+        assert b"error" in sock.makefile("rb").readline()
@@ -0,0 +1,62 @@
+import gzip
+import json
+import os
+import re
+
+import comparator
+from comparator import HtmlFileTreePrinter, TreeNode
+
+
+def embedded_json(html, element_id):
+    match = re.search(f'<script type="application/json" id="{element_id}">(.*?)</script>', html, re.S)
+    return json.loads(match.group(1))
+
+
+def render(paths):
+    return HtmlFileTreePrinter.generate_html_tree(TreeNode.build_file_tree(paths), "", "标题")
+
+
+def test_compressed_report_is_saved_without_browser(capsys):
+    HtmlFileTreePrinter.print(["a/b/c.txt", "a/d.txt"], ["/base"], "标题", compress=True)
+    output_file = capsys.readouterr().out.strip().split("HTML报告已保存：")[-1]
+    try:
+        with gzip.open(output_file, "rt", encoding="utf-8") as f:
+            html = f.read()
+    finally:
+        os.remove(output_file)
+    assert "标题" in html and "c.txt" in html
+    assert not hasattr(HtmlFileTreePrinter, "compress")
+
+
+def test_tree_data_is_preorder_depth_and_name_pairs():
+    html = render(["b/x.txt", "a/deep/only/y.txt", "b/sub/z.txt", "top.txt"])
+    data = embedded_json(html, "treeData")
+    # 每个节点两项：深度 * 2 + 是否为文件夹、名称；只有一个子节点的链合并为一个节点
+    assert list(zip(data[0::2], data[1::2])) == [
+        (0, "a/deep/only/y.txt"), (1, "b"), (2, "sub/z.txt"), (2, "x.txt"), (0, "top.txt")
+    ]
+
+
+def test_tree_data_escapes_script_end_tags():
+    html = render(["a/</script><b>.txt", "a/ok.txt"])
+    assert html.count("</script>") == 3
+    data = embedded_json(html, "treeData")
+    assert "</script><b>.txt" in data[1::2]
+
+
+def test_batched_output_matches_single_batch(monkeypatch):
+    paths = [f"d{i % 7}/sub{i % 3}/F{i}.txt" for i in range(200)]
+    expected = render(paths)
+    monkeypatch.setattr(comparator, "HTML_BATCH_SIZE", 16)
+    assert render(paths) == expected
+
+
+def test_search_index_lines_follow_tree_nodes(monkeypatch):
+    monkeypatch.setattr(comparator, "HTML_BATCH_SIZE", 2)
+    html = render(["Docs/Report.TXT", "Docs/line\nbreak.txt", "other/a.txt"])
+    names = embedded_json(html, "treeData")[1::2]
+    lines = embedded_json(html, "searchIndex").split("\n")
+    # 第i行对应第i个节点，全部小写，名称中的换行不会打乱行号
+    assert len(lines) == len(names)
+    assert lines == [name.replace("\n", " ").lower() for name in names]
+    assert "report.txt" in lines
@@ -0,0 +1,124 @@
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+
+import comparator
+import io_throttle
+from io_throttle import IoThrottle, TokenBucket, prompt_limits, read_chunks
+
+from tests.helpers import write_files
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(io_throttle, "time", clock)
+    return clock
+
+
+def test_token_bucket_limits_rate(clock):
+    bucket = TokenBucket(rate=100, burst=100)
+    bucket.tokens = 0
+    for _ in range(50):
+        bucket.acquire(10)
+    # 500个令牌按每秒100个发放需要5秒
+    assert clock.now == pytest.approx(5.0)
+
+
+def test_token_bucket_allows_burst_after_idle(clock):
+    bucket = TokenBucket(rate=100, burst=200)
+    clock.sleep(10)
+    bucket.acquire(200)
+    assert clock.now == pytest.approx(10.0)
+    bucket.acquire(100)
+    assert clock.now == pytest.approx(11.0)
+
+
+def test_throttled_reads_follow_byte_rate(clock):
+    throttle = IoThrottle(bytes_per_second=1024)
+    throttle.bytes.tokens = 0
+    f = io.BytesIO(b"x" * 10 * 1024)
+    chunks = list(iter(lambda: throttle.read(f, 1024), b""))
+    assert len(chunks) == 10
+    # 读到文件末尾的空读取也先等待一次
+    assert 10.0 <= clock.now <= 11.0
+
+
+def test_opens_are_limited_separately(clock):
+    throttle = IoThrottle(opens_per_second=10)
+    throttle.opens.tokens = 0
+    for _ in range(20):
+        throttle.before_open()
+    assert clock.now == pytest.approx(2.0)
+    f = io.BytesIO(b"x" * 10 * 1024 * 1024)
+    start = clock.now
+    throttle.read(f, 10 * 1024 * 1024)
+    assert clock.now == start
+
+
+def test_prompt_limits_asks_again_on_invalid_input(monkeypatch, capsys):
+    answers = iter(["abc", "2", "", "-5", "100", ""])
+    monkeypatch.setattr("builtins.input", lambda message: next(answers))
+    monkeypatch.setattr(io_throttle, "THROTTLE", IoThrottle())
+    prompt_limits()
+    assert io_throttle.THROTTLE.bytes.rate == 2 * 1024 * 1024
+    assert io_throttle.THROTTLE.opens.rate is None
+    assert io_throttle.THROTTLE.latency_target == pytest.approx(0.1)
+    assert capsys.readouterr().out.count("输入无效") == 2
+
+
+@pytest.mark.parametrize("queue_depth", [0, 1, 4])
+def test_pipelined_chunks_match_sequential_reads(queue_depth):
+    content = os.urandom(10 * 1000 + 7)
+    assert b"".join(read_chunks(io.BytesIO(content), 1000, queue_depth)) == content
+    assert [len(chunk) for chunk in read_chunks(io.BytesIO(content), 1000, queue_depth)] == [1000] * 10 + [7]
+
+
+def test_pipelined_read_error_reaches_consumer():
+    class FailingFile(io.BytesIO):
+        def read(self, size=-1):
+            if self.tell() >= 2000:
+                raise OSError(5, "Input/output error")
+            return super().read(size)
+
+    chunks = read_chunks(FailingFile(b"x" * 5000), 1000, 2)
+    assert next(chunks) == b"x" * 1000
+    with pytest.raises(OSError):
+        list(chunks)
+
+
+def test_closing_pipelined_reader_stops_thread():
+    before = threading.active_count()
+    chunks = read_chunks(io.BytesIO(b"x" * 100000), 1000, 2)
+    next(chunks)
+    chunks.close()
+    assert threading.active_count() == before
+
+
+def test_large_file_hash_uses_pipeline(tmp_path, monkeypatch):
+    content = os.urandom(3 * 1024 * 1024 + 5)
+    write_files(tmp_path, {"big.bin": content})
+    depths = []
+
+    def recording_read_chunks(f, chunk_size, queue_depth=0):
+        depths.append(queue_depth)
+        return read_chunks(f, chunk_size, queue_depth)
+
+    monkeypatch.setattr(comparator, "PIPELINE_MIN_SIZE", 1024 * 1024)
+    monkeypatch.setattr(comparator, "read_chunks", recording_read_chunks)
+    assert comparator.calculate_sha256(str(tmp_path / "big.bin")) == hashlib.sha256(content).hexdigest()
+    assert depths == [comparator.PIPELINE_QUEUE_DEPTH]
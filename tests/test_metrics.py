@@ -0,0 +1,92 @@
+import json
+import pstats
+
+import metrics
+from metrics import Metrics, run_profiled, run_with_metrics
+
+
+def prometheus_samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_disabled_metrics_record_nothing():
+    recorder = Metrics()
+    with recorder.phase("walk"):
+        recorder.count("dirs_walked")
+        recorder.observe_hash("a.txt", 10, 0.5)
+    assert recorder.summary()["phases"] == {}
+    assert recorder.summary()["counters"] == {}
+
+
+def test_prometheus_export_has_cumulative_histogram():
+    recorder = Metrics()
+    recorder.enable()
+    recorder.add_phase("walk", 1.5, 0.5)
+    recorder.add_phase("walk", 0.5, 0.25)
+    recorder.count("dirs_walked", 3)
+    recorder.gauge("hash_pending", 7)
+    recorder.gauge("hash_pending", 2)
+    for seconds in (0.002, 0.002, 0.2, 1000):
+        recorder.observe_hash("a.txt", 100, seconds)
+    samples = prometheus_samples(recorder.to_prometheus())
+    assert samples['folder_tools_phase_wall_seconds{phase="walk"}'] == 2.0
+    assert samples['folder_tools_phase_cpu_seconds{phase="walk"}'] == 0.75
+    assert samples["folder_tools_dirs_walked_total"] == 3
+    assert samples["folder_tools_files_hashed_total"] == 4
+    assert samples["folder_tools_bytes_hashed_total"] == 400
+    assert samples['folder_tools_queue_depth_max{queue="hash_pending"}'] == 7
+    assert samples['folder_tools_hash_latency_seconds_bucket{le="0.001"}'] == 0
+    assert samples['folder_tools_hash_latency_seconds_bucket{le="0.005"}'] == 2
+    assert samples['folder_tools_hash_latency_seconds_bucket{le="0.5"}'] == 3
+    assert samples['folder_tools_hash_latency_seconds_bucket{le="300"}'] == 3
+    assert samples['folder_tools_hash_latency_seconds_bucket{le="+Inf"}'] == 4
+    assert samples["folder_tools_hash_latency_seconds_count"] == 4
+    assert samples["folder_tools_hash_latency_seconds_sum"] == 1000.204
+
+
+def test_trace_file_and_slowest_files(tmp_path):
+    recorder = Metrics()
+    recorder.enable(str(tmp_path / "trace.tsv"))
+    for i in range(30):
+        recorder.observe_hash(f"dir{i % 2}/f{i}.bin", i, i / 10)
+    recorder.close()
+    summary = recorder.summary()
+    assert [item["path"] for item in summary["slowest_files"][:2]] == ["dir1/f29.bin", "dir0/f28.bin"]
+    assert len(summary["slowest_files"]) == metrics.SLOWEST_COUNT
+    assert summary["slowest_dirs"][0]["path"] == "dir1"
+    lines = (tmp_path / "trace.tsv").read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "path\tsize\tseconds"
+    assert len(lines) == 31
+
+
+def test_run_with_metrics_writes_json_and_prom(tmp_path, monkeypatch):
+    for output_file in (tmp_path / "metrics.json", tmp_path / "metrics.prom"):
+        recorder = Metrics()
+        recorder.enable()
+        monkeypatch.setattr(metrics, "METRICS", recorder)
+
+        def task():
+            with recorder.phase("sha256"):
+                recorder.observe_hash("a.txt", 5, 0.01)
+            return "done"
+
+        assert run_with_metrics(task, output_file=str(output_file)) == "done"
+    summary = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert summary["phases"]["sha256"]["count"] == 1
+    assert summary["counters"]["files_hashed"] == 1
+    prom = prometheus_samples((tmp_path / "metrics.prom").read_text(encoding="utf-8"))
+    assert prom["folder_tools_hash_latency_seconds_count"] == 1
+
+
+def test_run_profiled_saves_stats(tmp_path):
+    def work(n):
+        return sum(range(n))
+
+    assert run_profiled(work, 1000, profile_output=str(tmp_path / "run.prof")) == sum(range(1000))
+    stats = pstats.Stats(str(tmp_path / "run.prof"))
+    assert any(name == "work" for _, _, name in stats.stats)
@@ -0,0 +1,38 @@
+from comparator import FolderComparator
+
+from tests.helpers import write_files
+
+
+def compare_with_moves(tmp_path, files1, files2):
+    write_files(tmp_path / "a", files1)
+    write_files(tmp_path / "b", files2)
+    return FolderComparator.compare_folders(str(tmp_path / "a"), str(tmp_path / "b"), False, detect_moves=True)
+
+
+def test_moved_file_is_paired_by_name(tmp_path):
+    diff_info = compare_with_moves(tmp_path, {"x/data.bin": "same content", "keep.txt": "k"},
+                                   {"y/data.bin": "same content", "keep.txt": "k"})
+    assert diff_info["1_not_in_2_folder"] == []
+    assert diff_info["2_not_in_1_folder"] == []
+    assert list(diff_info["1_not_in_2_file"]) == []
+    assert list(diff_info["2_not_in_1_file"]) == []
+
+
+def test_single_renamed_file_is_paired(tmp_path):
+    diff_info = compare_with_moves(tmp_path, {"old.txt": "renamed"}, {"new.txt": "renamed"})
+    assert list(diff_info["1_not_in_2_file"]) == []
+    assert list(diff_info["2_not_in_1_file"]) == []
+
+
+def test_ambiguous_renames_are_left_unpaired(tmp_path):
+    diff_info = compare_with_moves(tmp_path, {"a1.txt": "dup", "a2.txt": "dup"}, {"b1.txt": "dup", "b2.txt": "dup"})
+    assert sorted(diff_info["1_not_in_2_file"]) == ["a1.txt", "a2.txt"]
+    assert sorted(diff_info["2_not_in_1_file"]) == ["b1.txt", "b2.txt"]
+
+
+def test_partially_moved_folder_keeps_remaining_files(tmp_path):
+    diff_info = compare_with_moves(tmp_path, {"old/moved.bin": "moved", "old/gone.bin": "gone"},
+                                   {"new/moved.bin": "moved"})
+    assert diff_info["1_not_in_2_folder"] == []
+    assert sorted(diff_info["1_not_in_2_file"]) == ["old/gone.bin"]
+    assert diff_info["2_not_in_1_folder"] == []
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from path_store import PathStore
+
+
+def test_round_trip_keeps_insertion_order():
+    paths = [os.path.join("b", "z.txt"), "top.txt", os.path.join("a", "sub", "名字.txt"), os.path.join("b", "a.txt")]
+    store = PathStore(paths)
+    assert list(store) == paths
+    assert len(store) == 4
+    assert list(store.iter_parts()) == [("b", "z.txt"), ("", "top.txt"), (os.path.join("a", "sub"), "名字.txt"),
+                                        ("b", "a.txt")]
+    assert list(PathStore(store)) == paths
+
+
+def test_sorted_parts_group_by_folder():
+    store = PathStore([os.path.join("b", "z.txt"), "top.txt", os.path.join("b", "a.txt")])
+    store.add_files("a", ["y.txt", "x.txt"])
+    assert list(store.iter_sorted_parts()) == [("", ["top.txt"]), ("a", ["x.txt", "y.txt"]),
+                                               ("b", ["a.txt", "z.txt"])]
+
+
+def test_lookup_by_index():
+    store = PathStore(["top.txt", os.path.join("a", "x.txt")])
+    assert store[0] == "top.txt"
+    assert store[1] == os.path.join("a", "x.txt")
+    assert store[-1] == os.path.join("a", "x.txt")
+    assert os.path.join("a", "x.txt") in store
+    assert "missing.txt" not in store
+    with pytest.raises(IndexError):
+        store[2]
+
+
+def test_undecodable_names_survive():
+    name = os.fsdecode(b"bad\xff.txt")
+    store = PathStore([name])
+    assert list(store) == [name]
+    store.clear()
+    assert len(store) == 0
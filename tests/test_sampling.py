@@ -0,0 +1,118 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+import generate_sha256
+from comparator import FolderComparator, TreeDigest, calculate_sha256
+from sampling import SampleVerifier, prompt_sample
+
+from tests.helpers import write_files
+
+
+def test_stops_when_rate_is_confidently_low():
+    verifier = SampleVerifier(max_rate=0.05, seed=1)
+    report = verifier.run(range(1, 10001), lambda item: True, max_workers=4)
+    assert report["reason"].startswith("不一致率已在95%置信度下低于")
+    assert report["mismatches"] == []
+    assert report["samples"] < 10000
+
+
+def test_stops_when_rate_is_confidently_high():
+    verifier = SampleVerifier(max_rate=0.01, seed=1)
+    report = verifier.run(range(1, 10001), lambda item: item % 2 == 0, max_workers=4)
+    assert report["reason"].startswith("不一致率已在95%置信度下高于")
+    assert report["low"] > 0.01
+    assert report["samples"] < 10000
+
+
+def test_time_budget_interrupts_slow_file():
+    verifier = SampleVerifier(time_budget=0.2, seed=1)
+    released = threading.Event()
+
+    def check(item):
+        if item == 1:
+            return True
+        # 模拟计算中的大文件：每个数据块之前检查是否已停止
+        while not verifier.stopped.wait(0.01):
+            pass
+        released.set()
+        return True
+
+    start = time.monotonic()
+    report = verifier.run([1, 2], check, max_workers=2)
+    assert time.monotonic() - start < 2
+    assert report["reason"] == "已达到时间预算0.2秒"
+    assert report["samples"] == 1
+    assert released.wait(1)
+
+
+def test_unreadable_file_is_skipped(capsys):
+    def check(item):
+        if item == 2:
+            raise PermissionError(13, "Permission denied")
+        return True
+
+    report = SampleVerifier(seed=1).run([1, 2, 3], check, max_workers=1)
+    assert report["skipped"] == 1
+    assert report["sampled"] == [1, 3]
+    assert "抽样校验失败：2" in capsys.readouterr().out
+
+
+def test_stratified_estimate_weights_strata_by_population():
+    verifier = SampleVerifier(seed=1)
+    sizes = {f"small{i}": 10 for i in range(1000)} | {f"big{i}": 1 << 30 for i in range(10)}
+    ordered = verifier.order(list(sizes), sizes, set())
+    # 大文件层只占1%，轮流抽样时却占了一半样本，不能直接用合并的比例
+    report = verifier.run(ordered[:20], lambda item: not item.startswith("big"), max_workers=1)
+    assert len(report["mismatches"]) == 10
+    assert report["rate"] == pytest.approx(10 / 1010)
+    assert report["low"] <= 10 / 1010 <= report["high"]
+
+
+def test_cancelled_hash_stops_reading(tmp_path):
+    write_files(tmp_path, {"x.bin": b"\0" * (3 * 1024 * 1024)})
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(CancelledError):
+        calculate_sha256(str(tmp_path / "x.bin"), cancel=cancel)
+
+
+def test_verify_sample_finds_mismatch(tmp_path):
+    write_files(tmp_path / "a", {f"f{i}.txt": str(i) for i in range(20)})
+    write_files(tmp_path / "b", {f"f{i}.txt": str(i) for i in range(19)} | {"f19.txt": "x"})
+    report = FolderComparator.verify_sample(str(tmp_path / "a"), str(tmp_path / "b"), max_rate=0.01)
+    assert report["mismatches"] == ["f19.txt"]
+
+
+def test_generate_sha256_verify_sample_uses_relative_paths(tmp_path):
+    write_files(tmp_path, {"a/x.txt": "aaa", "b/x.txt": "bbb"})
+    generate_sha256.process_folder(str(tmp_path))
+    TreeDigest.update(str(tmp_path))
+    # 同名文件的记录只按文件名保存，改成另一个同名文件的内容也不能当作一致
+    (tmp_path / "b" / "x.txt").write_text("aaa")
+    report = generate_sha256.verify_sample(str(tmp_path), time_budget=5)
+    assert [p.replace("\\", "/") for p in report["mismatches"]] == ["b/x.txt"]
+
+
+def test_generate_sha256_duplicate_names_without_digest_are_skipped(tmp_path):
+    write_files(tmp_path, {"a/x.txt": "aaa", "b/x.txt": "bbb", "c.txt": "ccc"})
+    generate_sha256.process_folder(str(tmp_path))
+    report = generate_sha256.verify_sample(str(tmp_path))
+    assert report["samples"] == 1
+    assert report["skipped"] == 2
+
+
+def test_generate_sha256_hash_stops_when_cancelled(tmp_path):
+    write_files(tmp_path, {"x.bin": b"\0" * (3 * 1024 * 1024)})
+    cancel = threading.Event()
+    cancel.set()
+    assert generate_sha256.calculate_sha256(tmp_path / "x.bin", show_progress=False, cancel=cancel) is None
+
+
+def test_prompt_sample_asks_again_on_invalid_input(monkeypatch, capsys):
+    answers = iter(["abc", "-1", "2.5"])
+    monkeypatch.setattr("builtins.input", lambda message: next(answers))
+    assert prompt_sample("?") == (True, 2.5)
+    assert capsys.readouterr().out.count("输入无效") == 2
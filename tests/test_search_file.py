@@ -0,0 +1,97 @@
+import hashlib
+import os
+
+import pytest
+
+import search_file
+from comparator import TreeDigest
+from search_file import (MetadataFilter, find_by_hash, iter_content_search, iter_search, parse_size, search_metadata,
+                         walk_entries)
+
+from tests.helpers import write_files
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="需要符号链接")
+def test_walk_skips_directory_symlinks_like_os_walk(tmp_path):
+    write_files(tmp_path, {"real/a.txt": "a", "b.txt": "b"})
+    os.symlink(tmp_path / "real", tmp_path / "link_dir", target_is_directory=True)
+    os.symlink(tmp_path / "b.txt", tmp_path / "link_file.txt")
+    found = sorted(os.path.relpath(entry.path, tmp_path) for entry in walk_entries(str(tmp_path)))
+    expected = sorted(os.path.relpath(os.path.join(root, name), tmp_path)
+                      for root, _, names in os.walk(tmp_path) for name in names)
+    assert found == expected == sorted(["b.txt", "link_file.txt", os.path.join("real", "a.txt")])
+
+
+def test_name_search_ignores_folders(tmp_path):
+    write_files(tmp_path, {"x/a.txt": "a", "a_dir/b.txt": "b", "node_modules/a.txt": "a"})
+    found = sorted(os.path.relpath(path, tmp_path) for path in iter_search(str(tmp_path), "a", ig_ls=["node_modules"]))
+    assert found == [os.path.join("x", "a.txt")]
+
+
+def test_content_search_reports_each_line_once(tmp_path):
+    write_files(tmp_path, {"a.txt": "foo Foo\nbar\nxfoo\n", "b.bin": b"foo\0", "c.txt": "none"})
+    found = sorted((os.path.basename(path), line_no, line)
+                   for path, line_no, line in iter_content_search(str(tmp_path), "FOO"))
+    assert found == [("a.txt", 1, "foo Foo"), ("a.txt", 3, "xfoo")]
+
+
+def test_content_search_rejects_empty_keyword(tmp_path):
+    with pytest.raises(ValueError):
+        list(iter_content_search(str(tmp_path), ""))
+
+
+def test_content_search_continues_after_mmap_error(tmp_path, monkeypatch):
+    write_files(tmp_path, {"a.txt": "needle", "b.txt": "needle"})
+    original = search_file.search_file_content
+
+    def search_file_content(path, needle, ignore_case=True):
+        if path.endswith("a.txt"):
+            raise ValueError("cannot mmap an empty file")
+        return original(path, needle, ignore_case)
+
+    monkeypatch.setattr(search_file, "search_file_content", search_file_content)
+    stats = {}
+    found = [os.path.basename(path) for path, _, _ in iter_content_search(str(tmp_path), "needle", stats=stats)]
+    assert found == ["b.txt"]
+    assert stats["errors"] == 1
+
+
+def sha256_hex(content):
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def test_hash_search_uses_catalog_for_unchanged_files(tmp_path):
+    write_files(tmp_path, {"sub/deep/x.txt": "target", "y.txt": "target", "z.txt": "others"})
+    TreeDigest.update(str(tmp_path))
+    write_files(tmp_path, {"y.txt": "change"})
+    stats = {}
+    found = sorted((os.path.relpath(path, tmp_path), source)
+                   for path, source in find_by_hash(str(tmp_path), sha256_hex("target"), stats=stats))
+    assert found == [(os.path.join("sub", "deep", "x.txt"), "catalog")]
+    assert stats["hashed"] == 1
+
+
+def test_hash_search_verifies_record_matches(tmp_path):
+    write_files(tmp_path, {"a/x.txt": "target", "b/x.txt": "tarGET",
+                           f"sha256/x.txt.{sha256_hex('target')}.6.sha256": ""})
+    found = [os.path.relpath(path, tmp_path) for path, _ in find_by_hash(str(tmp_path), sha256_hex("target"))]
+    assert found == [os.path.join("a", "x.txt")]
+
+
+def test_sorted_metadata_search_without_limit_returns_everything(tmp_path, capsys):
+    write_files(tmp_path, {f"f{i:03d}.dat": b"x" * i for i in range(150)})
+    search_metadata(str(tmp_path), MetadataFilter(), sort_by="size")
+    lines = [line for line in capsys.readouterr().out.splitlines() if "\t" in line]
+    assert len(lines) == 150
+    assert lines[0].split("\t")[1] == "149" and lines[-1].split("\t")[1] == "0"
+
+
+@pytest.mark.parametrize("text, size", [("10", 10), ("1.5K", 1536), ("2MB", 2 * 1024 ** 2), ("1g", 1024 ** 3)])
+def test_parse_size(text, size):
+    assert parse_size(text) == size
+
+
+@pytest.mark.parametrize("text", ["B", "K", "", "abc"])
+def test_parse_size_rejects_missing_number(text):
+    with pytest.raises(ValueError, match="文件大小格式不正确"):
+        parse_size(text)
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from snapshot import diff_snapshots, iter_snapshot, list_snapshots, write_snapshot
+
+from tests.helpers import write_files
+
+
+def test_diff_detects_changes_and_moves(tmp_path):
+    write_files(tmp_path, {"keep.txt": "k", "edit.txt": "old", "old/moved.bin": "payload", "gone.txt": "g"})
+    first = write_snapshot(str(tmp_path))
+    write_files(tmp_path, {"edit.txt": "new!", "new/moved.bin": "payload", "added.txt": "a"})
+    os.remove(tmp_path / "old" / "moved.bin")
+    os.remove(tmp_path / "gone.txt")
+    second = write_snapshot(str(tmp_path))
+    assert list_snapshots(str(tmp_path)) == [first, second]
+    diff = diff_snapshots(first, second)
+    assert diff == {"added": ["added.txt"], "removed": ["gone.txt"], "modified": ["edit.txt"],
+                    "moved": [("old/moved.bin", "new/moved.bin")]}
+
+
+def test_snapshots_in_same_second_do_not_overwrite(tmp_path):
+    write_files(tmp_path, {"a.txt": "a"})
+    files = [write_snapshot(str(tmp_path)) for _ in range(3)]
+    assert len(set(files)) == 3
+    assert list_snapshots(str(tmp_path)) == files
+
+
+def test_unchanged_files_reuse_previous_sha256(tmp_path, capsys):
+    write_files(tmp_path, {"a.txt": "a", "b.txt": "b"})
+    write_snapshot(str(tmp_path))
+    write_files(tmp_path, {"c.txt": "c"})
+    capsys.readouterr()
+    second = write_snapshot(str(tmp_path))
+    assert "计算了1个文件的sha256（其余沿用" in capsys.readouterr().out
+    assert [entry[0] for entry in iter_snapshot(second)] == ["a.txt", "b.txt", "c.txt"]
+
+
+def test_snapshots_of_different_trees_are_rejected(tmp_path):
+    write_files(tmp_path / "a", {"x.txt": "x"})
+    write_files(tmp_path / "b", {"x.txt": "x"})
+    snapshot_a = write_snapshot(str(tmp_path / "a"))
+    snapshot_b = write_snapshot(str(tmp_path / "b"))
+    with pytest.raises(ValueError, match="不同的文件夹"):
+        diff_snapshots(snapshot_a, snapshot_b)
+    with pytest.raises(ValueError, match="不同的文件夹"):
+        write_snapshot(str(tmp_path / "b"), previous_file=snapshot_a)
+    assert diff_snapshots(snapshot_a, snapshot_b, check_root=False)["modified"] == []
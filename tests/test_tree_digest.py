@@ -0,0 +1,97 @@
+import os
+import stat
+
+import pytest
+
+import comparator
+from comparator import FolderComparator, TreeDigest, calculate_sha256 as real_sha256
+
+from tests.helpers import write_files
+
+
+def test_digest_compare_reports_differences(tmp_path):
+    write_files(tmp_path / "a", {"same/x.txt": "x", "changed.txt": "new", "only1/y.txt": "y", "z.txt": "z"})
+    write_files(tmp_path / "b", {"same/x.txt": "x", "changed.txt": "old", "only2.txt": "w", "z.txt": "z"})
+    diff_info = FolderComparator.compare_folders_by_digest(str(tmp_path / "a"), str(tmp_path / "b"))
+    assert diff_info["1_not_in_2_folder"] == ["only1"]
+    assert diff_info["2_not_in_1_file"] == ["only2.txt"]
+    assert diff_info["sha256_not_match"] == ["changed.txt"]
+    assert os.path.isfile(tmp_path / "a" / TreeDigest.DIGEST_FILE)
+
+
+def test_saved_digest_rechecks_changed_files(tmp_path, monkeypatch):
+    write_files(tmp_path / "a", {"x.txt": "x", "y.txt": "same"})
+    write_files(tmp_path / "b", {"x.txt": "x", "y.txt": "same"})
+    FolderComparator.compare_folders_by_digest(str(tmp_path / "a"), str(tmp_path / "b"))
+    write_files(tmp_path / "b", {"x.txt": "y"})
+    os.utime(tmp_path / "b" / "x.txt", ns=(1, 1))  # 大小不变，只有修改时间变化
+    hashed = []
+    monkeypatch.setattr(comparator, "calculate_sha256", lambda path: hashed.append(path) or real_sha256(path))
+    diff_info = FolderComparator.compare_folders_by_digest(str(tmp_path / "a"), str(tmp_path / "b"))
+    assert diff_info["sha256_not_match"] == ["x.txt"]
+    assert hashed == [os.path.join(str(tmp_path / "b"), "x.txt")]
+    hashed.clear()
+    FolderComparator.compare_folders_by_digest(str(tmp_path / "a"), str(tmp_path / "b"), refresh=True)
+    assert len(hashed) == 4
+
+
+def test_unreadable_file_reported_as_error(tmp_path, monkeypatch):
+    write_files(tmp_path / "a", {"sub/bad.txt": "x", "sub/ok.txt": "ok"})
+    write_files(tmp_path / "b", {"sub/bad.txt": "x", "sub/ok.txt": "ok", "extra.txt": "e"})
+
+    def calculate_sha256(path):
+        if path.startswith(str(tmp_path / "a")) and path.endswith("bad.txt"):
+            raise PermissionError(13, "Permission denied")
+        return real_sha256(path)
+
+    monkeypatch.setattr(comparator, "calculate_sha256", calculate_sha256)
+    diff_info = FolderComparator.compare_folders_by_digest(str(tmp_path / "a"), str(tmp_path / "b"))
+    assert diff_info["errors"] == ["sub/bad.txt"]
+    assert diff_info["2_not_in_1_file"] == ["extra.txt"]
+    assert diff_info["sha256_not_match"] == []
+    saved = TreeDigest.load(str(tmp_path / "a"))
+    assert "sub/bad.txt" not in saved.files and saved.errors == {"sub/bad.txt": "[Errno 13] Permission denied"}
+    monkeypatch.setattr(comparator, "calculate_sha256", real_sha256)
+    assert FolderComparator.compare_folders_by_digest(str(tmp_path / "a"), str(tmp_path / "b"))["errors"] == []
+
+
+def test_names_with_tabs_and_newlines_round_trip():
+    digest = TreeDigest({"a\tb/c\nd.txt": (1, 2, "ff"), "e\rf.txt": (3, 4, "ee")})
+    loaded = TreeDigest.from_lines(list(digest.to_lines()))
+    assert loaded.files == digest.files
+    assert loaded.dirs == digest.dirs
+
+
+@pytest.mark.skipif(os.name == "nt" or os.geteuid() == 0, reason="需要非root的只读文件夹")
+def test_read_only_replica_is_compared_without_saving(tmp_path):
+    write_files(tmp_path / "a", {"x.txt": "x"})
+    write_files(tmp_path / "b", {"x.txt": "y"})
+    os.chmod(tmp_path / "b", stat.S_IRUSR | stat.S_IXUSR)
+    try:
+        diff_info = FolderComparator.compare_folders_by_digest(str(tmp_path / "a"), str(tmp_path / "b"))
+    finally:
+        os.chmod(tmp_path / "b", stat.S_IRWXU)
+    assert diff_info["sha256_not_match"] == ["x.txt"]
+
+
+def test_read_only_save_failure_only_warns(tmp_path, monkeypatch, capsys):
+    write_files(tmp_path / "a", {"x.txt": "x"})
+
+    def save(self, base_path):
+        raise PermissionError(13, "Permission denied")
+
+    monkeypatch.setattr(TreeDigest, "save", save)
+    digest = TreeDigest.update(str(tmp_path / "a"))
+    assert list(digest.files) == ["x.txt"]
+    assert "保存文件夹摘要失败" in capsys.readouterr().out
+
+
+def test_plain_compare_ignores_tool_state(tmp_path):
+    write_files(tmp_path / "a", {"x.txt": "x"})
+    write_files(tmp_path / "b", {"x.txt": "x", "y.txt": "y", "sha256/sample_state.txt": "x.txt\n",
+                                 "sha256/snapshots/20260101-000000.000000.snapshot.gz": b"gz"})
+    FolderComparator.compare_folders_by_digest(str(tmp_path / "a"), str(tmp_path / "b"))
+    diff_info = FolderComparator.compare_folders(str(tmp_path / "a"), str(tmp_path / "b"), True)
+    assert list(diff_info["2_not_in_1_file"]) == ["y.txt"]
+    assert list(diff_info["2_not_in_1_folder"]) == []
+    assert diff_info["sha256_not_match"] == []
@@ -0,0 +1,7 @@
+from comparator import TreeNode
+
+
+def test_build_file_tree_merges_single_child_chains():
+    root = TreeNode.build_file_tree(["a/b/c.txt", "a/b/d.txt", "e.txt"])
+    assert list(root.children) == ["a/b", "e.txt"]
+    assert sorted(root.children["a/b"].children) == ["c.txt", "d.txt"]